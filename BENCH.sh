@@ -0,0 +1,12 @@
+#!/bin/bash
+set -e
+
+echo "=== Benchmarks: Agentic Legal Assistant ==="
+
+# Runs offline against a stub LLM; pass e.g. --baseline bench_results.previous.json
+# to fail on regressions, or --llm-latency 0.2 to model a slower model
+cd src/backend
+python benchmark.py --output ../../bench_results.json "$@"
+cd ../..
+
+echo "=== Results written to bench_results.json ==="
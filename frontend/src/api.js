@@ -18,12 +18,17 @@ api.interceptors.request.use((config) => {
 
 export const agentAPI = {
   runAgent: (data) => api.post('/agent', data),
+  getAgentRun: (caseId) => api.get(`/agent/${caseId}`),
   uploadFile: (formData) => api.post('/upload', formData, {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
   getCase: (caseId) => api.get(`/case/${caseId}`),
   approveStep: (data) => api.post('/approve-step', data),
-  getArtifact: (path) => api.get(`/artifact/${path}`, { responseType: 'blob' }),
+  getArtifact: (path, format) => api.get(`/artifact/${path}`, {
+    params: format ? { format } : undefined,
+    responseType: 'blob',
+  }),
+  getLazyOutput: (ref) => api.get(`/lazy/${ref}`),
 };
 
 export default api;
\ No newline at end of file
@@ -3,6 +3,9 @@ import { Send, Paperclip } from 'lucide-react';
 import useCaseStore from '../store/useCaseStore';
 import { agentAPI } from '../api';
 
+// How often a running case is polled for step progress
+const POLL_INTERVAL_MS = 1000;
+
 const ChatComposer = () => {
   const [message, setMessage] = useState('');
   const { addMessage, setIsRunning, uploadedFiles, setAgents, setTimeline, setArtifacts } = useCaseStore();
@@ -23,17 +26,25 @@ const ChatComposer = () => {
     setIsRunning(true);
 
     try {
-      // Call agent API
-      const response = await agentAPI.runAgent({
+      // Start the case in the background, then poll it so steps show up as they finish
+      let response = await agentAPI.runAgent({
         user_id: 'default_user',
         prompt: userMessage,
-        files: uploadedFiles.map(f => f.id)
+        files: uploadedFiles.map(f => f.id),
+        background: true
       });
+      const caseId = response.data.case_id;
+
+      while (true) {
+        // Update store with results
+        setAgents(response.data.agents || []);
+        setTimeline(response.data.timeline || []);
+        setArtifacts(response.data.artifacts || []);
+        if (!response.data.running) break;
 
-      // Update store with results
-      setAgents(response.data.agents || []);
-      setTimeline(response.data.timeline || []);
-      setArtifacts(response.data.artifacts || []);
+        await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+        response = await agentAPI.getAgentRun(caseId);
+      }
 
       // Add assistant response
       addMessage({
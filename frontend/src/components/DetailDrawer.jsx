@@ -1,17 +1,36 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { X, Download, Check, AlertTriangle } from 'lucide-react';
 import { agentAPI } from '../api';
 
 const DetailDrawer = ({ agent, onClose }) => {
+  const [strategy, setStrategy] = useState(null);
+  const strategyRef = agent?.lazyFields?.strategy;
+
+  // The strategy narrative is generated on first open and cached server-side
+  useEffect(() => {
+    setStrategy(null);
+    if (!strategyRef) return;
+
+    let cancelled = false;
+    agentAPI.getLazyOutput(strategyRef)
+      .then((response) => {
+        if (!cancelled) setStrategy(response.data.value);
+      })
+      .catch((error) => console.error('Error loading strategy:', error));
+    return () => {
+      cancelled = true;
+    };
+  }, [strategyRef]);
+
   if (!agent) return null;
 
-  const handleDownloadArtifact = async (artifact) => {
+  const handleDownloadArtifact = async (artifact, format) => {
     try {
-      const response = await agentAPI.getArtifact(artifact.path);
+      const response = await agentAPI.getArtifact(artifact.path, format);
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement('a');
       link.href = url;
-      link.setAttribute('download', artifact.name);
+      link.setAttribute('download', format === 'pdf' ? artifact.name.replace(/\.[^.]+$/, '.pdf') : artifact.name);
       document.body.appendChild(link);
       link.click();
       link.remove();
@@ -46,6 +65,16 @@ const DetailDrawer = ({ agent, onClose }) => {
             </div>
           </div>
 
+          {/* Strategy */}
+          {strategyRef && (
+            <div>
+              <h3 className="font-medium text-gray-900 mb-3">Strategy</h3>
+              <div className="bg-gray-50 rounded-xl p-4">
+                <p className="text-sm text-gray-700 whitespace-pre-line">{strategy || 'Preparing strategy...'}</p>
+              </div>
+            </div>
+          )}
+
           {/* Progress */}
           <div>
             <h3 className="font-medium text-gray-900 mb-3">Progress</h3>
@@ -74,12 +103,22 @@ const DetailDrawer = ({ agent, onClose }) => {
                       <div className="font-medium text-sm">{artifact.name}</div>
                       <div className="text-xs text-gray-500">{artifact.type}</div>
                     </div>
-                    <button
-                      onClick={() => handleDownloadArtifact(artifact)}
-                      className="text-gray-400 hover:text-gray-600 transition-colors"
-                    >
-                      <Download size={16} />
-                    </button>
+                    <div className="flex items-center gap-2">
+                      {['txt', 'ics'].includes(artifact.type) && (
+                        <button
+                          onClick={() => handleDownloadArtifact(artifact, 'pdf')}
+                          className="text-xs text-gray-400 hover:text-gray-600 transition-colors"
+                        >
+                          PDF
+                        </button>
+                      )}
+                      <button
+                        onClick={() => handleDownloadArtifact(artifact)}
+                        className="text-gray-400 hover:text-gray-600 transition-colors"
+                      >
+                        <Download size={16} />
+                      </button>
+                    </div>
                   </div>
                 ))}
               </div>
@@ -11,6 +11,7 @@ const FileDropzone = () => {
     for (const file of acceptedFiles) {
       const formData = new FormData();
       formData.append('file', file);
+      formData.append('user_id', 'default_user');
 
       try {
         const response = await agentAPI.uploadFile(formData);
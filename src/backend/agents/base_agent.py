@@ -1,6 +1,18 @@
+import contextvars
+import os
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Callable, Optional
 from llm_client import LLMClient
+from retrieval import rank_similar_cases, TfidfIndex
+from knowledge_base import lookup as lookup_knowledge
+from tracing import span
+
+# Plan steps of one agent that may run at the same time
+AGENT_STEP_WORKERS = int(os.getenv("AGENT_STEP_WORKERS", "4"))
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
 
 class BaseAgent(ABC):
     """Base class for all specialized legal agents"""
@@ -9,6 +21,12 @@ class BaseAgent(ABC):
         self.llm_client = llm_client
         self.agent_type = "base"
         self.name = "Base Legal Agent"
+        # Extracted facts by case context; may be filled ahead of time by speculation
+        self.key_facts_cache: Dict[str, Dict[str, Any]] = {}
+        # Narrative prompts whose LLM output is only computed when requested
+        self.deferred_outputs: Dict[str, str] = {}
+        # The user's past-case index, set by the executor before execute()
+        self.case_index: Optional[TfidfIndex] = None
     
     @abstractmethod
     def plan(self, case_context: str, memory: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -16,31 +34,115 @@ class BaseAgent(ABC):
         pass
     
     @abstractmethod
-    def execute(self, plan: List[Dict[str, Any]], memory: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the planned actions"""
+    def step_handlers(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Result key -> function of memory computing that part of the results"""
         pass
     
+    def execute(self, plan: List[Dict[str, Any]], memory: Dict[str, Any],
+                on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Execute the planned actions, one plan step at a time
+        
+        Each step computes the result keys listed in its "produces" once the
+        steps in its "after" list have finished; steps whose dependencies
+        are met run concurrently. `on_progress` is called (always from this
+        thread) when a step starts and ends, with its timings, the overall
+        progress and the partial results it produced. Results also carry a
+        "steps" list with each step's status and timings.
+        """
+        handlers = self.step_handlers()
+        steps = [
+            {
+                "step": step.get("step", i + 1),
+                "action": step.get("action", f"Step {i + 1}"),
+                "produces": [key for key in step.get("produces", []) if key in handlers],
+                "after": step.get("after", []),
+                "status": "waiting"
+            }
+            for i, step in enumerate(plan)
+        ]
+        # Results no step claims are computed by a final catch-all step
+        claimed = {key for step in steps for key in step["produces"]}
+        leftover = [key for key in handlers if key not in claimed]
+        if leftover:
+            steps.append({"step": len(steps) + 1, "action": "Finalize Results", "produces": leftover,
+                          "after": [step["step"] for step in steps], "status": "waiting"})
+        
+        results: Dict[str, Any] = {}
+        finished = 0
+        
+        def report(step: Dict[str, Any], partial: Optional[Dict[str, Any]] = None) -> None:
+            if on_progress:
+                on_progress({**step, "progress": int(100 * finished / len(steps)), "partial": partial or {}})
+        
+        def run_step(step: Dict[str, Any]) -> Dict[str, Any]:
+            with span("agent.step", agent_type=self.agent_type, action=step["action"]):
+                return {key: handlers[key](memory) for key in step["produces"]}
+        
+        by_number = {step["step"]: step for step in steps}
+        with ThreadPoolExecutor(max_workers=AGENT_STEP_WORKERS) as pool:
+            running = {}
+            while True:
+                for step in steps:
+                    if step["status"] != "waiting":
+                        continue
+                    deps = [by_number[n]["status"] for n in step["after"] if n in by_number]
+                    if any(status in ("error", "skipped") for status in deps):
+                        step["status"] = "skipped"
+                        finished += 1
+                        report(step)
+                    elif all(status == "completed" for status in deps):
+                        step["status"] = "running"
+                        step["started_at"] = time.time()
+                        # Worker threads join the caller's trace
+                        running[pool.submit(contextvars.copy_context().run, run_step, step)] = step
+                        report(step)
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    step["finished_at"] = time.time()
+                    step["duration"] = round(step["finished_at"] - step["started_at"], 3)
+                    finished += 1
+                    try:
+                        partial = future.result()
+                        results.update(partial)
+                        step["status"] = "completed"
+                        report(step, partial)
+                    except Exception as e:
+                        step["status"] = "error"
+                        step["error"] = str(e)
+                        report(step)
+        
+        # Steps left waiting depend on each other in a cycle
+        for step in steps:
+            if step["status"] == "waiting":
+                step["status"] = "skipped"
+        
+        results["steps"] = steps
+        return results
+    
     @abstractmethod
     def summarize(self, results: Dict[str, Any]) -> str:
         """Summarize the results for the user"""
         pass
     
+    def defer(self, name: str, prompt: str) -> None:
+        """Record a narrative output to generate lazily instead of now"""
+        self.deferred_outputs[name] = prompt
+    
     def get_jurisdiction_info(self, memory: Dict[str, Any]) -> str:
         """Get jurisdiction-specific information"""
         jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
-        
-        jurisdiction_info = {
-            "CA": "California state law applies. Consumer-friendly jurisdiction.",
-            "NY": "New York state law applies. Complex legal environment.", 
-            "TX": "Texas state law applies. Business-friendly jurisdiction.",
-            "FL": "Florida state law applies. Varies by county."
-        }
-        
-        return jurisdiction_info.get(jurisdiction, "General US legal principles apply.")
+        return lookup_knowledge(jurisdiction)["info"]
     
     def extract_key_facts(self, case_context: str) -> Dict[str, Any]:
         """Extract key facts from case description using LLM"""
         
+        if case_context in self.key_facts_cache:
+            return self.key_facts_cache[case_context]
+        
         extraction_prompt = f"""
         Extract key facts from this legal case description:
         
@@ -58,36 +160,27 @@ class BaseAgent(ABC):
         
         try:
             facts = self.llm_client.chat(extraction_prompt)
-            return {"extracted_facts": facts}
+            self.key_facts_cache[case_context] = {"extracted_facts": facts}
+            return self.key_facts_cache[case_context]
         except Exception as e:
             return {"extracted_facts": "Unable to extract facts", "error": str(e)}
     
+    def find_similar_cases(self, memory: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+        """Rank the user's past cases against the current case description"""
+        
+        conversations = memory.get("conversations", [])
+        case_context = conversations[-1].get("prompt", "") if conversations else ""
+        
+        ranked = rank_similar_cases([case_context], memory.get("past_cases", []), k=k, index=self.case_index)[0]
+        return [
+            {"description": hit["case"].get("description", ""), "outcome": hit["case"].get("outcome"), "score": hit["score"]}
+            for hit in ranked
+        ]
+    
     def research_strategies(self, case_type: str, jurisdiction: str) -> List[str]:
         """Research common strategies for this case type"""
         
-        # Mock strategy database - would be populated from legal research
-        strategies = {
-            "traffic_ticket": [
-                "Challenge radar calibration",
-                "Question officer testimony", 
-                "Request traffic school",
-                "Negotiate reduced charges"
-            ],
-            "small_claims": [
-                "Gather documentary evidence",
-                "Prepare witness testimony",
-                "Calculate damages accurately",
-                "Consider settlement options"
-            ],
-            "landlord_tenant": [
-                "Review lease terms carefully",
-                "Document property conditions",
-                "Know tenant rights",
-                "Seek mediation first"
-            ]
-        }
-        
-        return strategies.get(case_type, ["Consult legal precedents", "Gather evidence", "Consider alternatives"])
+        return list(lookup_knowledge(jurisdiction, case_type)["strategies"])
     
     def estimate_timeline(self, case_complexity: str = "medium") -> Dict[str, Any]:
         """Estimate case timeline based on complexity"""
@@ -103,21 +196,4 @@ class BaseAgent(ABC):
     def generate_forms_list(self, case_type: str, jurisdiction: str) -> List[Dict[str, Any]]:
         """Generate list of required forms"""
         
-        # Mock forms database
-        forms = {
-            "traffic_ticket": [
-                {"name": "Trial by Declaration", "required": True, "deadline_days": 25},
-                {"name": "Request for Traffic School", "required": False, "deadline_days": 30}
-            ],
-            "small_claims": [
-                {"name": "Small Claims Complaint", "required": True, "deadline_days": 0},
-                {"name": "Proof of Service", "required": True, "deadline_days": 15},
-                {"name": "Evidence List", "required": False, "deadline_days": 5}
-            ],
-            "landlord_tenant": [
-                {"name": "Answer to Unlawful Detainer", "required": True, "deadline_days": 5},
-                {"name": "Discovery Requests", "required": False, "deadline_days": 30}
-            ]
-        }
-        
-        return forms.get(case_type, [])
\ No newline at end of file
+        return list(lookup_knowledge(jurisdiction, case_type)["forms"])
\ No newline at end of file
@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 from .base_agent import BaseAgent
+from knowledge_base import lookup as lookup_knowledge, FALLBACK_JURISDICTION
 
 class LandlordTenantAgent(BaseAgent):
     """Specialized agent for landlord-tenant disputes"""
@@ -33,53 +34,63 @@ class LandlordTenantAgent(BaseAgent):
         Create a detailed action plan.
         """
         
-        plan_text = self.llm_client.chat(planning_prompt)
+        # The narrative strategy is only written if the user opens it
+        self.defer("strategy", planning_prompt)
         
         return [
             {
                 "step": 1,
                 "action": "Analyze Lease Agreement",
                 "description": "Review lease terms and identify relevant provisions",
-                "estimated_time": "1 hour"
+                "estimated_time": "1 hour",
+                "produces": ["lease_analysis"],
+                "after": []
             },
             {
                 "step": 2,
                 "action": "Research Tenant Rights",
                 "description": "Identify applicable tenant protection laws",
-                "estimated_time": "2 hours"
+                "estimated_time": "2 hours",
+                "produces": ["tenant_rights"],
+                "after": []
             },
             {
                 "step": 3,
                 "action": "Document Property Conditions",
                 "description": "Gather evidence of property issues or conditions",
-                "estimated_time": "1 hour"
+                "estimated_time": "1 hour",
+                "produces": ["property_documentation", "similar_cases"],
+                "after": []
             },
             {
                 "step": 4,
                 "action": "Calculate Damages",
                 "description": "Determine financial impact and potential claims",
-                "estimated_time": "1 hour"
+                "estimated_time": "1 hour",
+                "produces": ["financial_analysis"],
+                "after": [1, 3]
             },
             {
                 "step": 5,
                 "action": "Prepare Response Strategy",
                 "description": "Develop approach for negotiations or court",
-                "estimated_time": "2 hours"
+                "estimated_time": "2 hours",
+                "produces": ["success_probability"],
+                "after": [1, 2, 3, 4]
             }
         ]
     
-    def execute(self, plan: List[Dict[str, Any]], memory: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute landlord-tenant plan"""
-        
-        results = {
-            "lease_analysis": self._analyze_lease(memory),
-            "tenant_rights": self._research_tenant_rights(memory),
-            "property_documentation": self._document_conditions(memory),
-            "financial_analysis": self._calculate_financial_impact(memory),
-            "success_probability": self._estimate_outcome(memory)
-        }
+    def step_handlers(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Result computations behind each landlord-tenant plan step"""
         
-        return results
+        return {
+            "lease_analysis": self._analyze_lease,
+            "tenant_rights": self._research_tenant_rights,
+            "property_documentation": self._document_conditions,
+            "financial_analysis": self._calculate_financial_impact,
+            "success_probability": self._estimate_outcome,
+            "similar_cases": self.find_similar_cases
+        }
     
     def summarize(self, results: Dict[str, Any]) -> str:
         """Summarize landlord-tenant case"""
@@ -133,22 +144,11 @@ class LandlordTenantAgent(BaseAgent):
         
         jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
         
-        tenant_rights = {
-            "CA": {
-                "habitability_warranty": True,
-                "security_deposit_limit": "2x monthly rent",
-                "notice_period": "30 days for month-to-month",
-                "rent_control": "Varies by city",
-                "key_protections": [
-                    "Just cause eviction requirements",
-                    "Security deposit return timeline (21 days)",
-                    "Right to habitable premises",
-                    "Protection from retaliatory eviction"
-                ]
-            }
-        }
+        tenant_rights = lookup_knowledge(jurisdiction, "landlord_tenant").get("tenant_rights")
+        if tenant_rights is None:
+            tenant_rights = lookup_knowledge(FALLBACK_JURISDICTION, "landlord_tenant")["tenant_rights"]
         
-        return tenant_rights.get(jurisdiction, tenant_rights["CA"])
+        return tenant_rights
     
     def _document_conditions(self, memory: Dict[str, Any]) -> Dict[str, Any]:
         """Document property conditions"""
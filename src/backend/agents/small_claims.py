@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 from .base_agent import BaseAgent
+from knowledge_base import lookup as lookup_knowledge, FALLBACK_JURISDICTION
 
 class SmallClaimsAgent(BaseAgent):
     """Specialized agent for small claims court cases"""
@@ -32,53 +33,63 @@ class SmallClaimsAgent(BaseAgent):
         Create a comprehensive action plan.
         """
         
-        plan_text = self.llm_client.chat(planning_prompt)
+        # The narrative strategy is only written if the user opens it
+        self.defer("strategy", planning_prompt)
         
         return [
             {
                 "step": 1,
                 "action": "Calculate Damages",
                 "description": "Document all losses and calculate total claim amount",
-                "estimated_time": "1 hour"
+                "estimated_time": "1 hour",
+                "produces": ["damage_calculation"],
+                "after": []
             },
             {
                 "step": 2,
                 "action": "Gather Evidence", 
                 "description": "Collect contracts, receipts, photos, communications",
-                "estimated_time": "3 hours"
+                "estimated_time": "3 hours",
+                "produces": ["evidence_list", "similar_cases"],
+                "after": []
             },
             {
                 "step": 3,
                 "action": "Attempt Settlement",
                 "description": "Send demand letter and negotiate resolution",
-                "estimated_time": "1 week"
+                "estimated_time": "1 week",
+                "produces": ["settlement_analysis"],
+                "after": [1]
             },
             {
                 "step": 4,
                 "action": "File Complaint",
                 "description": "Prepare and file small claims complaint",
-                "estimated_time": "2 hours"
+                "estimated_time": "2 hours",
+                "produces": ["filing_requirements"],
+                "after": [1, 2]
             },
             {
                 "step": 5,
                 "action": "Prepare for Hearing",
                 "description": "Organize evidence and practice presentation",
-                "estimated_time": "4 hours"
+                "estimated_time": "4 hours",
+                "produces": ["success_probability"],
+                "after": [2, 3, 4]
             }
         ]
     
-    def execute(self, plan: List[Dict[str, Any]], memory: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute small claims plan"""
-        
-        results = {
-            "damage_calculation": self._calculate_damages(memory),
-            "evidence_list": self._identify_evidence(memory),
-            "settlement_analysis": self._analyze_settlement_options(memory),
-            "filing_requirements": self._get_filing_requirements(memory),
-            "success_probability": self._estimate_success_rate(memory)
-        }
+    def step_handlers(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Result computations behind each small claims plan step"""
         
-        return results
+        return {
+            "damage_calculation": self._calculate_damages,
+            "evidence_list": self._identify_evidence,
+            "settlement_analysis": self._analyze_settlement_options,
+            "filing_requirements": self._get_filing_requirements,
+            "success_probability": self._estimate_success_rate,
+            "similar_cases": self.find_similar_cases
+        }
     
     def summarize(self, results: Dict[str, Any]) -> str:
         """Summarize small claims case"""
@@ -144,16 +155,11 @@ class SmallClaimsAgent(BaseAgent):
         
         jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
         
-        requirements = {
-            "CA": {
-                "max_claim": 10000,
-                "filing_fee": 75,
-                "forms": ["SC-100", "SC-104"],
-                "service_methods": ["Personal service", "Substituted service", "Certified mail"]
-            }
-        }
+        requirements = lookup_knowledge(jurisdiction, "small_claims").get("filing_requirements")
+        if requirements is None:
+            requirements = lookup_knowledge(FALLBACK_JURISDICTION, "small_claims")["filing_requirements"]
         
-        return requirements.get(jurisdiction, requirements["CA"])
+        return requirements
     
     def _estimate_success_rate(self, memory: Dict[str, Any]) -> int:
         """Estimate case success rate"""
@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 from .base_agent import BaseAgent
+from knowledge_base import lookup as lookup_knowledge
 
 class TrafficTicketAgent(BaseAgent):
     """Specialized agent for traffic ticket cases"""
@@ -31,7 +32,8 @@ class TrafficTicketAgent(BaseAgent):
         Create a step-by-step plan with specific actions.
         """
         
-        plan_text = self.llm_client.chat(planning_prompt)
+        # The narrative strategy is only written if the user opens it
+        self.defer("strategy", planning_prompt)
         
         # Convert to structured plan
         return [
@@ -39,39 +41,46 @@ class TrafficTicketAgent(BaseAgent):
                 "step": 1,
                 "action": "Analyze Ticket Details",
                 "description": "Review citation for errors and potential defenses",
-                "estimated_time": "30 minutes"
+                "estimated_time": "30 minutes",
+                "produces": ["ticket_analysis"],
+                "after": []
             },
             {
                 "step": 2, 
                 "action": "Research Officer History",
                 "description": "Check officer's training and calibration records",
-                "estimated_time": "1 hour"
+                "estimated_time": "1 hour",
+                "produces": ["defense_strategy", "similar_cases"],
+                "after": []
             },
             {
                 "step": 3,
                 "action": "Prepare Defense Documents",
                 "description": "Draft trial by declaration or court appearance prep",
-                "estimated_time": "2 hours"
+                "estimated_time": "2 hours",
+                "produces": ["documents_prepared"],
+                "after": [1, 2]
             },
             {
                 "step": 4,
                 "action": "File Response",
                 "description": "Submit appropriate response within deadline",
-                "estimated_time": "30 minutes"
+                "estimated_time": "30 minutes",
+                "produces": ["success_probability"],
+                "after": [3]
             }
         ]
     
-    def execute(self, plan: List[Dict[str, Any]], memory: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute traffic ticket defense plan"""
-        
-        results = {
-            "ticket_analysis": self._analyze_ticket(memory),
-            "defense_strategy": self._select_defense_strategy(memory),
-            "documents_prepared": self._prepare_documents(memory),
-            "success_probability": self._calculate_success_rate(memory)
-        }
+    def step_handlers(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """Result computations behind each traffic ticket defense plan step"""
         
-        return results
+        return {
+            "ticket_analysis": self._analyze_ticket,
+            "defense_strategy": self._select_defense_strategy,
+            "documents_prepared": self._prepare_documents,
+            "success_probability": self._calculate_success_rate,
+            "similar_cases": self.find_similar_cases
+        }
     
     def summarize(self, results: Dict[str, Any]) -> str:
         """Summarize traffic ticket case results"""
@@ -127,15 +136,7 @@ class TrafficTicketAgent(BaseAgent):
         
         jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
         
-        docs = []
-        if jurisdiction == "CA":
-            docs.extend([
-                "Trial by Declaration Form (TR-205)",
-                "Statement of Facts",
-                "Evidence List"
-            ])
-        
-        return docs
+        return list(lookup_knowledge(jurisdiction, "traffic_ticket").get("documents", []))
     
     def _calculate_success_rate(self, memory: Dict[str, Any]) -> int:
         """Calculate estimated success rate"""
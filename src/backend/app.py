@@ -1,23 +1,57 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Header
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import os
 import json
+import uuid
+import anyio
+import asyncio
+import hashlib
 import logging
+import threading
 from pathlib import Path
+from urllib.parse import quote
 
-from planner import plan_tasks
+from planner import plan_case
+from plan_cache import remember_plan
+from speculation import start_speculation
+from checkpoint import (
+    load_checkpoint, save_checkpoint, new_checkpoint, pending_tasks, find_step,
+    latest_prompt, case_prompt, case_facts, case_inputs
+)
+from replan import annotate_input_hashes, merge_plan
+from lazy_outputs import resolve as resolve_lazy, materialize_artifact
+from artifact_manifest import list_artifacts, record_artifact, pin_artifact, artifact_case_id, uploads_manifest_id
+from file_serving import serve_file, versioned_url
+from renderer import submit_render, shutdown_renderer, RENDERABLE_SUFFIXES
+from deadline_store import list_deadlines, feed_path as deadline_feed_path
+from storage_manager import sweep as sweep_storage, start_sweeper, stop_sweeper, restore_artifact
 from executor import execute_tasks
-from memory import load_memory, save_memory
-from llm_client import LLMClient
+from memory import load_memory, save_memory, project_memory
+from memory_stream import export_ndjson, import_ndjson
+from llm_client import LLMClient, LLMError
+from simulator import simulate_scenarios, DEFAULT_SAMPLES
+from outcome_stats import get_store as get_outcome_store, reload_outcome_stats
+from knowledge_base import get_knowledge_base, reload_knowledge_base
+from retrieval import add_document
+from serialization import orjson, dumps_json
+from metrics import render_prometheus
+from tracing import span
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Agentic Legal Assistant API", version="1.0.0")
+# orjson renders the large agent responses several times faster than stdlib json
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+else:
+    DefaultResponse = JSONResponse
+
+app = FastAPI(title="Agentic Legal Assistant API", version="1.0.0", default_response_class=DefaultResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -28,127 +62,353 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open the root span of each request's trace; its id is returned as X-Trace-Id"""
+    with span("http", method=request.method) as record:
+        response = await call_next(request)
+        # Name by route template so histograms do not grow per case id
+        route = request.scope.get("route")
+        record["name"] = f"{request.method} {route.path if route else 'unmatched'}"
+        record["attributes"]["status"] = response.status_code
+        response.headers["X-Trace-Id"] = record["trace_id"]
+        return response
+
 # Ensure storage directories exist
 os.makedirs("storage/artifacts", exist_ok=True)
 os.makedirs("storage/logs", exist_ok=True)
 
+@app.on_event("startup")
+def load_reference_data():
+    """Load reference tables before the first request needs them"""
+    get_outcome_store()
+    get_knowledge_base()
+    start_sweeper()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    """Let in-flight PDF renders finish before the process exits"""
+    stop_sweeper()
+    shutdown_renderer()
+
 # Request models
 class AgentRequest(BaseModel):
     user_id: str
     prompt: str
     files: Optional[List[str]] = []
+    case_id: Optional[str] = None
+    # Return the case_id at once and run in the background; poll GET /api/agent/{case_id}
+    background: bool = False
 
 class ApproveStepRequest(BaseModel):
     step_id: str
     decision: str
+    case_id: Optional[str] = None
+
+class PinArtifactRequest(BaseModel):
+    path: str
+    pinned: bool = True
+
+class ScenarioRequest(BaseModel):
+    case_description: str
+    jurisdictions: List[str] = ["CA"]
+    strategies: List[str] = ["trial", "mediate", "settle"]
+    evidence_levels: List[str] = ["weak", "moderate", "strong"]
+    samples: int = Field(DEFAULT_SAMPLES, ge=100, le=50000)
+    seed: Optional[int] = None
 
 # Response models
 class AgentResponse(BaseModel):
+    case_id: Optional[str] = None
+    running: bool = False
+    awaiting_approval: Optional[str] = None
     agents: List[Dict[str, Any]]
     timeline: List[Dict[str, Any]]
     artifacts: List[Dict[str, Any]]
     summary: str
+    error: Optional[str] = None
 
 @app.post("/api/agent", response_model=AgentResponse)
-async def run_agent(request: AgentRequest, x_api_key: Optional[str] = Header(None)):
-    """Main endpoint to run the agentic legal assistant"""
+async def run_agent(request: AgentRequest, background_tasks: BackgroundTasks, x_api_key: Optional[str] = Header(None)):
+    """Main endpoint to run the agentic legal assistant
+
+    Passing the case_id of an earlier run with the same prompt resumes it:
+    completed tasks are restored from the checkpoint and only the rest run.
+    A different prompt is a follow-up: the case is re-planned and only tasks
+    whose inputs changed run again. With "background" the response returns
+    at once with "running" set, and the case is polled by its case_id.
+    """
     try:
-        # Initialize LLM client with API key from header or env
-        api_key = x_api_key or os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise HTTPException(status_code=400, detail="No API key provided")
-        
-        llm_client = LLMClient(api_key)
+        llm_client = get_llm_client(x_api_key)
+        case_id = request.case_id or uuid.uuid4().hex
+        state = load_checkpoint(case_id)
+        if state is not None and state.get("user_id") != request.user_id:
+            raise HTTPException(status_code=403, detail="Case belongs to another user")
+        claim_case(case_id)
         
-        # Load user memory
-        memory = load_memory(request.user_id)
-        
-        # Add current prompt to memory
-        memory.setdefault("conversations", []).append({
-            "prompt": request.prompt,
-            "files": request.files,
+        if request.background:
+            background_tasks.add_task(run_case_in_background, request.user_id, request.prompt, request.files, case_id, llm_client)
+            return build_agent_response(state["tasks"] if state else [], case_id)
+        return await run_in_threadpool(run_claimed_case, request.user_id, request.prompt, request.files, case_id, llm_client)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing agent request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/agent/{case_id}", response_model=AgentResponse)
+async def get_agent_run(case_id: str):
+    """Current state of a case, including live step progress while it runs"""
+    state = load_checkpoint(case_id)
+    with _active_lock:
+        running = case_id in _active_cases
+        error = _failed_cases.get(case_id)
+    if state is None and not running:
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+        raise HTTPException(status_code=404, detail="No checkpoint for this case")
+
+    # Still planning when there is no checkpoint yet
+    response = build_agent_response(state["tasks"] if state else [], case_id)
+    if not running:
+        response.error = error
+    return response
+
+@app.post("/api/agent/{case_id}/resume", response_model=AgentResponse)
+async def resume_agent(case_id: str, x_api_key: Optional[str] = Header(None)):
+    """Run whatever is left of a checkpointed case"""
+    try:
+        state = load_checkpoint(case_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="No checkpoint for this case")
+
+        llm_client = get_llm_client(x_api_key)
+        claim_case(case_id)
+        return await run_in_threadpool(run_claimed_case, state["user_id"], latest_prompt(state), None, case_id, llm_client)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resuming case {case_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_llm_client(x_api_key: Optional[str]) -> LLMClient:
+    """Initialize LLM client with API key from header or env"""
+    api_key = x_api_key or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=400, detail="No API key provided")
+
+    return LLMClient(api_key)
+
+# Cases with a run in progress; a case runs at most once at a time. The last
+# error of a failed run is kept so a background run's poller can see it.
+_active_cases = set()
+_failed_cases: Dict[str, str] = {}
+_active_lock = threading.Lock()
+
+def claim_case(case_id: str) -> None:
+    """Mark a case as running, or raise 409 if a run is already in progress"""
+    with _active_lock:
+        if case_id in _active_cases:
+            raise HTTPException(status_code=409, detail="Case is already running")
+        _active_cases.add(case_id)
+        _failed_cases.pop(case_id, None)
+
+def run_claimed_case(user_id: str, prompt: str, files: Optional[List[str]], case_id: str,
+                     llm_client: LLMClient) -> AgentResponse:
+    """run_case for a case claimed with claim_case, releasing it when done"""
+    try:
+        response = run_case(user_id, prompt, files, case_id, llm_client)
+    except Exception as e:
+        with _active_lock:
+            _failed_cases[case_id] = str(e.detail) if isinstance(e, HTTPException) else str(e)
+        raise
+    finally:
+        with _active_lock:
+            _active_cases.discard(case_id)
+    return response
+
+def run_case_in_background(user_id: str, prompt: str, files: Optional[List[str]], case_id: str,
+                           llm_client: LLMClient) -> None:
+    """Background task body; failures are logged and reported to pollers"""
+    try:
+        run_claimed_case(user_id, prompt, files, case_id, llm_client)
+    except Exception:
+        # No request is left to raise into; run_claimed_case recorded the error for get_agent_run
+        logger.exception(f"Background run of case {case_id} failed")
+
+def run_case(user_id: str, prompt: str, files: Optional[List[str]], case_id: str, llm_client: LLMClient) -> AgentResponse:
+    """Plan (or restore) and execute a case, checkpointing after every task"""
+
+    # Load user memory
+    memory = load_memory(user_id)
+    conversations = memory.setdefault("conversations", [])
+
+    # Add current prompt to memory, unless this is a retry of the same prompt
+    if not conversations or conversations[-1].get("prompt") != prompt:
+        conversations.append({
+            "prompt": prompt,
+            "files": files or [],
             "timestamp": "2024-01-01T00:00:00Z"
         })
-        
-        # Plan tasks
-        logger.info(f"Planning tasks for user {request.user_id}")
-        tasks = plan_tasks(request.prompt, memory, llm_client)
-        
+
+    state = load_checkpoint(case_id)
+    if state is not None and state.get("user_id") != user_id:
+        raise HTTPException(status_code=403, detail="Case belongs to another user")
+    speculation = None
+
+    try:
+        if state is not None and latest_prompt(state) == prompt:
+            logger.info(f"Resuming case {case_id}: {len(pending_tasks(state['tasks']))} of {len(state['tasks'])} tasks left")
+        elif state is not None:
+            # Follow-up in the same case: re-plan the whole case, rerun only what changed
+            state["follow_ups"] = list(state.get("follow_ups") or []) + [prompt]
+            state["files"] = sorted(set(state.get("files") or []) | set(files or []))
+            logger.info(f"Re-planning case {case_id} for a follow-up")
+            plan = plan_case(case_prompt(state), memory, llm_client, case_id)
+            state["case_type"], state["jurisdiction"] = plan["case_type"], plan["jurisdiction"]
+            state["tasks"] = merge_plan(state["tasks"], plan["tasks"], case_inputs(state))
+            save_checkpoint(case_id, state)
+        else:
+            # Warm up the likely agent while planning is in flight
+            speculation = start_speculation(prompt, llm_client)
+
+            # Plan tasks
+            logger.info(f"Planning tasks for user {user_id}")
+            plan = plan_case(prompt, memory, llm_client, case_id)
+            state = new_checkpoint(case_id, user_id, prompt, plan, files)
+            annotate_input_hashes(state["tasks"], case_inputs(state))
+            save_checkpoint(case_id, state)
+
+        tasks = state["tasks"]
+
         # Execute tasks
-        logger.info(f"Executing {len(tasks)} tasks")
-        results = execute_tasks(tasks, memory, llm_client)
-        
-        # Save updated memory
-        save_memory(request.user_id, memory)
-        
-        # Create response
-        agents = []
-        timeline = []
-        artifacts = []
-        
-        # Process results to create agents
-        for task in tasks:
-            if task.get("type") == "deploy_agent":
-                agent = {
-                    "id": task.get("id", f"agent_{len(agents)}"),
-                    "name": task.get("agent_name", "Legal Agent"),
-                    "type": task.get("agent_type", "general"),
-                    "status": task.get("status", "running"),
-                    "progress": task.get("progress", 25),
-                    "winPercentage": task.get("win_percentage", 65),
-                    "stepsRemaining": task.get("steps_remaining", 3),
-                    "formsCompleted": task.get("forms_completed", 1),
-                    "contactsNeeded": task.get("contacts_needed", 2),
-                    "summary": task.get("summary", "Analyzing your case and preparing documents..."),
-                    "lastUpdate": "Working on document analysis...",
-                    "artifacts": task.get("artifacts", []),
-                    "formFields": task.get("form_fields", []),
-                    "nextSteps": task.get("next_steps", [])
-                }
-                agents.append(agent)
-        
-        # Create timeline from tasks
-        for i, task in enumerate(tasks):
-            timeline_step = {
-                "id": f"step_{i}",
-                "title": task.get("title", f"Step {i+1}"),
-                "description": task.get("description", "Processing..."),
-                "type": task.get("type", "general"),
-                "status": task.get("status", "running" if i == 0 else "waiting"),
-                "agent": task.get("agent", "Master Agent"),
-                "progress": task.get("progress", 0),
-                "input": task.get("input", {}),
-                "output": task.get("output", {}),
-                "logs": task.get("logs", [])
+        logger.info(f"Executing {len(pending_tasks(tasks))} of {len(tasks)} tasks")
+        results = execute_tasks(tasks, memory, llm_client, context={
+            "speculation": speculation,
+            "case_id": case_id,
+            "user_id": user_id,
+            "case_prompt": case_prompt(state),
+            "case_facts": case_facts(state),
+            "checkpoint": lambda updated: save_checkpoint(case_id, state)
+        })
+    finally:
+        if speculation:
+            speculation.cancel()
+
+    # Plans that ran cleanly become candidates for reuse
+    if tasks and not results["failed_tasks"] and not results["awaiting_approval"]:
+        remember_plan(case_prompt(state), state["case_type"], state["jurisdiction"], tasks, memory)
+
+    # Save updated memory
+    save_memory(user_id, memory)
+
+    # The run is over even though the case is released only after this returns
+    return build_agent_response(tasks, case_id, running=False)
+
+def build_agent_response(tasks: List[Dict[str, Any]], case_id: str, running: Optional[bool] = None) -> AgentResponse:
+    """Shape executed tasks into the agents/timeline/artifacts response"""
+
+    # Create response
+    agents = []
+    timeline = []
+
+    # Process results to create agents
+    for task in tasks:
+        if task.get("type") == "deploy_agent":
+            output = task.get("output", {})
+            agent = {
+                "id": task.get("id", f"agent_{len(agents)}"),
+                "name": task.get("agent_name", "Legal Agent"),
+                "type": task.get("agent_type", "general"),
+                "status": task.get("status", "running"),
+                "progress": output.get("progress", task.get("progress", 0)),
+                "winPercentage": task.get("win_percentage", 65),
+                "stepsRemaining": output.get("steps_remaining", task.get("steps_remaining", 3)),
+                "formsCompleted": task.get("forms_completed", 1),
+                "contactsNeeded": task.get("contacts_needed", 2),
+                "summary": task.get("summary", "Analyzing your case and preparing documents..."),
+                "lastUpdate": "Working on document analysis...",
+                "artifacts": task.get("artifacts", output.get("artifacts", [])),
+                "lazyFields": output.get("lazy_fields", {}),
+                "formFields": task.get("form_fields", []),
+                "nextSteps": task.get("next_steps", [])
             }
-            timeline.append(timeline_step)
-        
-        # Create artifacts list
-        artifacts_dir = Path("storage/artifacts")
-        if artifacts_dir.exists():
-            for artifact_file in artifacts_dir.rglob("*"):
-                if artifact_file.is_file():
-                    artifacts.append({
-                        "name": artifact_file.name,
-                        "path": str(artifact_file.relative_to("storage")),
-                        "type": artifact_file.suffix[1:] if artifact_file.suffix else "unknown",
-                        "size": artifact_file.stat().st_size
-                    })
-        
-        return AgentResponse(
-            agents=agents,
-            timeline=timeline,
-            artifacts=artifacts,
-            summary="I've analyzed your legal case and deployed specialized agents to assist you. Review the agent results and timeline for detailed progress."
+            agents.append(agent)
+
+    # Create timeline from tasks
+    for i, task in enumerate(tasks):
+        timeline_step = {
+            "id": f"step_{i}",
+            "title": task.get("title", f"Step {i+1}"),
+            "description": task.get("description", "Processing..."),
+            "type": task.get("type", "general"),
+            "status": task.get("status", "running" if i == 0 else "waiting"),
+            "agent": task.get("agent", "Master Agent"),
+            "progress": task.get("progress", 0),
+            "input": task.get("input", {}),
+            "output": task.get("output", {}),
+            "logs": task.get("logs", [])
+        }
+        timeline.append(timeline_step)
+
+    # Create artifacts list from the case's manifest, with content-versioned URLs
+    artifacts = [
+        {**entry, "url": versioned_url(f"/api/artifact/{quote(entry['path'])}", f"storage/{entry['path']}")}
+        for entry in list_artifacts(case_id)
+    ]
+
+    if running is None:
+        with _active_lock:
+            running = case_id in _active_cases
+
+    # Execution stops at the first step waiting for approval
+    awaiting = next((step["id"] for step in timeline if step["status"] == "awaiting_approval"), None)
+    summary = "I've analyzed your legal case and deployed specialized agents to assist you. Review the agent results and timeline for detailed progress."
+    if awaiting:
+        summary += " Some steps are waiting for your approval before I continue."
+    if running:
+        summary = "I'm working on your case. Agents, timeline and documents update as each step finishes."
+
+    return AgentResponse(
+        case_id=case_id,
+        running=running,
+        awaiting_approval=awaiting,
+        agents=agents,
+        timeline=timeline,
+        artifacts=artifacts,
+        summary=summary
+    )
+
+@app.post("/api/simulate/batch")
+async def simulate_batch(request: ScenarioRequest):
+    """Evaluate a grid of what-if scenarios for one case without any LLM calls
+    
+    The Monte Carlo grid is CPU-bound, so it runs in the threadpool to keep
+    the event loop free for other requests.
+    """
+    try:
+        return await run_in_threadpool(
+            simulate_scenarios,
+            request.case_description,
+            request.jurisdictions,
+            request.strategies,
+            request.evidence_levels,
+            n_samples=request.samples,
+            seed=request.seed
         )
-        
-    except Exception as e:
-        logger.error(f"Error processing agent request: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process files (OCR for PDFs/images)"""
+async def upload_file(file: UploadFile = File(...), user_id: Optional[str] = Form(None)):
+    """Upload and process files (OCR for PDFs/images)
+    
+    With a user_id the file counts toward that user's storage quota and
+    its text becomes searchable in that user's precedent research; anonymous
+    uploads are not indexed.
+    """
     try:
         # Create unique file ID
         file_id = f"file_{len(os.listdir('storage/artifacts')) + 1}"
@@ -184,6 +444,12 @@ async def upload_file(file: UploadFile = File(...)):
             with open(file_path, "r", encoding="utf-8") as f:
                 extracted_text = f.read()
         
+        if user_id:
+            # The stored text lets the user's search index be rebuilt after a restart
+            record_artifact(uploads_manifest_id(user_id), Path(file_path), description="Upload", user_id=user_id,
+                            file_id=file_id, filename=file.filename, text=extracted_text)
+            add_document(user_id, file_id, extracted_text, {"filename": file.filename, "path": file_path})
+        
         return {
             "file_id": file_id,
             "filename": file.filename,
@@ -197,44 +463,259 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/case/{case_id}")
-async def get_case(case_id: str):
-    """Get case information"""
+async def get_case(
+    case_id: str,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    conversations_cursor: Optional[str] = None,
+    past_cases_cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get case information, optionally projected to `fields` with paged history"""
     try:
         memory = load_memory(case_id)
-        return {"case_id": case_id, "memory": memory}
+        
+        try:
+            page = project_memory(
+                memory,
+                fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+                cursors={"conversations": conversations_cursor, "past_cases": past_cases_cursor},
+                limit=limit
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        body = dumps_json({"case_id": case_id, **page})
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        
+        return Response(content=body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting case: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/memory/export")
+async def export_memory(after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1)):
+    """Stream user memory as NDJSON, one user per line; resume with ?after=<last user_id>"""
+    return StreamingResponse(iterate_in_threadpool(export_ndjson(after, limit)), media_type="application/x-ndjson")
+
+@app.post("/api/memory/import")
+async def import_memory(request: Request, overwrite: bool = True):
+    """Import NDJSON user memory from the request body, one line at a time
+    
+    Records run through memory_stream.import_ndjson in a worker thread,
+    which pulls body lines from the event loop as it goes.
+    """
+    async def lines():
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            for line in complete:
+                yield line
+        if buffer:
+            yield buffer
+    
+    body = lines()
+    
+    async def next_line() -> Optional[bytes]:
+        try:
+            return await body.__anext__()
+        except StopAsyncIteration:
+            return None
+    
+    def body_lines():
+        while (line := anyio.from_thread.run(next_line)) is not None:
+            yield line
+    
+    return await run_in_threadpool(import_ndjson, body_lines(), overwrite)
+
 @app.post("/api/approve-step")
-async def approve_step(request: ApproveStepRequest):
-    """Approve or reject a step in the process"""
+async def approve_step(request: ApproveStepRequest, x_api_key: Optional[str] = Header(None)):
+    """Approve or reject a step in the process
+    
+    With a case_id, the decision is recorded on the suspended case, which
+    then resumes from that step and returns the updated agent response.
+    """
     try:
         # Log the decision
         logger.info(f"Step {request.step_id} decision: {request.decision}")
         
-        # Here you would update the step status in your memory/database
-        # For now, just return success
-        return {"status": "success", "message": f"Step {request.step_id} {request.decision}"}
+        if not request.case_id:
+            return {"status": "success", "message": f"Step {request.step_id} {request.decision}"}
+        
+        if request.decision not in ("approve", "reject"):
+            raise HTTPException(status_code=400, detail="Decision must be approve or reject")
         
+        state = load_checkpoint(request.case_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="No checkpoint for this case")
+        
+        task = find_step(state["tasks"], request.step_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Step not found")
+        if task.get("status") != "awaiting_approval":
+            raise HTTPException(status_code=409, detail="Step is not waiting for approval")
+        
+        task["approval"] = "approved" if request.decision == "approve" else "rejected"
+        save_checkpoint(request.case_id, state)
+        
+        llm_client = get_llm_client(x_api_key)
+        claim_case(request.case_id)
+        return await run_in_threadpool(run_claimed_case, state["user_id"], latest_prompt(state), None,
+                                       request.case_id, llm_client)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error approving step: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/lazy/{ref}")
+async def get_lazy_output(ref: str, x_api_key: Optional[str] = Header(None)):
+    """Compute a deferred agent output on first request; later requests hit the cache"""
+    try:
+        llm_client = get_llm_client(x_api_key)
+        resolved = await run_in_threadpool(resolve_lazy, ref, llm_client)
+        if resolved is None:
+            raise HTTPException(status_code=404, detail="Output not found")
+        
+        value, cached = resolved
+        return {"ref": ref, "value": value, "cached": cached}
+        
+    except HTTPException:
+        raise
+    except LLMError as e:
+        logger.error(f"Model failed resolving deferred output: {str(e)}")
+        raise HTTPException(status_code=503, detail="The model could not generate this output; try again")
+    except Exception as e:
+        logger.error(f"Error resolving deferred output: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/artifact/{path:path}")
-async def get_artifact(path: str):
-    """Download an artifact file"""
+async def get_artifact(path: str, request: Request, format: Optional[str] = Query(None),
+                       x_api_key: Optional[str] = Header(None)):
+    """Download an artifact file, generating deferred documents on first download
+    
+    Documents evicted by the storage sweeper are restored unchanged from
+    their archived copy.
+    `format=pdf` returns the document typeset as a PDF, rendered once per
+    distinct content and then served from the render cache. Responses carry
+    a content-hash ETag and honour If-None-Match and Range.
+    """
     try:
         file_path = f"storage/{path}"
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Artifact not found")
+        if not os.path.exists(file_path) and not await run_in_threadpool(restore_artifact, path):
+            api_key = x_api_key or os.getenv("GEMINI_API_KEY")
+            if not api_key or not await run_in_threadpool(materialize_artifact, path, LLMClient(api_key)):
+                raise HTTPException(status_code=404, detail="Artifact not found")
+        
+        if format == "pdf":
+            source = Path(file_path)
+            if source.suffix not in RENDERABLE_SUFFIXES:
+                raise HTTPException(status_code=400, detail="Artifact cannot be rendered as PDF")
+            future = await run_in_threadpool(submit_render, source)
+            pdf_path = await asyncio.wrap_future(future)
+            return await run_in_threadpool(serve_file, request, pdf_path, "application/pdf", source.stem + ".pdf")
         
-        return FileResponse(file_path)
+        return await run_in_threadpool(serve_file, request, file_path)
         
+    except HTTPException:
+        raise
+    except LLMError as e:
+        logger.error(f"Model failed generating artifact: {str(e)}")
+        raise HTTPException(status_code=503, detail="The model could not generate this document; try again")
     except Exception as e:
         logger.error(f"Error getting artifact: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/deadlines/{user_id}")
+async def get_deadlines(user_id: str, case_id: Optional[str] = None):
+    """A user's scheduled deadlines across cases, soonest first"""
+    try:
+        return {"user_id": user_id, "deadlines": await run_in_threadpool(list_deadlines, user_id, case_id)}
+    except Exception as e:
+        logger.error(f"Error listing deadlines: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/deadlines/{user_id}/calendar.ics")
+async def get_deadline_feed(user_id: str, request: Request):
+    """Subscribable ICS feed of all of a user's deadlines"""
+    return await serve_deadline_feed(request, user_id, None)
+
+@app.get("/api/deadlines/{user_id}/{case_id}/calendar.ics")
+async def get_case_deadline_feed(user_id: str, case_id: str, request: Request):
+    """Subscribable ICS feed of one case's deadlines"""
+    return await serve_deadline_feed(request, user_id, case_id)
+
+async def serve_deadline_feed(request: Request, user_id: str, case_id: Optional[str]) -> Response:
+    """The feed is rebuilt only when deadlines change; polls revalidate to a 304"""
+    try:
+        path = await run_in_threadpool(deadline_feed_path, user_id, case_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="No deadlines scheduled")
+        return await run_in_threadpool(serve_file, request, str(path), "text/calendar")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving deadline feed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/outcome-stats/reload")
+async def reload_outcome_statistics(force: bool = False):
+    """Reload the outcome statistics table if its source file changed"""
+    try:
+        return reload_outcome_stats(force=force)
+    except Exception as e:
+        logger.error(f"Error reloading outcome statistics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/artifact-pin")
+async def set_artifact_pin(request: PinArtifactRequest):
+    """Pin a case artifact so the storage sweeper never evicts it (or unpin it)"""
+    try:
+        case_id = artifact_case_id(request.path)
+        entry = await run_in_threadpool(pin_artifact, case_id, request.path, request.pinned) if case_id else None
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        if request.pinned:
+            # A pinned document is kept on disk, so bring back an evicted one
+            await run_in_threadpool(restore_artifact, request.path)
+        return entry
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error pinning artifact: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/storage/sweep")
+async def sweep_storage_now():
+    """Run a retention pass now instead of waiting for the background sweeper"""
+    try:
+        return await run_in_threadpool(sweep_storage)
+    except Exception as e:
+        logger.error(f"Error sweeping storage: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/knowledge-base/reload")
+async def reload_jurisdiction_knowledge(force: bool = False):
+    """Reload the jurisdiction knowledge base if its data file changed"""
+    try:
+        return reload_knowledge_base(force=force)
+    except Exception as e:
+        logger.error(f"Error reloading knowledge base: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Prometheus-format counters and latency histograms"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
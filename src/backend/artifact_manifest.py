@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote, unquote
+
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+# One manifest per case listing the artifacts its tasks wrote
+MANIFEST_DIR = "storage/manifests"
+ARTIFACTS_DIR = Path("storage/artifacts")
+
+# Compressed copies of evicted generated documents, restored on download
+ARCHIVE_DIR = Path("storage/archive")
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def manifest_path(case_id: str) -> str:
+    return os.path.join(MANIFEST_DIR, quote(case_id, safe="") + RECORD_EXTENSION)
+
+def case_artifacts_dir(case_id: Optional[str]) -> Path:
+    """Directory a case writes its artifacts to (the shared root without a case)"""
+    return ARTIFACTS_DIR / quote(case_id, safe="") if case_id else ARTIFACTS_DIR
+
+def uploads_manifest_id(user_id: str) -> str:
+    """Manifest listing a user's uploads, so they count toward the storage quota"""
+    return f"uploads:{user_id}"
+
+def artifact_case_id(path: str) -> Optional[str]:
+    """Case owning an artifact given its path under storage/ (None for shared files).
+
+    Case files live at artifacts/<case>/<file> and agent documents one level
+    deeper, at artifacts/<case>/<agent_id>/<file>.
+    """
+    parts = Path(path).parts
+    if len(parts) >= 3 and parts[0] == ARTIFACTS_DIR.name:
+        return unquote(parts[1])
+    return None
+
+def archive_path(path: str) -> Path:
+    """Where the evicted artifact at storage/<path> is archived"""
+    return ARCHIVE_DIR / (path + ".gz")
+
+def discard_archive(path: str) -> None:
+    """Drop the archived copy of an artifact whose content was replaced"""
+    archive_path(path).unlink(missing_ok=True)
+
+def _lock_for(case_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(case_id, threading.Lock())
+
+def record_artifact(case_id: Optional[str], file_path: Path, **extra: Any) -> Optional[Dict[str, Any]]:
+    """Add or refresh a file in the case's manifest.
+
+    `file_path` is under storage/; the entry stores it relative to storage/
+    as served by /api/artifact. Files that do not exist yet (deferred
+    documents) are listed with size 0. Fields of an existing entry not
+    passed again are kept. The manifest is rewritten atomically.
+    """
+    if not case_id:
+        return None
+
+    path = Path(file_path)
+    entry = {
+        "name": path.name,
+        "path": str(path.relative_to("storage")),
+        "type": path.suffix[1:] if path.suffix else "unknown",
+        "size": path.stat().st_size if path.exists() else 0,
+        "updated_at": time.time(),
+        **extra
+    }
+
+    with _lock_for(case_id):
+        manifest = read_record(manifest_path(case_id), "manifest", default={"artifacts": {}})
+        artifacts = manifest["artifacts"]
+        artifacts[entry["path"]] = {**artifacts.get(entry["path"], {}), **entry}
+        write_record(manifest_path(case_id), manifest, "manifest")
+    return artifacts[entry["path"]]
+
+def pin_artifact(case_id: str, path: str, pinned: bool = True) -> Optional[Dict[str, Any]]:
+    """Set whether storage may evict an artifact; None if the case does not list it"""
+    with _lock_for(case_id):
+        manifest = read_record(manifest_path(case_id), "manifest", default={"artifacts": {}})
+        entry = manifest["artifacts"].get(path)
+        if entry is None:
+            return None
+        entry["pinned"] = pinned
+        write_record(manifest_path(case_id), manifest, "manifest")
+    return entry
+
+def list_artifacts(case_id: Optional[str]) -> List[Dict[str, Any]]:
+    """The case's artifacts in the order they were first written"""
+    if not case_id:
+        return []
+    manifest = read_record(manifest_path(case_id), "manifest", default={"artifacts": {}})
+    return list(manifest["artifacts"].values())
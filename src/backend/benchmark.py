@@ -0,0 +1,371 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+import numpy as np
+
+# Offline benchmarks for the agent pipeline. Everything runs in a scratch
+# storage directory against a stub LLM, so results depend only on our code
+# and the configured stub latency:
+#
+#   python benchmark.py --output bench.json --baseline previous.json
+
+PROMPTS = [
+    "I got a speeding ticket on the highway and the radar reading was wrong",
+    "My landlord kept my security deposit after I moved out",
+    "A contractor took my money and never finished the kitchen remodel",
+    "My employer has not paid my last two paychecks",
+    "The seller broke our contract for a used car"
+]
+
+STUB_PLAN = {
+    "tasks": [
+        {"id": "analyze", "type": "analyze_case", "title": "Analyze Case", "dependencies": []},
+        {"id": "agent", "type": "deploy_agent", "title": "Deploy Agent", "agent_type": "small_claims",
+         "agent_name": "Small Claims Agent", "dependencies": ["analyze"]},
+        {"id": "research", "type": "research_precedent", "title": "Research Precedent", "dependencies": ["analyze"]},
+        {"id": "draft", "type": "draft_documents", "title": "Draft Demand Letter", "document_type": "Demand Letter",
+         "dependencies": ["research"]},
+        {"id": "simulate", "type": "simulate_outcome", "title": "Simulate Outcome", "dependencies": ["analyze"]},
+        {"id": "deadlines", "type": "schedule_deadlines", "title": "Schedule Deadlines", "dependencies": []}
+    ]
+}
+
+STUB_TEXT = "This is a stub response standing in for the model's answer. " * 20
+
+# Latencies, where a larger value is a regression; the rest are throughputs
+LOWER_IS_BETTER = ("_ms",)
+
+class StubModel:
+    """Stands in for the Gemini model: fixed answers after a configurable delay"""
+
+    def __init__(self, latency: float, chunk_size: int = 64):
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        time.sleep(self.latency)
+        if "determine the case type" in prompt:
+            text = "small_claims"
+        elif "valid JSON" in prompt:
+            text = json.dumps(STUB_PLAN)
+        else:
+            text = STUB_TEXT
+
+        if stream:
+            return [StubChunk(text[i:i + self.chunk_size]) for i in range(0, len(text), self.chunk_size)]
+        return StubChunk(text)
+
+class StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+def stub_llm_client(latency: float):
+    """An LLMClient whose model is a StubModel; no API key or network needed"""
+    from llm_client import LLMClient
+
+    client = LLMClient.__new__(LLMClient)
+    client.api_key = "benchmark"
+    client.model = StubModel(latency)
+    return client
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """p50/p99/mean in milliseconds for a list of durations in seconds"""
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3)
+    }
+
+def timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class Server:
+    """The API served by uvicorn on a background thread"""
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="benchmark-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "Server":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+def bench_agent(base_url: str, levels: List[int], requests_per_level: int) -> Dict[str, Any]:
+    """/api/agent latency and throughput as concurrent clients are added"""
+    import httpx
+
+    results = {}
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def one_request(client) -> float:
+        with lock:
+            n = next(counter)
+        payload = {"user_id": f"bench_user_{n % 50}", "prompt": PROMPTS[n % len(PROMPTS)], "case_id": f"bench_case_{n}"}
+        started = time.perf_counter()
+        response = client.post("/api/agent", json=payload, headers={"x-api-key": "benchmark"})
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    with httpx.Client(base_url=base_url, timeout=300, limits=httpx.Limits(max_connections=max(levels))) as client:
+        # Warm caches and imports outside the measurements
+        one_request(client)
+
+        for concurrency in levels:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                started = time.perf_counter()
+                durations = list(pool.map(lambda _: one_request(client), range(requests_per_level)))
+                elapsed = time.perf_counter() - started
+            results[f"c{concurrency}"] = {
+                "concurrency": concurrency,
+                "requests": requests_per_level,
+                **latency_summary(durations),
+                "throughput_rps": round(requests_per_level / elapsed, 3)
+            }
+            print(f"agent c={concurrency}: {results[f'c{concurrency}']}", file=sys.stderr)
+    return results
+
+def bench_memory(user_counts: List[int], operations: int) -> Dict[str, Any]:
+    """load_memory/save_memory cost as the number of stored users grows"""
+    from memory import load_memory, save_memory
+    from memory_stream import import_ndjson, synthetic_records
+
+    results = {}
+    seeded = 0
+    rng = random.Random(0)
+    for count in sorted(user_counts):
+        import_ndjson(synthetic_records(count - seeded, start=seeded))
+        seeded = count
+
+        user_ids = [f"synthetic_{rng.randrange(count):08d}" for _ in range(operations)]
+        loads, saves = [], []
+        for user_id in user_ids:
+            started = time.perf_counter()
+            memory = load_memory(user_id)
+            loads.append(time.perf_counter() - started)
+            saves.append(timed(lambda: save_memory(user_id, memory)))
+
+        results[f"users_{count}"] = {
+            "users": count,
+            "load": {**latency_summary(loads), "ops_per_sec": round(len(loads) / sum(loads), 1)},
+            "save": {**latency_summary(saves), "ops_per_sec": round(len(saves) / sum(saves), 1)}
+        }
+        print(f"memory users={count}: {results[f'users_{count}']}", file=sys.stderr)
+    return results
+
+def sample_image(text: str) -> bytes:
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (1200, 400), "white")
+    ImageDraw.Draw(image).text((40, 160), text, fill="black", font=ImageFont.load_default(size=32))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def bench_upload(base_url: str, files: int) -> Dict[str, Any]:
+    """/api/upload throughput for text documents and images sent through OCR"""
+    import httpx
+
+    samples = {
+        "text": ("notice.txt", (PROMPTS[0] + "\n") * 200, "text/plain"),
+        "image": ("ticket.png", sample_image(PROMPTS[0]), "image/png")
+    }
+    results = {}
+    with httpx.Client(base_url=base_url, timeout=300) as client:
+        for kind, (name, content, content_type) in samples.items():
+            content = content.encode("utf-8") if isinstance(content, str) else content
+            durations, extracted = [], []
+            for _ in range(files):
+                started = time.perf_counter()
+                response = client.post("/api/upload", files={"file": (name, content, content_type)})
+                durations.append(time.perf_counter() - started)
+                response.raise_for_status()
+                extracted.append(response.json().get("extracted_text", ""))
+            total = sum(durations)
+            results[kind] = {
+                "files": files,
+                "bytes_per_file": len(content),
+                **latency_summary(durations),
+                "files_per_sec": round(files / total, 2),
+                "mb_per_sec": round(files * len(content) / total / 1e6, 3),
+                # False when OCR is unavailable here, which makes image numbers incomparable
+                "text_extracted": all(text and not text.endswith("failed") for text in extracted)
+            }
+            print(f"upload {kind}: {results[kind]}", file=sys.stderr)
+    return results
+
+def bench_simulator(seconds: float) -> Dict[str, Any]:
+    """Outcome simulations per second, single case and scenario grid"""
+    from simulator import simulate_case_outcome, simulate_scenarios
+
+    memory = {"past_cases": [], "preferences": {"jurisdiction": "CA"}}
+    cases = {
+        "case_outcome": lambda i: simulate_case_outcome(PROMPTS[i % len(PROMPTS)], memory, seed=i),
+        "scenario_grid": lambda i: simulate_scenarios(PROMPTS[i % len(PROMPTS)], ["CA", "NY", "TX"],
+                                                      ["trial", "mediate", "settle"], ["weak", "moderate", "strong"],
+                                                      seed=i)
+    }
+    results = {}
+    for name, run in cases.items():
+        durations = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            durations.append(timed(lambda: run(len(durations))))
+        results[name] = {
+            "runs": len(durations),
+            **latency_summary(durations),
+            "ops_per_sec": round(len(durations) / sum(durations), 1)
+        }
+        print(f"simulator {name}: {results[name]}", file=sys.stderr)
+    return results
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Latency or throughput metrics that got worse than baseline by more than `tolerance`"""
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    for name, value in now.items():
+        old = before.get(name)
+        if not old or not name.endswith(("_ms", "_sec", "_rps")):
+            continue
+        change = (value - old) / old
+        worse = change > tolerance if name.endswith(LOWER_IS_BETTER) else change < -tolerance
+        if worse:
+            regressions.append({"metric": name, "baseline": old, "current": value, "change": round(change, 3)})
+    return regressions
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected suites in a scratch directory and return the report"""
+    workdir = tempfile.mkdtemp(prefix="legal-bench-")
+    cwd = os.getcwd()
+    # Storage paths are relative, so the scratch directory holds all state
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        import app as api
+        from renderer import shutdown_renderer
+
+        api.get_llm_client = lambda x_api_key: stub_llm_client(args.llm_latency)
+
+        results: Dict[str, Any] = {}
+        with Server(api.app) as server:
+            if "agent" in args.suites:
+                results["agent"] = bench_agent(server.url, args.concurrency, args.requests)
+            if "upload" in args.suites:
+                results["upload"] = bench_upload(server.url, args.files)
+        if "memory" in args.suites:
+            results["memory"] = bench_memory(args.users, args.operations)
+        if "simulator" in args.suites:
+            results["simulator"] = bench_simulator(args.seconds)
+        shutdown_renderer()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "llm_latency": args.llm_latency,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "operations": args.operations,
+            "files": args.files,
+            "seconds": args.seconds
+        },
+        "results": results
+    }
+
+def main(argv: Optional[list] = None) -> int:
+    """Command line entry point; exits 1 when a baseline comparison finds regressions"""
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a stub LLM")
+    parser.add_argument("--output", default="bench_results.json", help="JSON report to write")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before failing")
+    parser.add_argument("--suites", nargs="+", default=["agent", "memory", "upload", "simulator"],
+                        choices=["agent", "memory", "upload", "simulator"])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per stub LLM call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=40, help="/api/agent calls per concurrency level")
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--operations", type=int, default=500, help="Memory loads and saves per user count")
+    parser.add_argument("--files", type=int, default=20, help="Uploads per file type")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Time per simulator benchmark")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                  f"({regression['change']:+.0%})", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    output = os.path.abspath(args.output)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
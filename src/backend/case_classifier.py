@@ -0,0 +1,256 @@
+import json
+import os
+import sys
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+import metrics
+from retrieval import tokenize
+
+CASE_TYPES = [
+    "traffic_ticket", "small_claims", "landlord_tenant",
+    "contract_dispute", "employment", "personal_injury",
+    "family_law", "immigration", "criminal_defense", "general_legal"
+]
+
+# Minimum confidence for answering locally instead of asking the LLM
+CONFIDENCE_THRESHOLD = float(os.getenv("CASE_CLASSIFIER_THRESHOLD", "0.75"))
+
+# LLM-labelled prompts, appended as JSONL and used as training data
+LABEL_LOG_FILE = "storage/logs/case_type_labels.jsonl"
+MODEL_FILE = "storage/case_classifier.npz"
+
+# Hashed feature space for the linear model
+FEATURE_DIM = 2 ** 14
+
+# Keyword rules over stemmed tokens and bigrams (see retrieval.tokenize)
+KEYWORD_RULES: Dict[str, Dict[str, float]] = {
+    "traffic_ticket": {
+        "speed": 1.0, "ticket": 1.0, "traffic": 1.0, "citation": 0.8, "radar": 1.0,
+        "red light": 1.0, "park": 0.6, "dmv": 1.0, "moving violation": 1.0, "highway": 0.5
+    },
+    "small_claims": {
+        "small claim": 1.5, "refund": 0.8, "owe": 0.6, "unpaid": 0.6, "invoice": 0.8,
+        "contractor": 0.8, "damage": 0.4
+    },
+    "landlord_tenant": {
+        "landlord": 1.0, "tenant": 1.0, "lease": 0.8, "evict": 1.0, "eviction": 1.0,
+        "rent": 0.8, "security deposit": 1.0, "mold": 0.8, "apartment": 0.6
+    },
+    "contract_dispute": {
+        "contract": 1.0, "breach": 1.0, "agreement": 0.6, "signed": 0.4
+    },
+    "employment": {
+        "employer": 1.0, "wage": 1.0, "fired": 1.0, "overtime": 1.0, "paycheck": 1.0,
+        "boss": 0.8, "harassment": 0.6, "workplace": 0.8
+    },
+    "personal_injury": {
+        "injury": 1.0, "injur": 1.0, "accident": 0.8, "slip": 0.8, "hurt": 0.8,
+        "medical bill": 1.0
+    },
+    "family_law": {
+        "divorce": 1.5, "custody": 1.5, "child support": 1.5, "alimony": 1.5
+    },
+    "immigration": {
+        "visa": 1.5, "green card": 1.5, "deport": 1.5, "asylum": 1.5, "citizenship": 1.0
+    },
+    "criminal_defense": {
+        "arrest": 1.0, "criminal": 1.0, "felony": 1.5, "misdemeanor": 1.5, "dui": 1.5,
+        "charged": 0.8
+    }
+}
+
+# Added to the rule total so a single weak keyword never reaches the threshold
+RULE_SMOOTHING = 0.5
+
+def _stem_key(phrase: str) -> str:
+    return " ".join(tokenize(phrase))
+
+# Rules re-keyed by stemmed form so they match tokenize() output directly
+_RULES = {
+    case_type: {_stem_key(keyword): weight for keyword, weight in keywords.items()}
+    for case_type, keywords in KEYWORD_RULES.items()
+}
+
+metrics.describe("case_type_fast_path_total", "Case type classifications answered locally (hit) or by the LLM (fallback)")
+
+def features(prompt: str) -> List[str]:
+    """Stemmed unigrams plus adjacent bigrams"""
+    tokens = tokenize(prompt)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+def _hashed(feature_list: List[str]) -> np.ndarray:
+    """Stable feature hashing (crc32, not the per-process randomized hash())"""
+    return np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) % FEATURE_DIM for feature in feature_list),
+        dtype=np.intp, count=len(feature_list)
+    )
+
+def rule_scores(feature_list: List[str]) -> Dict[str, float]:
+    """Summed keyword weights per case type"""
+    scores: Dict[str, float] = {}
+    for feature in feature_list:
+        for case_type, keywords in _RULES.items():
+            weight = keywords.get(feature)
+            if weight:
+                scores[case_type] = scores.get(case_type, 0.0) + weight
+    return scores
+
+class LinearCaseModel:
+    """Multinomial logistic regression over hashed unigram/bigram features"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray):
+        self.weights = weights
+        self.bias = bias
+
+    def predict_proba(self, feature_list: List[str]) -> np.ndarray:
+        logits = self.bias + self.weights[_hashed(feature_list)].sum(axis=0)
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    @classmethod
+    def train(cls, prompts: List[str], labels: List[str], epochs: int = 200,
+              learning_rate: float = 0.5, l2: float = 1e-4) -> "LinearCaseModel":
+        """Full-batch gradient descent on the softmax cross-entropy"""
+        n_classes = len(CASE_TYPES)
+        rows, cols = [], []
+        for row, prompt in enumerate(prompts):
+            hashed = _hashed(features(prompt))
+            rows.extend([row] * len(hashed))
+            cols.extend(hashed.tolist())
+
+        X = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(prompts), FEATURE_DIM))
+        y = np.zeros((len(prompts), n_classes))
+        y[np.arange(len(prompts)), [CASE_TYPES.index(label) for label in labels]] = 1.0
+
+        weights = np.zeros((FEATURE_DIM, n_classes))
+        bias = np.zeros(n_classes)
+        for _ in range(epochs):
+            logits = X @ weights + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            error = (probs - y) / len(prompts)
+            weights -= learning_rate * (X.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(weights.astype(np.float32), bias.astype(np.float32))
+
+    def save(self, path: str = MODEL_FILE) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, classes=np.array(CASE_TYPES))
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE) -> Optional["LinearCaseModel"]:
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if list(data["classes"]) != CASE_TYPES:
+            return None
+        return cls(data["weights"], data["bias"])
+
+_model: Optional[LinearCaseModel] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_model() -> Optional[LinearCaseModel]:
+    """Trained model, loaded from disk on first use (None until trained)"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                _model = LinearCaseModel.load()
+                _model_loaded = True
+    return _model
+
+def reload_model() -> None:
+    """Drop the cached model so the next call picks up a newly trained one"""
+    global _model_loaded
+    with _model_lock:
+        _model_loaded = False
+
+def classify(prompt: str) -> Tuple[str, float]:
+    """Best local guess at the case type and its confidence in [0, 1].
+
+    Keyword rules and, once trained, the linear model each vote. When they
+    agree the stronger confidence stands; when they disagree the winner's
+    confidence is discounted by the loser's.
+    """
+    feature_list = features(prompt)
+    scores = rule_scores(feature_list)
+
+    total = sum(scores.values())
+    if scores:
+        rule_type = max(scores, key=scores.get)
+        rule_confidence = scores[rule_type] / (total + RULE_SMOOTHING)
+    else:
+        rule_type, rule_confidence = "general_legal", 0.0
+
+    model = get_model()
+    if model is None:
+        return rule_type, rule_confidence
+
+    probs = model.predict_proba(feature_list)
+    best = int(np.argmax(probs))
+    model_type, model_confidence = CASE_TYPES[best], float(probs[best])
+
+    if model_type == rule_type:
+        return rule_type, max(rule_confidence, model_confidence)
+    if model_confidence > rule_confidence:
+        return model_type, model_confidence * (1 - rule_confidence)
+    return rule_type, rule_confidence * (1 - model_confidence)
+
+def fast_classify(prompt: str, threshold: float = CONFIDENCE_THRESHOLD) -> Optional[str]:
+    """Case type if the local classifier is confident enough, else None"""
+    case_type, confidence = classify(prompt)
+    hit = confidence >= threshold
+    metrics.increment("case_type_fast_path_total", result="hit" if hit else "fallback")
+    return case_type if hit else None
+
+def log_label(prompt: str, case_type: str) -> None:
+    """Record an LLM-decided label as future training data"""
+    try:
+        os.makedirs(os.path.dirname(LABEL_LOG_FILE), exist_ok=True)
+        with open(LABEL_LOG_FILE, "a") as f:
+            f.write(json.dumps({
+                "prompt": prompt,
+                "case_type": case_type,
+                "timestamp": datetime.now().isoformat()
+            }) + "\n")
+    except Exception as e:
+        print(f"Error logging case type label: {e}")
+
+def train_from_log(path: str = LABEL_LOG_FILE) -> Dict[str, Any]:
+    """Train the linear model on logged LLM labels and save it"""
+    prompts, labels = [], []
+    with open(path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("case_type") in CASE_TYPES:
+                prompts.append(record["prompt"])
+                labels.append(record["case_type"])
+
+    if not prompts:
+        return {"trained": False, "examples": 0}
+
+    model = LinearCaseModel.train(prompts, labels)
+    model.save()
+    reload_model()
+
+    predictions = [CASE_TYPES[int(np.argmax(model.predict_proba(features(p))))] for p in prompts]
+    accuracy = sum(p == l for p, l in zip(predictions, labels)) / len(labels)
+    return {"trained": True, "examples": len(prompts), "training_accuracy": round(accuracy, 4)}
+
+if __name__ == "__main__":
+    # python case_classifier.py train
+    if len(sys.argv) > 1 and sys.argv[1] == "train":
+        print(json.dumps(train_from_log()))
+    else:
+        print("Usage: python case_classifier.py train")
+        sys.exit(1)
@@ -0,0 +1,96 @@
+import os
+import re
+import time
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+CHECKPOINT_DIR = "storage/checkpoints"
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+QUESTION_WORDS = {
+    "what", "how", "when", "why", "who", "where", "which", "can", "could", "should",
+    "would", "will", "do", "does", "did", "is", "are", "am", "may", "shall"
+}
+
+def checkpoint_path(case_id: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, quote(case_id, safe="") + RECORD_EXTENSION)
+
+def load_checkpoint(case_id: str) -> Optional[Dict[str, Any]]:
+    """Saved execution state for a case, or None if it has never run"""
+    try:
+        return read_record(checkpoint_path(case_id), "checkpoint")
+    except Exception as e:
+        print(f"Error loading checkpoint: {e}")
+        return None
+
+def save_checkpoint(case_id: str, state: Dict[str, Any]) -> None:
+    """Persist execution state; written atomically so a crash leaves the previous copy"""
+    state["updated_at"] = time.time()
+    try:
+        write_record(checkpoint_path(case_id), state, "checkpoint")
+    except Exception as e:
+        print(f"Error saving checkpoint: {e}")
+
+def new_checkpoint(case_id: str, user_id: str, prompt: str, plan: Dict[str, Any],
+                   files: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Initial state for a freshly planned case"""
+    return {
+        "case_id": case_id,
+        "user_id": user_id,
+        "prompt": prompt,
+        "follow_ups": [],
+        "files": list(files or []),
+        "case_type": plan["case_type"],
+        "jurisdiction": plan["jurisdiction"],
+        "tasks": plan["tasks"]
+    }
+
+def latest_prompt(state: Dict[str, Any]) -> str:
+    """Most recent message in the case: the last follow-up, else the opening prompt"""
+    follow_ups = state.get("follow_ups") or []
+    return follow_ups[-1] if follow_ups else state["prompt"]
+
+def case_prompt(state: Dict[str, Any]) -> str:
+    """The opening prompt followed by every follow-up, as one case description"""
+    return "\n".join([state["prompt"]] + list(state.get("follow_ups") or []))
+
+def is_question(sentence: str) -> bool:
+    words = sentence.strip().split()
+    return sentence.rstrip().endswith("?") or bool(words and words[0].lower().strip(",") in QUESTION_WORDS)
+
+def case_facts(state: Dict[str, Any]) -> str:
+    """The case as stated: the opening prompt plus follow-up statements.
+
+    Questions in follow-ups ("can I appeal?") ask about the case without
+    changing it, so they are left out; tasks that work from the facts are
+    then reused when a follow-up only asks something.
+    """
+    statements = [
+        sentence
+        for follow_up in state.get("follow_ups") or []
+        for sentence in SENTENCE_END.split(follow_up.strip())
+        if sentence and not is_question(sentence)
+    ]
+    return "\n".join([state["prompt"]] + statements)
+
+def case_inputs(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Inputs tasks read from the case, for replan.input_hashes"""
+    return {
+        "case_prompt": case_prompt(state),
+        "case_facts": case_facts(state),
+        "jurisdiction": state.get("jurisdiction"),
+        "files": sorted(state.get("files") or [])
+    }
+
+def pending_tasks(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Tasks that still need to run (anything not completed or skipped)"""
+    return [task for task in tasks if task.get("status") not in ("completed", "skipped")]
+
+def find_step(tasks: List[Dict[str, Any]], step_id: str) -> Optional[Dict[str, Any]]:
+    """Task by its plan id or by its timeline id ("step_<index>")"""
+    for i, task in enumerate(tasks):
+        if task.get("id") == step_id or f"step_{i}" == step_id:
+            return task
+    return None
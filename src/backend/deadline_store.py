@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+from icalendar import Calendar, Event
+
+import metrics
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+# One record per user holding their deadlines indexed by case; each event
+# keeps its serialized VEVENT so feeds are assembled without re-encoding
+DEADLINE_DIR = "storage/deadlines"
+FEED_DIR = "storage/feeds"
+
+PRODID = "-//Legal Assistant//Case Deadlines//EN"
+
+metrics.describe("deadline_feed_builds_total", "ICS feeds rebuilt because the user's deadlines changed")
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def store_path(user_id: str) -> str:
+    return os.path.join(DEADLINE_DIR, quote(user_id, safe="") + RECORD_EXTENSION)
+
+def _lock_for(user_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(user_id, threading.Lock())
+
+def _load(user_id: str) -> Dict[str, Any]:
+    return read_record(store_path(user_id), "deadlines", default={"user_id": user_id, "revision": 0, "cases": {}})
+
+def event_uid(case_id: str, title: str) -> str:
+    """Stable UID so a re-scheduled deadline updates the client's event"""
+    digest = hashlib.blake2b(f"{case_id}\0{title}".encode("utf-8"), digest_size=12).hexdigest()
+    return f"{digest}@legal-assistant"
+
+def deadline_date(value: str) -> date:
+    """Calendar day of an ISO date or datetime string"""
+    return datetime.fromisoformat(value).date()
+
+def encode_event(case_id: str, deadline: Dict[str, Any], stamp: float) -> str:
+    """One VEVENT as ICS text; deadlines are all-day events"""
+    event = Event()
+    event.add("uid", event_uid(case_id, deadline["title"]))
+    event.add("dtstamp", datetime.fromtimestamp(stamp, tz=timezone.utc))
+    event.add("dtstart", deadline_date(deadline["date"]))
+    event.add("summary", deadline["title"])
+    event.add("priority", 1 if deadline.get("priority") == "high" else 5)
+    event.add("categories", [case_id])
+    return event.to_ical().decode("utf-8")
+
+def _calendar_frame(name: str) -> List[str]:
+    calendar = Calendar()
+    calendar.add("prodid", PRODID)
+    calendar.add("version", "2.0")
+    calendar.add("x-wr-calname", name)
+    head, tail = calendar.to_ical().decode("utf-8").rsplit("END:VCALENDAR", 1)
+    return [head, "END:VCALENDAR" + tail]
+
+def assemble_calendar(events: List[str], name: str = "Case Deadlines") -> str:
+    """Wrap already-encoded VEVENTs in a VCALENDAR"""
+    head, tail = _calendar_frame(name)
+    return head + "".join(events) + tail
+
+def generate_ics_calendar(case_id: str, deadlines: List[Dict[str, Any]]) -> str:
+    """ICS content for a list of deadlines"""
+    stamp = time.time()
+    return assemble_calendar([encode_event(case_id, deadline, stamp) for deadline in deadlines])
+
+def save_deadlines(user_id: str, case_id: str, deadlines: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Replace a case's deadlines in the user's store.
+
+    Deadlines that did not change keep their encoded event, and the store's
+    revision only moves when something did, so feeds are rebuilt only then.
+    Returns the case's index entry.
+    """
+    with _lock_for(user_id):
+        store = _load(user_id)
+        previous = store["cases"].get(case_id, {}).get("events", {})
+        now = time.time()
+
+        events = {}
+        for deadline in deadlines:
+            uid = event_uid(case_id, deadline["title"])
+            fields = {
+                "title": deadline["title"],
+                "date": deadline_date(deadline["date"]).isoformat(),
+                "priority": deadline.get("priority", "medium")
+            }
+            old = previous.get(uid)
+            if old is not None and all(old.get(key) == value for key, value in fields.items()):
+                events[uid] = old
+            else:
+                events[uid] = {**fields, "updated_at": now, "ical": encode_event(case_id, fields, now)}
+
+        if events != previous:
+            store["cases"][case_id] = {"events": events, "updated_at": now}
+            store["revision"] += 1
+            write_record(store_path(user_id), store, "deadlines")
+        return store["cases"].get(case_id, {"events": {}})
+
+def list_deadlines(user_id: str, case_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """A user's deadlines, soonest first, optionally for one case"""
+    cases = _load(user_id)["cases"]
+    deadlines = [
+        {"case_id": cid, "uid": uid, "title": event["title"], "date": event["date"], "priority": event["priority"]}
+        for cid, case in cases.items() if case_id is None or cid == case_id
+        for uid, event in case["events"].items()
+    ]
+    return sorted(deadlines, key=lambda deadline: deadline["date"])
+
+def deadline_feed_url(user_id: str, case_id: Optional[str] = None) -> str:
+    """API path clients subscribe to for a user's (or one case's) deadlines"""
+    base = f"/api/deadlines/{quote(user_id, safe='')}"
+    return f"{base}/{quote(case_id, safe='')}/calendar.ics" if case_id is not None else f"{base}/calendar.ics"
+
+def feed_path(user_id: str, case_id: Optional[str] = None) -> Optional[Path]:
+    """Path of the user's current ICS feed (all cases or one), built if stale.
+
+    Feeds are cached per store revision, so an unchanged store is served
+    from the same file and its ETag is never recomputed. None if the user
+    has no deadlines for the scope.
+    """
+    store = _load(user_id)
+    if case_id is not None and case_id not in store["cases"]:
+        return None
+    if not store["cases"]:
+        return None
+
+    feed_dir = Path(FEED_DIR) / quote(user_id, safe="")
+    feed_dir = feed_dir / "cases" / quote(case_id, safe="") if case_id is not None else feed_dir / "all"
+    path = feed_dir / f"{store['revision']}.ics"
+    if path.exists():
+        return path
+
+    with _lock_for(user_id):
+        if path.exists():
+            return path
+        events = [
+            event["ical"]
+            for cid, case in store["cases"].items() if case_id is None or cid == case_id
+            for event in case["events"].values()
+        ]
+        name = f"Case Deadlines ({case_id})" if case_id is not None else "Case Deadlines"
+        feed_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", newline="") as f:
+            f.write(assemble_calendar(events, name))
+        os.replace(tmp_path, path)
+
+        # Older revisions of this feed are never served again
+        for stale in feed_dir.glob("*.ics"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+        metrics.increment("deadline_feed_builds_total")
+    return path
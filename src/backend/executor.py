@@ -1,28 +1,93 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 import os
+import time
 from pathlib import Path
 from llm_client import LLMClient
 from simulator import simulate_case_outcome
+from retrieval import rank_similar_cases, search_documents, user_case_index
+from lazy_outputs import register as register_lazy, register_artifact
+from renderer import prerender
+from artifact_manifest import case_artifacts_dir, record_artifact, discard_archive
+from deadline_store import save_deadlines, assemble_calendar, generate_ics_calendar, deadline_feed_url
+from tracing import span
+from agents.base_agent import BaseAgent
 from agents.traffic_ticket import TrafficTicketAgent
 from agents.small_claims import SmallClaimsAgent
 from agents.landlord_tenant import LandlordTenantAgent
 
-def execute_tasks(tasks: List[Dict[str, Any]], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
-    """Execute all planned tasks"""
+# Specialized agents by agent_type
+AGENT_CLASSES = {
+    "traffic_ticket": TrafficTicketAgent,
+    "small_claims": SmallClaimsAgent,
+    "landlord_tenant": LandlordTenantAgent
+}
+
+def create_agent(agent_type: str, llm_client: LLMClient) -> Optional[BaseAgent]:
+    """Instantiate the specialized agent for a type, or None if there is none"""
+    agent_class = AGENT_CLASSES.get(agent_type)
+    return agent_class(llm_client) if agent_class else None
+
+def execute_tasks(tasks: List[Dict[str, Any]], memory: Dict[str, Any], llm_client: LLMClient,
+                  context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Execute all planned tasks
+    
+    `context` carries per-request state that is not part of memory, such as
+    a speculatively prepared agent or a "checkpoint" callback. Tasks already
+    marked completed (e.g. restored from a checkpoint) are not run again;
+    the checkpoint callback is called with the task list after each task.
+    
+    A task with "requires_approval" suspends execution until its "approval"
+    is "approved": it is marked awaiting_approval, checkpointed, and nothing
+    after it runs. Rejected tasks are skipped.
+    """
+    context = dict(context or {})
+    checkpoint = context.get("checkpoint")
+    if checkpoint:
+        # Lets long tasks persist progress between steps, for polling clients
+        context["task_progress"] = lambda: checkpoint(tasks)
     
     results = {
         "completed_tasks": [],
         "failed_tasks": [],
         "generated_artifacts": [],
-        "deployed_agents": []
+        "deployed_agents": [],
+        "awaiting_approval": None
     }
     
     for task in tasks:
+        if task.get("status") in ("completed", "skipped"):
+            if task["status"] == "completed":
+                results["completed_tasks"].append(task)
+            if task.get("type") == "deploy_agent":
+                results["deployed_agents"].append(task.get("output", {}))
+            continue
+        
+        if task.get("requires_approval") and task.get("approval") != "approved":
+            if task.get("approval") == "rejected":
+                print(f"Skipping rejected task: {task.get('title', 'Unknown')}")
+                task["status"] = "skipped"
+                if checkpoint:
+                    checkpoint(tasks)
+                continue
+            
+            print(f"Waiting for approval: {task.get('title', 'Unknown')}")
+            task["status"] = "awaiting_approval"
+            results["awaiting_approval"] = task
+            if checkpoint:
+                checkpoint(tasks)
+            break
+        
         try:
             print(f"Executing task: {task.get('title', 'Unknown')}")
+            task["status"] = "running"
+            task.pop("error", None)
             
-            task_result = run_task(task, memory, llm_client)
+            with span("run_task", task_id=task.get("id"), task_type=task.get("type")) as record:
+                try:
+                    task_result = run_task(task, memory, llm_client, context)
+                finally:
+                    log_duration(task, record)
             task["status"] = "completed"
             task["output"] = task_result
             task["progress"] = 100
@@ -39,37 +104,61 @@ def execute_tasks(tasks: List[Dict[str, Any]], memory: Dict[str, Any], llm_clien
             task["error"] = str(e)
             task["progress"] = 0
             results["failed_tasks"].append(task)
+        
+        if checkpoint:
+            checkpoint(tasks)
     
     return results
 
-def run_task(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def log_duration(task: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """Add the task's wall time to its timeline logs"""
+    duration = time.time() - record["start"]
+    task["duration"] = round(duration, 3)
+    task.setdefault("logs", []).append(f"Task took {duration:.2f}s (trace {record['trace_id']})")
+
+def case_context(memory: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+    """Case description tasks work from: the whole case when following up, else the latest prompt"""
+    if context and context.get("case_prompt"):
+        return context["case_prompt"]
+    conversations = memory.get("conversations", [])
+    return conversations[-1].get("prompt", "") if conversations else ""
+
+def stated_facts(memory: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+    """Case facts without follow-up questions (checkpoint.case_facts), for tasks replan reuses across questions"""
+    if context and context.get("case_facts"):
+        return context["case_facts"]
+    return case_context(memory, context)
+
+def run_task(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+             context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Execute a single task based on its type"""
     
+    context = context or {}
+    
     task_type = task.get("type", "")
     
     if task_type == "analyze_case":
-        return analyze_case(task, memory, llm_client)
+        return analyze_case(task, memory, llm_client, context)
     elif task_type == "deploy_agent":
-        return deploy_agent(task, memory, llm_client)
+        return deploy_agent(task, memory, llm_client, context)
     elif task_type == "extract_documents":
         return extract_documents(task, memory, llm_client)
     elif task_type == "research_precedent":
-        return research_precedent(task, memory, llm_client)
+        return research_precedent(task, memory, llm_client, context)
     elif task_type == "draft_documents":
-        return draft_documents(task, memory, llm_client)
+        return draft_documents(task, memory, llm_client, context)
     elif task_type == "simulate_outcome":
-        return simulate_outcome(task, memory, llm_client)
+        return simulate_outcome(task, memory, llm_client, context)
     elif task_type == "schedule_deadlines":
-        return schedule_deadlines(task, memory, llm_client)
+        return schedule_deadlines(task, memory, llm_client, context)
     else:
         return {"result": "Unknown task type", "status": "skipped"}
 
-def analyze_case(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def analyze_case(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Analyze the legal case"""
     
-    # Get the latest conversation
-    conversations = memory.get("conversations", [])
-    latest_prompt = conversations[-1].get("prompt", "") if conversations else ""
+    latest_prompt = case_context(memory, context)
     
     analysis_prompt = f"""
     Perform a detailed legal case analysis:
@@ -94,38 +183,52 @@ def analyze_case(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMCl
         "timeline_estimate": "2-4 weeks"
     }
 
-def deploy_agent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def deploy_agent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Deploy a specialized agent"""
     
     agent_type = task.get("agent_type", "general")
     
+    # Reuse an agent warmed up while planning ran, if it guessed this type
+    speculation = (context or {}).get("speculation")
+    agent = speculation.claim(agent_type) if speculation else None
+    
     # Create appropriate agent
-    if agent_type == "traffic_ticket":
-        agent = TrafficTicketAgent(llm_client)
-    elif agent_type == "small_claims":
-        agent = SmallClaimsAgent(llm_client)
-    elif agent_type == "landlord_tenant":
-        agent = LandlordTenantAgent(llm_client)
-    else:
+    if agent is None:
+        agent = create_agent(agent_type, llm_client)
+    if agent is None:
         # Default generic agent behavior
         return create_generic_agent_result(task, memory)
     
     # Get case context
-    conversations = memory.get("conversations", [])
-    case_context = conversations[-1].get("prompt", "") if conversations else ""
+    case_text = stated_facts(memory, context)
+    
+    agent.case_index = user_case_index((context or {}).get("user_id"))
     
-    # Execute agent workflow
-    agent_plan = agent.plan(case_context, memory)
-    agent_results = agent.execute(agent_plan, memory)
-    agent_summary = agent.summarize(agent_results)
+    # Execute agent workflow, forwarding per-step progress to the timeline
+    with span("agent.plan", agent_type=agent_type):
+        agent_plan = agent.plan(case_text, memory)
+    with span("agent.execute", agent_type=agent_type, steps=len(agent_plan)):
+        agent_results = agent.execute(agent_plan, memory, on_progress=step_reporter(task, context))
+    with span("agent.summarize", agent_type=agent_type):
+        agent_summary = agent.summarize(agent_results)
+    steps = agent_results.get("steps", [])
+    steps_done = sum(1 for step in steps if step["status"] == "completed")
     
     # Create artifacts directory for this agent
     agent_id = task.get("id", "agent")
-    artifacts_dir = Path(f"storage/artifacts/{agent_id}")
+    case_id = (context or {}).get("case_id")
+    artifacts_dir = case_artifacts_dir(case_id) / agent_id
     artifacts_dir.mkdir(parents=True, exist_ok=True)
     
     # Generate sample artifacts
-    artifacts = generate_sample_artifacts(agent_type, artifacts_dir, llm_client, case_context)
+    artifacts = generate_sample_artifacts(agent_type, artifacts_dir, llm_client, case_text, case_id)
+    
+    # Narratives the agent deferred are fetched by ref when the user opens them
+    lazy_fields = {
+        name: register_lazy(f"{agent_type}:{name}", prompt)
+        for name, prompt in agent.deferred_outputs.items()
+    }
     
     return {
         "agent_id": agent_id,
@@ -135,8 +238,10 @@ def deploy_agent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMCl
         "results": agent_results,
         "summary": agent_summary,
         "artifacts": artifacts,
+        "lazy_fields": lazy_fields,
         "status": "deployed",
-        "progress": 25,
+        "progress": int(100 * steps_done / len(steps)) if steps else 100,
+        "steps_remaining": len(steps) - steps_done,
         "next_steps": [
             {"title": "Review generated documents", "completed": False, "description": "Check draft documents for accuracy"},
             {"title": "Gather additional evidence", "completed": False, "description": "Collect supporting documentation"},
@@ -148,6 +253,32 @@ def deploy_agent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMCl
         ]
     }
 
+def step_reporter(task: Dict[str, Any], context: Optional[Dict[str, Any]] = None):
+    """Progress callback for BaseAgent.execute that updates the task in place
+    
+    Step timings go to the task's timeline logs, partial results to its
+    output, and the task is checkpointed so the run can be polled.
+    """
+    task_progress = (context or {}).get("task_progress")
+    
+    def report(event: Dict[str, Any]) -> None:
+        task["progress"] = event["progress"]
+        if event["status"] == "running":
+            message = f"Step {event['step']} started: {event['action']}"
+        elif event["status"] == "skipped":
+            message = f"Step {event['step']} skipped: {event['action']}"
+        else:
+            message = f"Step {event['step']} {event['status']} in {event['duration']:.2f}s: {event['action']}"
+            if event.get("error"):
+                message += f" ({event['error']})"
+        task.setdefault("logs", []).append(message)
+        if event["partial"]:
+            task.setdefault("output", {}).setdefault("results", {}).update(event["partial"])
+        if task_progress:
+            task_progress()
+    
+    return report
+
 def create_generic_agent_result(task: Dict[str, Any], memory: Dict[str, Any]) -> Dict[str, Any]:
     """Create a generic agent result when specialized agent isn't available"""
     
@@ -188,66 +319,90 @@ def extract_documents(task: Dict[str, Any], memory: Dict[str, Any], llm_client:
         "key_information": "Important case details extracted from documents"
     }
 
-def research_precedent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
-    """Research legal precedents (stubbed with mock data)"""
+def research_precedent(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                       context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Research legal precedents (stubbed with mock data) and rank similar past cases"""
+    
+    case_text = stated_facts(memory, context)
+    
+    similar_cases = rank_similar_cases([case_text], memory.get("past_cases", []), k=5,
+                                       index=user_case_index((context or {}).get("user_id")))[0]
+    related_documents = search_documents([case_text], (context or {}).get("user_id"), k=5)[0]
     
     return {
         "precedents_found": [
             {"case": "Smith v. Jones", "relevance": 0.85, "outcome": "favorable"},
             {"case": "Doe v. Company", "relevance": 0.72, "outcome": "mixed"}
         ],
+        "similar_past_cases": [
+            {"description": hit["case"].get("description", ""), "outcome": hit["case"].get("outcome"), "relevance": hit["score"]}
+            for hit in similar_cases
+        ],
+        "related_documents": [
+            {"file_id": hit["id"], "filename": hit["metadata"].get("filename"), "relevance": hit["score"]}
+            for hit in related_documents
+        ],
         "legal_principles": ["Principle 1", "Principle 2"],
         "recommendations": "Based on precedent research, consider these strategies..."
     }
 
-def draft_documents(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def draft_documents(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                    context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Draft legal documents"""
     
-    conversations = memory.get("conversations", [])
-    case_context = conversations[-1].get("prompt", "") if conversations else ""
-    
     draft_prompt = f"""
     Draft a legal document for this case:
     
-    Case: {case_context}
+    Case: {stated_facts(memory, context)}
     Document Type: {task.get('document_type', 'General Legal Letter')}
     Jurisdiction: {memory.get('preferences', {}).get('jurisdiction', 'CA')}
     
     Create a professional legal document with proper formatting.
     """
     
-    draft_content = llm_client.chat(draft_prompt)
-    
-    # Save draft to file
+    # Stream the draft to its file; the preview is published from the first chunk
     doc_name = f"draft_{task.get('id', 'document')}.txt"
-    doc_path = Path(f"storage/artifacts/{doc_name}")
+    case_id = (context or {}).get("case_id")
+    doc_path = case_artifacts_dir(case_id) / doc_name
     doc_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(doc_path, "w") as f:
-        f.write(draft_content)
-    
-    return {
+    result = {
         "document_name": doc_name,
-        "document_path": str(doc_path),
-        "content_preview": draft_content[:200] + "..." if len(draft_content) > 200 else draft_content
+        "document_path": str(doc_path)
     }
+    task_progress = (context or {}).get("task_progress")
+    
+    def publish_preview(preview: str) -> None:
+        task["output"] = {**result, "content_preview": preview}
+        if task_progress:
+            task_progress()
+    
+    # Generated text, so storage may archive it when the user is over quota
+    register_artifact(str(doc_path.relative_to("storage")), draft_prompt, case_id)
+    result["content_preview"] = llm_client.stream_to_file(draft_prompt, str(doc_path), on_preview=publish_preview)
+    discard_archive(str(doc_path.relative_to("storage")))
+    record_artifact(case_id, doc_path, description=f"Draft {task.get('document_type', 'General Legal Letter')}",
+                    generated=True, evicted=False)
+    prerender(doc_path)
+    return result
 
-def simulate_outcome(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def simulate_outcome(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                     context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Simulate case outcome"""
     
-    conversations = memory.get("conversations", [])
-    case_context = conversations[-1].get("prompt", "") if conversations else ""
-    
-    outcome = simulate_case_outcome(case_context, memory)
+    outcome = simulate_case_outcome(stated_facts(memory, context), memory, seed=task.get("seed"),
+                                    index=user_case_index((context or {}).get("user_id")))
     
     return {
         "win_probability": outcome.get("win_probability", 65),
         "best_strategy": outcome.get("best_strategy", "Negotiate settlement"),
         "risk_factors": outcome.get("risk_factors", ["Factor 1", "Factor 2"]),
-        "estimated_duration": outcome.get("estimated_duration", "2-3 months")
+        "estimated_duration": outcome.get("estimated_duration", "2-3 months"),
+        "distribution": outcome.get("distribution", {})
     }
 
-def schedule_deadlines(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient) -> Dict[str, Any]:
+def schedule_deadlines(task: Dict[str, Any], memory: Dict[str, Any], llm_client: LLMClient,
+                       context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Schedule important deadlines"""
     
     from datetime import datetime, timedelta
@@ -267,21 +422,37 @@ def schedule_deadlines(task: Dict[str, Any], memory: Dict[str, Any], llm_client:
         }
     ]
     
-    # Generate ICS file
-    calendar_content = generate_ics_calendar(deadlines)
-    ics_path = Path("storage/artifacts/case_deadlines.ics")
+    # Index the deadlines for the user's feeds; the case artifact reuses
+    # the stored events so it only changes when a deadline does
+    case_id = (context or {}).get("case_id")
+    user_id = (context or {}).get("user_id")
+    if case_id and user_id:
+        events = save_deadlines(user_id, case_id, deadlines)["events"]
+        calendar_content = assemble_calendar([event["ical"] for event in events.values()])
+    else:
+        calendar_content = generate_ics_calendar(case_id or "", deadlines)
+    ics_path = case_artifacts_dir(case_id) / "case_deadlines.ics"
+    ics_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(ics_path, "w") as f:
+    with open(ics_path, "w", newline="") as f:
         f.write(calendar_content)
+    record_artifact(case_id, ics_path, description="Case deadlines calendar")
+    prerender(ics_path)
     
     return {
         "deadlines": deadlines,
         "calendar_file": str(ics_path),
+        "feed_url": deadline_feed_url(user_id, case_id) if case_id and user_id else None,
         "reminders_set": len(deadlines)
     }
 
-def generate_sample_artifacts(agent_type: str, artifacts_dir: Path, llm_client: LLMClient, case_context: str) -> List[Dict[str, Any]]:
-    """Generate sample artifacts for the agent"""
+def generate_sample_artifacts(agent_type: str, artifacts_dir: Path, llm_client: LLMClient, case_context: str,
+                              case_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Generate sample artifacts for the agent
+    
+    The document is only registered here; its text is generated the first
+    time it is downloaded (see lazy_outputs.materialize_artifact).
+    """
     
     artifacts = []
     
@@ -294,36 +465,16 @@ def generate_sample_artifacts(agent_type: str, artifacts_dir: Path, llm_client:
     Make it professional but concise (under 500 words).
     """
     
-    doc_content = llm_client.chat(doc_prompt)
     doc_path = artifacts_dir / f"{agent_type}_document.txt"
-    
-    with open(doc_path, "w") as f:
-        f.write(doc_content)
+    register_artifact(str(doc_path.relative_to("storage")), doc_prompt, case_id)
     
     artifacts.append({
         "name": f"{agent_type}_document.txt",
         "path": str(doc_path.relative_to("storage")),
         "type": "txt",
-        "description": f"Generated legal document for {agent_type} case"
+        "description": f"Generated legal document for {agent_type} case",
+        "lazy": True
     })
+    record_artifact(case_id, doc_path, description=artifacts[-1]["description"], lazy=True, generated=True)
     
     return artifacts
-
-def generate_ics_calendar(deadlines: List[Dict[str, Any]]) -> str:
-    """Generate ICS calendar content"""
-    
-    ics_content = """BEGIN:VCALENDAR
-VERSION:2.0
-PRODID:-//Legal Assistant//Case Deadlines//EN
-"""
-    
-    for deadline in deadlines:
-        ics_content += f"""BEGIN:VEVENT
-SUMMARY:{deadline['title']}
-DTSTART:{deadline['date'].replace('-', '').replace(':', '')}Z
-PRIORITY:{1 if deadline['priority'] == 'high' else 5}
-END:VEVENT
-"""
-    
-    ics_content += "END:VCALENDAR"
-    return ics_content
\ No newline at end of file
@@ -0,0 +1,157 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+import metrics
+
+CHUNK_SIZE = 64 * 1024
+
+# Versioned (?v=<etag>) URLs never change content, so clients may keep them
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+metrics.describe("artifact_bytes_served_total", "Artifact body bytes sent, by response status")
+metrics.describe("artifact_not_modified_total", "Artifact requests answered 304 Not Modified")
+
+# ETag by (path, mtime, size), so unchanged files are hashed once
+_etags: Dict[Tuple[str, int, int], str] = {}
+_etags_lock = threading.Lock()
+
+def file_etag(path: str) -> str:
+    """Strong ETag from the file's content hash"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _etags_lock:
+        etag = _etags.get(key)
+    if etag is not None:
+        return etag
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    etag = f'"{digest.hexdigest()}"'
+
+    with _etags_lock:
+        # Drop entries for older versions of the same file
+        for stale in [k for k in _etags if k[0] == key[0]]:
+            del _etags[stale]
+        _etags[key] = etag
+    return etag
+
+def file_version(path: str) -> Optional[str]:
+    """The file's current ?v= value (its ETag without quotes); None if it is missing"""
+    try:
+        return file_etag(path).strip('"')
+    except FileNotFoundError:
+        return None
+
+def versioned_url(url: str, path: str) -> str:
+    """`url` pinned to the current content of `path`, cacheable as immutable"""
+    version = file_version(path)
+    return f"{url}?v={version}" if version else url
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range; None if unsatisfiable.
+
+    Raises ValueError for headers we do not handle (e.g. multiple ranges),
+    which are answered with the whole file.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        raise ValueError(f"Unsupported range: {header}")
+
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(f"Unsupported range: {header}")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+def _read_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+def serve_file(request: Request, path: str, media_type: Optional[str] = None,
+               filename: Optional[str] = None) -> Response:
+    """File response with a strong ETag, conditional GET and byte ranges.
+
+    A request carrying ?v=<current etag> is content-addressed and gets
+    immutable cache headers; anything else must revalidate, which costs a
+    304 with no body while the file is unchanged.
+    """
+    etag = file_etag(path)
+    size = os.path.getsize(path)
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    version = request.query_params.get("v")
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE if version and f'"{version}"' == etag else REVALIDATE_CACHE
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        metrics.increment("artifact_not_modified_total")
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = False
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            byte_range = False
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if filename:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        metrics.increment("artifact_bytes_served_total", end - start + 1, status="206")
+        return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers,
+                                 media_type=media_type)
+
+    metrics.increment("artifact_bytes_served_total", size, status="200")
+    if range_header:
+        # Stale If-Range or a range we do not handle: send the whole file
+        # ourselves so the framework does not apply the range a second time
+        headers["Content-Length"] = str(size)
+        if filename:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return StreamingResponse(_read_range(path, 0, size - 1), headers=headers,
+                                 media_type=media_type)
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# Forms, fees, deadlines, rights and strategies by jurisdiction and case type
+SOURCE_FILE = os.getenv(
+    "KNOWLEDGE_BASE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_base.json")
+)
+
+# Wildcard for entries that apply to every jurisdiction or case type
+ANY = "*"
+
+# Jurisdiction whose rules agents use where a state is not covered yet
+FALLBACK_JURISDICTION = "CA"
+
+class KnowledgeBase:
+    """Jurisdiction knowledge indexed by (jurisdiction, case type).
+
+    Source entries are layered once at load time, most general first:
+    (*, *), (jurisdiction, *), (*, case type), (jurisdiction, case type).
+    Lookups are then a single dict access. Entries are shared between
+    callers and must not be modified.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], mtime: float):
+        self.mtime = mtime
+        layers: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for entry in entries:
+            key = (entry.get("jurisdiction", ANY), entry.get("case_type", ANY))
+            fields = {k: v for k, v in entry.items() if k not in ("jurisdiction", "case_type")}
+            layers.setdefault(key, {}).update(fields)
+
+        self.jurisdictions = {j for j, _ in layers} | {ANY}
+        self.case_types = {t for _, t in layers} | {ANY}
+        self.index: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for jurisdiction in self.jurisdictions:
+            for case_type in self.case_types:
+                merged: Dict[str, Any] = {}
+                for key in ((ANY, ANY), (jurisdiction, ANY), (ANY, case_type), (jurisdiction, case_type)):
+                    merged.update(layers.get(key, {}))
+                self.index[(jurisdiction, case_type)] = merged
+
+    def lookup(self, jurisdiction: str, case_type: str = ANY) -> Dict[str, Any]:
+        """Everything known for a jurisdiction and case type, with wildcard fallbacks"""
+        if jurisdiction not in self.jurisdictions:
+            jurisdiction = ANY
+        if case_type not in self.case_types:
+            case_type = ANY
+        return self.index[(jurisdiction, case_type)]
+
+def _load() -> KnowledgeBase:
+    mtime = os.path.getmtime(SOURCE_FILE)
+    with open(SOURCE_FILE, "r") as f:
+        data = json.load(f)
+    return KnowledgeBase(data.get("entries", []), mtime)
+
+_kb: Optional[KnowledgeBase] = None
+_kb_lock = threading.Lock()
+
+def get_knowledge_base() -> KnowledgeBase:
+    """Return the loaded knowledge base, loading it on first use"""
+    global _kb
+    if _kb is None:
+        with _kb_lock:
+            if _kb is None:
+                _kb = _load()
+    return _kb
+
+def reload_knowledge_base(force: bool = False) -> Dict[str, Any]:
+    """Reload the data file if it changed (or always, with force).
+
+    The new index is swapped in whole, so lookups never see a partial load.
+    """
+    global _kb
+    with _kb_lock:
+        changed = _kb is None or force or os.path.getmtime(SOURCE_FILE) != _kb.mtime
+        if changed:
+            _kb = _load()
+        return {"reloaded": changed, "entries": len(_kb.index)}
+
+def lookup(jurisdiction: str, case_type: str = ANY) -> Dict[str, Any]:
+    """Shortcut for get_knowledge_base().lookup(...)"""
+    return get_knowledge_base().lookup(jurisdiction, case_type)
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import metrics
+from llm_client import LLMClient, LLMError
+from renderer import prerender
+from artifact_manifest import record_artifact, discard_archive
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+# Deferred LLM outputs: the prompt is stored when a task runs and the model
+# is only called the first time someone asks for the value
+LAZY_DIR = "storage/lazy"
+
+metrics.describe("lazy_outputs_total", "Deferred LLM outputs by result (computed on first access, cached after, or failed)")
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+def _ref(kind: str, key: str) -> str:
+    return hashlib.blake2b(f"{kind}\0{key}".encode("utf-8"), digest_size=16).hexdigest()
+
+def _entry_path(ref: str) -> str:
+    return os.path.join(LAZY_DIR, quote(ref, safe="") + RECORD_EXTENSION)
+
+def _lock_for(ref: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(ref, threading.Lock())
+
+def register(kind: str, prompt: str) -> str:
+    """Defer a narrative output; returns the ref used to fetch it later.
+
+    Identical prompts share a ref, so a value computed once is reused.
+    """
+    ref = _ref(kind, prompt)
+    if read_record(_entry_path(ref), "lazy_output") is None:
+        write_record(_entry_path(ref), {"kind": kind, "prompt": prompt, "value": None, "created_at": time.time()}, "lazy_output")
+    return ref
+
+def artifact_ref(path: str) -> str:
+    """Ref of a deferred artifact, derived from its path under storage/"""
+    return _ref("artifact", path)
+
+def register_artifact(path: str, prompt: str, case_id: Optional[str] = None) -> str:
+    """Defer writing an artifact file until it is first downloaded.
+
+    A file (or archived copy) left over from a run with a different prompt
+    is removed so the stale content is never served.
+    """
+    ref = artifact_ref(path)
+    entry = read_record(_entry_path(ref), "lazy_output")
+    if entry is None or entry.get("prompt") != prompt:
+        file_path = Path("storage") / path
+        if file_path.exists():
+            file_path.unlink()
+        discard_archive(path)
+        write_record(_entry_path(ref), {"kind": "artifact", "path": path, "prompt": prompt, "case_id": case_id,
+                                        "created_at": time.time()}, "lazy_output")
+    return ref
+
+def resolve(ref: str, llm_client: LLMClient) -> Optional[Tuple[str, bool]]:
+    """(value, was_cached) for a deferred output, or None if the ref is unknown
+
+    Raises LLMError if the model call fails; nothing is cached, so the next
+    request tries again.
+    """
+    entry = read_record(_entry_path(ref), "lazy_output")
+    if entry is None:
+        return None
+    if entry.get("value") is not None:
+        metrics.increment("lazy_outputs_total", result="cached")
+        return entry["value"], True
+
+    # One LLM call per ref even when several requests open it at once
+    with _lock_for(ref):
+        entry = read_record(_entry_path(ref), "lazy_output")
+        if entry.get("value") is not None:
+            metrics.increment("lazy_outputs_total", result="cached")
+            return entry["value"], True
+
+        # A failed call raises LLMError and leaves the entry empty for a retry
+        try:
+            entry["value"] = llm_client.chat(entry["prompt"], raise_errors=True)
+        except LLMError:
+            metrics.increment("lazy_outputs_total", result="failed")
+            raise
+        entry["computed_at"] = time.time()
+        write_record(_entry_path(ref), entry, "lazy_output")
+        metrics.increment("lazy_outputs_total", result="computed")
+        return entry["value"], False
+
+def materialize_artifact(path: str, llm_client: LLMClient) -> bool:
+    """Write a deferred artifact to storage/<path>; False if none is registered
+
+    Raises LLMError if generation fails, leaving no file behind.
+    """
+    ref = artifact_ref(path)
+    with _lock_for(ref):
+        file_path = Path("storage") / path
+        if file_path.exists():
+            return True
+
+        entry = read_record(_entry_path(ref), "lazy_output")
+        if entry is None:
+            return False
+
+        # Streamed beside the target so downloads never see a partial file
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = file_path.with_name(file_path.name + ".part")
+        try:
+            llm_client.stream_to_file(entry["prompt"], str(part_path))
+        except LLMError:
+            metrics.increment("lazy_outputs_total", result="failed")
+            raise
+        os.replace(part_path, file_path)
+        record_artifact(entry.get("case_id"), file_path, lazy=False, evicted=False)
+        prerender(file_path)
+        metrics.increment("lazy_outputs_total", result="computed")
+        return True
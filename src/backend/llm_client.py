@@ -1,11 +1,18 @@
 import os
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator, Callable
 import google.generativeai as genai
 from dotenv import load_dotenv
+from tracing import span, traced
 
 load_dotenv()
 
+# Characters of a streamed draft shown as its preview
+PREVIEW_CHARS = 200
+
+class LLMError(Exception):
+    """A model call failed, as opposed to returning text"""
+
 class LLMClient:
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
@@ -15,16 +22,67 @@ class LLMClient:
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
     
-    def chat(self, prompt: str, system: str = "") -> str:
-        """Simple chat completion"""
+    @traced("llm.chat")
+    def chat(self, prompt: str, system: str = "", raise_errors: bool = False) -> str:
+        """Simple chat completion
+        
+        Failures come back as "Error: ..." text unless `raise_errors`, in
+        which case LLMError is raised; callers that store the answer use it.
+        """
         try:
             full_prompt = f"{system}\n\n{prompt}" if system else prompt
             response = self.model.generate_content(full_prompt)
             return response.text
         except Exception as e:
+            if raise_errors:
+                raise LLMError(str(e)) from e
             print(f"Error in chat completion: {e}")
             return f"Error: {str(e)}"
     
+    def stream_chat(self, prompt: str, system: str = "", raise_errors: bool = False) -> Iterator[str]:
+        """Chat completion yielded chunk by chunk as the model generates it"""
+        try:
+            full_prompt = f"{system}\n\n{prompt}" if system else prompt
+            with span("llm.stream_chat") as record:
+                chunks = 0
+                for chunk in self.model.generate_content(full_prompt, stream=True):
+                    if chunk.text:
+                        chunks += 1
+                        yield chunk.text
+                record["attributes"]["chunks"] = chunks
+        except Exception as e:
+            if raise_errors:
+                raise LLMError(str(e)) from e
+            print(f"Error in streaming chat completion: {e}")
+            yield f"Error: {str(e)}"
+    
+    @traced("llm.stream_to_file")
+    def stream_to_file(self, prompt: str, path: str, on_preview: Optional[Callable[[str], None]] = None) -> str:
+        """Stream a completion straight into a file, returning its preview
+        
+        Chunks are appended and flushed as they arrive, so the file can be
+        read while it is being written. `on_preview` is called with the
+        preview text from the first chunk until the preview is complete.
+        If the model fails, the partial file is removed and LLMError raised.
+        """
+        preview = ""
+        length = 0
+        try:
+            with open(path, "w") as f:
+                for chunk in self.stream_chat(prompt, raise_errors=True):
+                    f.write(chunk)
+                    f.flush()
+                    length += len(chunk)
+                    if len(preview) < PREVIEW_CHARS:
+                        preview += chunk[:PREVIEW_CHARS - len(preview)]
+                        if on_preview:
+                            on_preview(preview)
+        except LLMError:
+            os.remove(path)
+            raise
+        return preview + "..." if length > PREVIEW_CHARS else preview
+    
+    @traced("llm.structured_chat")
     def structured_chat(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
         """Get structured JSON response"""
         try:
@@ -1,77 +1,323 @@
 import json
 import os
-from typing import Dict, Any
+import copy
+import threading
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 from pathlib import Path
+from urllib.parse import quote, unquote
 
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+MEMORY_DIR = "storage/memory"
+
+# Pre-msgpack single-file store; still read for users not yet migrated
 MEMORY_FILE = "storage/user_memory.json"
 
+DEFAULT_MEMORY = {
+    "best_plans": [],
+    "past_cases": [],
+    "conversations": [],
+    "preferences": {
+        "jurisdiction": "CA",
+        "language": "plain_english"
+    }
+}
+
+LEGACY_READ_SIZE = 1 << 16
+
+# mtime of the legacy file last migrated, so it is only re-read when it changes
+_legacy_migrated: Dict[str, Any] = {"mtime": None}
+_legacy_lock = threading.Lock()
+
 def ensure_storage_exists():
-    """Ensure storage directory and files exist"""
-    os.makedirs("storage", exist_ok=True)
-    if not os.path.exists(MEMORY_FILE):
-        with open(MEMORY_FILE, "w") as f:
-            json.dump({}, f)
+    """Ensure storage directories exist"""
+    os.makedirs(MEMORY_DIR, exist_ok=True)
+
+def memory_path(user_id: str) -> str:
+    """Per-user record path; the user id is percent-encoded so it is filename-safe"""
+    return os.path.join(MEMORY_DIR, quote(user_id, safe="") + RECORD_EXTENSION)
+
+def user_id_from_path(path: str) -> str:
+    """Inverse of memory_path"""
+    return unquote(Path(path).name[:-len(RECORD_EXTENSION)])
+
+def iter_legacy_memory() -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream (user_id, memory) pairs from the old all-users JSON file.
+
+    The file is read in chunks and decoded one user at a time, so only one
+    user's memory is held at once however large the file is.
+    """
+    try:
+        f = open(MEMORY_FILE, "r")
+    except OSError:
+        return
+
+    decoder = json.JSONDecoder()
+    state = {"buffer": "", "pos": 0, "eof": False}
+
+    def fill() -> None:
+        chunk = f.read(LEGACY_READ_SIZE)
+        state["eof"] = not chunk
+        state["buffer"] = state["buffer"][state["pos"]:] + chunk
+        state["pos"] = 0
+
+    def peek() -> str:
+        """Next non-whitespace character, consumed up to but not including it"""
+        while True:
+            buffer, pos = state["buffer"], state["pos"]
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            state["pos"] = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if state["eof"]:
+                raise ValueError(f"Unexpected end of {MEMORY_FILE}")
+            fill()
+
+    def expect(char: str) -> None:
+        if peek() != char:
+            raise ValueError(f"Expected {char!r} in {MEMORY_FILE}")
+        state["pos"] += 1
+
+    def decode() -> Any:
+        while True:
+            try:
+                value, state["pos"] = decoder.raw_decode(state["buffer"], state["pos"])
+                return value
+            except json.JSONDecodeError:
+                if state["eof"]:
+                    raise
+                fill()
+
+    with f:
+        expect("{")
+        if peek() == "}":
+            return
+        while True:
+            user_id = decode()
+            expect(":")
+            peek()
+            yield user_id, decode()
+            if peek() == "}":
+                return
+            expect(",")
+            peek()
+
+def migrate_legacy_memory() -> int:
+    """Copy users that only exist in the legacy JSON file into their own records.
+
+    Runs once per version of the file, streaming it; existing records are
+    newer and are left alone. Returns the number of users migrated.
+    """
+    try:
+        mtime = os.path.getmtime(MEMORY_FILE)
+    except OSError:
+        return 0
+
+    with _legacy_lock:
+        if _legacy_migrated["mtime"] == mtime:
+            return 0
+        ensure_storage_exists()
+        migrated = 0
+        for user_id, memory in iter_legacy_memory():
+            if not os.path.exists(memory_path(user_id)):
+                write_record(memory_path(user_id), memory, "memory")
+                migrated += 1
+        _legacy_migrated["mtime"] = mtime
+    return migrated
 
 def load_memory(user_id: str) -> Dict[str, Any]:
-    """Load user memory from JSON file"""
+    """Load user memory from the user's record, falling back to the legacy JSON file"""
     ensure_storage_exists()
-    
+
     try:
-        with open(MEMORY_FILE, "r") as f:
-            all_memory = json.load(f)
-        
-        return all_memory.get(user_id, {
-            "best_plans": [],
-            "past_cases": [],
-            "conversations": [],
-            "preferences": {
-                "jurisdiction": "CA",
-                "language": "plain_english"
-            }
-        })
+        memory = read_record(memory_path(user_id), "memory")
+        if memory is None:
+            migrate_legacy_memory()
+            memory = read_record(memory_path(user_id), "memory")
+
+        return memory if memory is not None else copy.deepcopy(DEFAULT_MEMORY)
     except Exception as e:
         print(f"Error loading memory: {e}")
-        return {
-            "best_plans": [],
-            "past_cases": [],
-            "conversations": [],
-            "preferences": {
-                "jurisdiction": "CA", 
-                "language": "plain_english"
-            }
-        }
+        return copy.deepcopy(DEFAULT_MEMORY)
 
 def save_memory(user_id: str, memory: Dict[str, Any]) -> None:
-    """Save user memory to JSON file"""
+    """Save user memory to the user's own record
+
+    The caller may have changed past_cases in any way, so the case index is
+    rebuilt here, once per write, rather than checked on every read.
+    """
+    if "past_cases" in memory:
+        memory["case_index"] = build_case_index(memory["past_cases"])
+    _write_memory(user_id, memory)
+
+def _write_memory(user_id: str, memory: Dict[str, Any]) -> None:
+    """Write the memory record as is, keeping its case index"""
     ensure_storage_exists()
-    
+
     try:
-        # Load existing memory
-        with open(MEMORY_FILE, "r") as f:
-            all_memory = json.load(f)
-        
-        # Update user's memory
-        all_memory[user_id] = memory
-        
-        # Save back to file
-        with open(MEMORY_FILE, "w") as f:
-            json.dump(all_memory, f, indent=2)
-            
+        write_record(memory_path(user_id), memory, "memory")
     except Exception as e:
         print(f"Error saving memory: {e}")
 
-def get_case_history(user_id: str, case_type: str = None) -> list:
-    """Get case history for similarity matching"""
-    memory = load_memory(user_id)
-    cases = memory.get("past_cases", [])
+# Past-case fields with a secondary index, mapped to the case key they read
+CASE_INDEX_FIELDS = ("type", "jurisdiction", "outcome")
+
+def _case_index_keys(case: Dict[str, Any]) -> Dict[str, str]:
+    """Index keys for one past case, as recorded on the case"""
+    return {
+        "type": case.get("type") or "unknown",
+        "jurisdiction": case.get("jurisdiction") or "unknown",
+        "outcome": case.get("outcome") or "pending"
+    }
+
+# Bumped when the index layout changes so stored indexes are rebuilt
+CASE_INDEX_VERSION = 2
+
+def build_case_index(past_cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build secondary indexes (field -> value -> list positions) over past cases"""
+    index = {"size": 0, "version": CASE_INDEX_VERSION}
+    for field in CASE_INDEX_FIELDS:
+        index[field] = {}
+    
+    for position, case in enumerate(past_cases):
+        _index_case(index, position, case)
+    
+    return index
+
+def _index_case(index: Dict[str, Any], position: int, case: Dict[str, Any]) -> None:
+    """Add one case position to every secondary index"""
+    for field, value in _case_index_keys(case).items():
+        index[field].setdefault(value, []).append(position)
+    index["size"] = position + 1
+
+def invalidate_case_index(memory: Dict[str, Any]) -> None:
+    """Drop the case index after editing past_cases without save_memory"""
+    memory.pop("case_index", None)
+
+def get_case_index(memory: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the memory's case index, building it if missing or outdated
+    
+    Writers keep the index current (save_memory rebuilds it,
+    add_case_to_history extends it), so reads only check its version and
+    size instead of re-reading every case. Code that edits past_cases in
+    place and keeps using the same dict calls invalidate_case_index.
+    """
+    past_cases = memory.get("past_cases", [])
+    index = memory.get("case_index")
+    
+    if (not index or index.get("version") != CASE_INDEX_VERSION
+            or index.get("size") != len(past_cases)):
+        index = build_case_index(past_cases)
+        memory["case_index"] = index
+    
+    return index
+
+def _matching_positions(memory: Dict[str, Any], case_type: Optional[str] = None,
+                        jurisdiction: Optional[str] = None, outcome: Optional[str] = None) -> Optional[List[int]]:
+    """Positions matching every given filter, or None when no filter is set"""
+    index = get_case_index(memory)
+    filters = [
+        index[field].get(value, [])
+        for field, value in (("type", case_type), ("jurisdiction", jurisdiction), ("outcome", outcome))
+        if value is not None
+    ]
+    
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return filters[0]
+    
+    # Intersect starting from the shortest posting list
+    filters.sort(key=len)
+    matches = set(filters[0])
+    for positions in filters[1:]:
+        matches.intersection_update(positions)
+    return sorted(matches)
+
+def query_cases(memory: Dict[str, Any], case_type: Optional[str] = None, jurisdiction: Optional[str] = None,
+                outcome: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return one page of past cases matching the filters, via the secondary indexes"""
+    past_cases = memory.get("past_cases", [])
+    positions = _matching_positions(memory, case_type, jurisdiction, outcome)
+    
+    if positions is None:
+        end = None if limit is None else offset + limit
+        return past_cases[offset:end]
     
-    if case_type:
-        cases = [case for case in cases if case.get("type") == case_type]
+    end = len(positions) if limit is None else offset + limit
+    return [past_cases[position] for position in positions[offset:end]]
+
+def count_cases(memory: Dict[str, Any], case_type: Optional[str] = None,
+                jurisdiction: Optional[str] = None, outcome: Optional[str] = None) -> int:
+    """Count past cases matching the filters without building the list"""
+    positions = _matching_positions(memory, case_type, jurisdiction, outcome)
     
-    return cases
+    if positions is None:
+        return get_case_index(memory)["size"]
+    return len(positions)
+
+def get_case_history(user_id: str, case_type: str = None, jurisdiction: str = None, outcome: str = None,
+                     offset: int = 0, limit: Optional[int] = None) -> list:
+    """Get case history for similarity matching"""
+    memory = load_memory(user_id)
+    return query_cases(memory, case_type, jurisdiction, outcome, offset, limit)
+
+def count_case_history(user_id: str, case_type: str = None, jurisdiction: str = None, outcome: str = None) -> int:
+    """Count a user's past cases matching the filters"""
+    memory = load_memory(user_id)
+    return count_cases(memory, case_type, jurisdiction, outcome)
 
 def add_case_to_history(user_id: str, case_data: Dict[str, Any]) -> None:
     """Add a completed case to history"""
     memory = load_memory(user_id)
-    memory.setdefault("past_cases", []).append(case_data)
-    save_memory(user_id, memory)
\ No newline at end of file
+    index = get_case_index(memory)
+    past_cases = memory.setdefault("past_cases", [])
+    past_cases.append(case_data)
+    
+    _index_case(index, len(past_cases) - 1, case_data)
+    _write_memory(user_id, memory)
+
+# List fields that can be paged instead of returned whole
+PAGINATED_FIELDS = ("conversations", "past_cases")
+
+# Page size when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 20
+
+# Derived fields that callers only get when they ask for them by name
+INTERNAL_FIELDS = ("case_index",)
+
+def project_memory(memory: Dict[str, Any], fields: Optional[List[str]] = None,
+                   cursors: Optional[Dict[str, str]] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Select memory fields, paging the long lists newest first on request.
+
+    Without a limit or cursor the lists are returned whole, oldest first.
+    A cursor is the list position of the oldest item already returned.
+    Both lists are append-only, so cursors stay valid as new items arrive.
+    Returns {"memory": ..., "next_cursors": {field: cursor or None}}.
+    """
+    cursors = {field: cursor for field, cursor in (cursors or {}).items() if cursor}
+    paged = limit is not None or bool(cursors)
+    limit = limit if limit is not None else DEFAULT_PAGE_SIZE
+    if fields:
+        selected = [field for field in fields if field in memory]
+    else:
+        selected = [field for field in memory if field not in INTERNAL_FIELDS]
+    
+    projected = {}
+    next_cursors = {}
+    for field in selected:
+        value = memory[field]
+        if field not in PAGINATED_FIELDS or not paged:
+            projected[field] = value
+            continue
+        
+        end = len(value)
+        if cursors.get(field):
+            end = max(0, min(end, int(cursors[field])))
+        start = max(0, end - limit)
+        
+        projected[field] = value[start:end][::-1]
+        next_cursors[field] = str(start) if start > 0 else None
+    
+    return {"memory": projected, "next_cursors": next_cursors}
@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import sys
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+from memory import (
+    MEMORY_DIR, DEFAULT_MEMORY, load_memory, save_memory, memory_path,
+    user_id_from_path, ensure_storage_exists, migrate_legacy_memory
+)
+from serialization import dumps_json, loads_json, upgrade, RECORD_EXTENSION, SCHEMA_VERSION
+
+def iter_user_ids(after: Optional[str] = None) -> Iterator[str]:
+    """Yield every stored user id in sorted order, starting after `after`.
+
+    Only file names are held in memory; records are read one at a time by
+    the caller. Users that only exist in the legacy JSON file are migrated
+    to records first, streaming the file.
+    """
+    ensure_storage_exists()
+    migrate_legacy_memory()
+    user_ids = {
+        user_id_from_path(entry.name)
+        for entry in os.scandir(MEMORY_DIR)
+        if entry.is_file() and entry.name.endswith(RECORD_EXTENSION)
+    }
+
+    for user_id in sorted(user_ids):
+        if after is None or user_id > after:
+            yield user_id
+
+def export_ndjson(after: Optional[str] = None, limit: Optional[int] = None) -> Iterator[bytes]:
+    """Stream users as NDJSON lines; resume by passing the last user_id seen as `after`"""
+    for count, user_id in enumerate(iter_user_ids(after)):
+        if limit is not None and count >= limit:
+            break
+        record = {"user_id": user_id, "v": SCHEMA_VERSION, "memory": load_memory(user_id)}
+        yield dumps_json(record) + b"\n"
+
+def import_line(line: bytes, overwrite: bool = True) -> Optional[str]:
+    """Import one NDJSON record, returning its user id (None if skipped)
+
+    Records from older releases are upgraded; a missing or unknown "v"
+    (e.g. an export from a newer release) raises ValueError.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    record = loads_json(line)
+    user_id = record["user_id"]
+    memory = upgrade("memory", record.get("v"), record["memory"])
+    if not overwrite and os.path.exists(memory_path(user_id)):
+        return None
+
+    save_memory(user_id, memory)
+    return user_id
+
+def import_ndjson(lines: Iterable[bytes], overwrite: bool = True) -> Dict[str, Any]:
+    """Import NDJSON records one line at a time.
+
+    The returned cursor is the last user id written, so an interrupted
+    import can be resumed from the matching export cursor.
+    """
+    stats = {"imported": 0, "skipped": 0, "errors": 0, "cursor": None}
+
+    for line in lines:
+        try:
+            user_id = import_line(line, overwrite)
+        except Exception as e:
+            print(f"Error importing memory record: {e}")
+            stats["errors"] += 1
+            continue
+
+        if user_id is None:
+            stats["skipped"] += 1
+        else:
+            stats["imported"] += 1
+            stats["cursor"] = user_id
+
+    return stats
+
+SYNTHETIC_CASE_TYPES = ["traffic_ticket", "small_claims", "landlord_tenant", "contract_dispute", "employment"]
+SYNTHETIC_JURISDICTIONS = ["CA", "NY", "TX", "FL"]
+SYNTHETIC_OUTCOMES = ["won", "lost", "settled", "pending"]
+SYNTHETIC_PROMPTS = [
+    "I got a speeding ticket on the highway",
+    "My landlord kept my security deposit",
+    "A contractor never finished the kitchen remodel",
+    "My employer has not paid my last two paychecks",
+    "The seller broke our contract for a used car"
+]
+
+def synthetic_records(count: int, seed: int = 0, start: int = 0,
+                      cases_per_user: int = 5, conversations_per_user: int = 10) -> Iterator[bytes]:
+    """Generate synthetic users as NDJSON lines, in the same format as export_ndjson"""
+    rng = random.Random(seed)
+
+    for n in range(start, start + count):
+        memory = dict(DEFAULT_MEMORY)
+        memory["preferences"] = {
+            "jurisdiction": rng.choice(SYNTHETIC_JURISDICTIONS),
+            "language": "plain_english"
+        }
+        memory["past_cases"] = [
+            {
+                "description": rng.choice(SYNTHETIC_PROMPTS),
+                "type": rng.choice(SYNTHETIC_CASE_TYPES),
+                "jurisdiction": rng.choice(SYNTHETIC_JURISDICTIONS),
+                "outcome": rng.choice(SYNTHETIC_OUTCOMES)
+            }
+            for _ in range(cases_per_user)
+        ]
+        memory["conversations"] = [
+            {"prompt": rng.choice(SYNTHETIC_PROMPTS), "files": [], "timestamp": "2024-01-01T00:00:00Z"}
+            for _ in range(conversations_per_user)
+        ]
+        memory["best_plans"] = []
+
+        record = {"user_id": f"synthetic_{n:08d}", "v": SCHEMA_VERSION, "memory": memory}
+        yield dumps_json(record) + b"\n"
+
+def main(argv: Optional[list] = None) -> int:
+    """Command line entry point: export, import or seed user memory"""
+    parser = argparse.ArgumentParser(description="Stream user memory as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write all users to NDJSON")
+    export_parser.add_argument("--after", help="Resume after this user id")
+    export_parser.add_argument("--limit", type=int, help="Maximum number of users")
+    export_parser.add_argument("--output", help="Output file (default: stdout)")
+
+    import_parser = commands.add_parser("import", help="Load users from NDJSON")
+    import_parser.add_argument("--input", help="Input file (default: stdin)")
+    import_parser.add_argument("--no-overwrite", action="store_true", help="Skip users that already exist")
+
+    seed_parser = commands.add_parser("seed", help="Import synthetic users for load testing")
+    seed_parser.add_argument("--users", type=int, default=1000)
+    seed_parser.add_argument("--seed", type=int, default=0)
+    seed_parser.add_argument("--start", type=int, default=0, help="First synthetic user number")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for line in export_ndjson(args.after, args.limit):
+                output.write(line)
+        finally:
+            if args.output:
+                output.close()
+        return 0
+
+    if args.command == "import":
+        source = open(args.input, "rb") if args.input else sys.stdin.buffer
+        try:
+            stats = import_ndjson(source, overwrite=not args.no_overwrite)
+        finally:
+            if args.input:
+                source.close()
+    else:
+        stats = import_ndjson(synthetic_records(args.users, args.seed, args.start))
+
+    print(dumps_json(stats).decode("utf-8"), file=sys.stderr)
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
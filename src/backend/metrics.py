@@ -0,0 +1,80 @@
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# Upper bounds in seconds, from a cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# (metric name, sorted label items) -> value
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+# (metric name, sorted label items) -> [per-bucket counts..., +Inf count, sum]
+_histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_buckets: Dict[str, Sequence[float]] = {}
+_help: Dict[str, str] = {}
+_lock = threading.Lock()
+
+def describe(name: str, help_text: str) -> None:
+    """Register the HELP line shown for a metric"""
+    _help[name] = help_text
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Add to a counter, creating it on first use"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> None:
+    """Record a sample in a histogram; the first call fixes its buckets"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        bounds = _buckets.setdefault(name, tuple(buckets))
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(bounds) + 2)
+        series[bisect.bisect_left(bounds, value)] += 1
+        series[-1] += value
+
+def get_counter(name: str, **labels: str) -> float:
+    """Current value of one labelled counter"""
+    return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def render_prometheus() -> str:
+    """Render all counters and histograms in the Prometheus text exposition format"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(series)) for key, series in _histograms.items())
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for (name, labels), series in histograms:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        # Buckets are cumulative in the exposition format
+        cumulative = 0
+        for bound, count in zip(list(_buckets[name]) + ["+Inf"], series[:-1]):
+            cumulative += count
+            le = bound if bound == "+Inf" else f"{bound:g}"
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative:g}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {series[-1]:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative:g}")
+
+    return "\n".join(lines) + "\n"
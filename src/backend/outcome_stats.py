@@ -0,0 +1,126 @@
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Source table, edited by hand and shipped with the code
+SOURCE_FILE = os.getenv(
+    "OUTCOME_STATS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "outcome_stats.csv")
+)
+
+# Columnar copy of the source, memory-mapped at runtime
+COMPILED_FILE = "storage/outcome_stats.npy"
+
+# Row used when a case type or jurisdiction is not in the table
+DEFAULT_CASE_TYPE = "small_claims"
+DEFAULT_JURISDICTION = "*"
+
+DATA_CURRENCY = "Last 12 months"
+
+NUMERIC_COLUMNS = ("win_rate", "average_outcome", "sample_size")
+
+STATS_DTYPE = np.dtype([
+    ("case_type", "<U32"),
+    ("jurisdiction", "<U8"),
+    ("win_rate", "<f4"),
+    ("average_outcome", "<f4"),
+    ("sample_size", "<i4")
+])
+
+class OutcomeStatsStore:
+    """Read-only outcome statistics indexed by (case type, jurisdiction).
+
+    The numeric columns live in a memory-mapped structured array; the
+    (case_type, jurisdiction) -> row index is a small in-process dict.
+    """
+
+    def __init__(self, table: np.ndarray, mtime: float):
+        self.table = table
+        self.mtime = mtime
+        keys = list(zip(table["case_type"].tolist(), table["jurisdiction"].tolist()))
+        self.index: Dict[Tuple[str, str], int] = {key: row for row, key in enumerate(keys)}
+        self.case_types = {case_type for case_type, _ in keys}
+
+    def row_for(self, case_type: str, jurisdiction: str) -> int:
+        """Resolve a pair to a table row, falling back to the default rows"""
+        if case_type not in self.case_types:
+            case_type = DEFAULT_CASE_TYPE
+        row = self.index.get((case_type, jurisdiction))
+        if row is None:
+            row = self.index[(case_type, DEFAULT_JURISDICTION)]
+        return row
+
+    def lookup_many(self, pairs: List[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+        """Column arrays for many (case_type, jurisdiction) pairs in one gather"""
+        rows = np.fromiter((self.row_for(t, j) for t, j in pairs), dtype=np.intp, count=len(pairs))
+        selected = self.table[rows]
+        return {name: selected[name] for name in NUMERIC_COLUMNS}
+
+def compile_stats(source: str = SOURCE_FILE, target: str = COMPILED_FILE) -> None:
+    """Convert the CSV source to the columnar .npy file"""
+    frame = pd.read_csv(source, dtype={"case_type": str, "jurisdiction": str})
+
+    table = np.zeros(len(frame), dtype=STATS_DTYPE)
+    for name in STATS_DTYPE.names:
+        table[name] = frame[name].to_numpy()
+
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_path = target + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp_path, target)
+
+def _load_store() -> OutcomeStatsStore:
+    """Memory-map the columnar table, recompiling it if the source is newer"""
+    mtime = os.path.getmtime(SOURCE_FILE)
+    if not os.path.exists(COMPILED_FILE) or os.path.getmtime(COMPILED_FILE) < mtime:
+        compile_stats()
+
+    table = np.load(COMPILED_FILE, mmap_mode="r")
+    return OutcomeStatsStore(table, mtime)
+
+_store: Optional[OutcomeStatsStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> OutcomeStatsStore:
+    """Return the loaded store, loading it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _load_store()
+    return _store
+
+def reload_outcome_stats(force: bool = False) -> Dict[str, Any]:
+    """Reload the table if the source changed (or always, with force).
+
+    The new store is swapped in whole, so readers never see a mix of old
+    and new rows.
+    """
+    global _store
+    with _store_lock:
+        changed = _store is None or force or os.path.getmtime(SOURCE_FILE) != _store.mtime
+        if changed:
+            if force:
+                compile_stats()
+            _store = _load_store()
+        return {"reloaded": changed, "rows": len(_store.index)}
+
+def get_outcome_statistics_bulk(pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Outcome statistics for many (case_type, jurisdiction) pairs"""
+    if not pairs:
+        return []
+
+    columns = get_store().lookup_many(pairs)
+    return [
+        {
+            "win_rate": round(float(columns["win_rate"][i]), 4),
+            "average_outcome": round(float(columns["average_outcome"][i]), 4),
+            "sample_size": int(columns["sample_size"][i]),
+            "data_currency": DATA_CURRENCY
+        }
+        for i in range(len(pairs))
+    ]
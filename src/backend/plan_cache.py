@@ -0,0 +1,202 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import metrics
+from retrieval import tokenize
+from serialization import read_record, write_record, RECORD_EXTENSION
+
+# Plan structures shared across users, one per case type and jurisdiction.
+# Titles, descriptions and prompt signatures come from a user's own case,
+# so they are only kept in that user's best_plans
+SHARED_CACHE_FILE = "storage/plan_structures" + RECORD_EXTENSION
+# Earlier releases shared whole plans; removed on first load
+LEGACY_SHARED_CACHE_FILE = "storage/plan_cache" + RECORD_EXTENSION
+
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_DAYS", "30")) * 24 * 3600
+MAX_SHARED_PLANS = 500
+MAX_USER_PLANS = 20
+
+# Jaccard overlap of prompt signatures needed to reuse a plan for a new prompt
+SIMILARITY_THRESHOLD = 0.6
+
+# Planning fields worth keeping; everything else is per-run state
+PLAN_FIELDS = (
+    "id", "type", "title", "description", "agent_type", "agent_name", "priority",
+    "estimated_duration", "dependencies", "win_percentage", "forms_completed",
+    "contacts_needed", "steps_remaining", "document_type", "requires_approval"
+)
+
+# Fields of a plan that say nothing about the case it was made for
+STRUCTURAL_FIELDS = ("id", "type", "agent_type", "priority", "estimated_duration", "dependencies", "requires_approval")
+
+# Generic wording for tasks adapted from a shared plan structure
+TASK_TITLES = {
+    "analyze_case": ("Analyze Case", "Review the case details and identify the key issues"),
+    "deploy_agent": ("Deploy Specialist Agent", "Hand the case to an agent specialized in this area of law"),
+    "extract_documents": ("Extract Documents", "Read the uploaded documents for relevant facts"),
+    "research_precedent": ("Research Precedent", "Find similar cases and relevant law"),
+    "draft_documents": ("Draft Documents", "Prepare the documents the case needs"),
+    "simulate_outcome": ("Simulate Outcome", "Estimate the likely outcomes and settlement range"),
+    "schedule_deadlines": ("Schedule Deadlines", "Set the important dates for the case")
+}
+
+metrics.describe("plan_cache_total", "Plan lookups served from the user's plans (exact, similar), a shared plan structure (shared) or planned by the LLM (miss)")
+
+_shared: Optional[Dict[str, Any]] = None
+_lock = threading.Lock()
+
+def prompt_signature(prompt: str) -> List[str]:
+    """Normalized prompt signature: sorted unique stems, numbers dropped"""
+    return sorted({token for token in tokenize(prompt) if not token.isdigit()})
+
+def cache_key(case_type: str, jurisdiction: str, signature: List[str]) -> str:
+    digest = hashlib.blake2b(" ".join(signature).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{case_type}:{jurisdiction}:{digest}"
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    set_a, set_b = set(a), set(b)
+    union = set_a | set_b
+    return len(set_a & set_b) / len(union) if union else 0.0
+
+def _expired(entry: Dict[str, Any], now: float) -> bool:
+    return now - entry.get("created_at", 0) > PLAN_CACHE_TTL_SECONDS
+
+def shape_key(case_type: str, jurisdiction: str) -> str:
+    return f"{case_type}:{jurisdiction}"
+
+def _shared_plans() -> Dict[str, Any]:
+    """Shared plan structures, read from disk once per process"""
+    global _shared
+    if _shared is None:
+        _shared = read_record(SHARED_CACHE_FILE, "plan_structures", default={})
+        if os.path.exists(LEGACY_SHARED_CACHE_FILE):
+            os.remove(LEGACY_SHARED_CACHE_FILE)
+    return _shared
+
+def sanitize_plan(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only planning fields, dropping status, outputs and logs"""
+    return [
+        {field: copy.deepcopy(task[field]) for field in PLAN_FIELDS if field in task}
+        for task in tasks
+    ]
+
+def plan_structure(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only structural fields, safe to share with other users"""
+    return [
+        {field: copy.deepcopy(task[field]) for field in STRUCTURAL_FIELDS if field in task}
+        for task in tasks
+    ]
+
+def adapt_structure(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fresh plan for a new case from a shared structure, with generic wording"""
+    tasks = plan_structure(entry["tasks"])
+    for task in tasks:
+        title, description = TASK_TITLES.get(task.get("type"), ("Case Task", "Work on the case"))
+        task["title"], task["description"] = title, description
+        if task.get("agent_type"):
+            task["agent_name"] = task["agent_type"].replace("_", " ").title() + " Agent"
+        task["cached_plan"] = entry["key"]
+    return tasks
+
+def adapt_plan(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fresh copy of a cached plan for a new case.
+
+    Tasks read the case facts from memory at run time, so a clean copy of
+    the planning fields is enough; each task records where it came from.
+    """
+    tasks = sanitize_plan(entry["tasks"])
+    for task in tasks:
+        task["cached_plan"] = entry["key"]
+    return tasks
+
+def _find(entries: List[Dict[str, Any]], key: str, case_type: str, jurisdiction: str,
+          signature: List[str], now: float) -> Tuple[Optional[Dict[str, Any]], float]:
+    """Exact key match, else the most similar live entry of the same shape"""
+    best, best_score = None, 0.0
+    for entry in entries:
+        if "key" not in entry or _expired(entry, now):
+            continue
+        if entry["key"] == key:
+            return entry, 1.0
+        if entry.get("case_type") != case_type or entry.get("jurisdiction") != jurisdiction:
+            continue
+        score = _jaccard(signature, entry["signature"])
+        if score > best_score:
+            best, best_score = entry, score
+    return best, best_score
+
+def lookup_plan(prompt: str, case_type: str, jurisdiction: str, memory: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Adapted cached plan for this case shape, or None to plan with the LLM
+
+    The user's own plans for a similar prompt come first; otherwise the
+    shared structure for the case type and jurisdiction is used.
+    """
+    now = time.time()
+    signature = prompt_signature(prompt)
+    key = cache_key(case_type, jurisdiction, signature)
+
+    entry, score = _find(memory.get("best_plans", []), key, case_type, jurisdiction, signature, now)
+    if entry is not None and score >= SIMILARITY_THRESHOLD:
+        metrics.increment("plan_cache_total", result="exact" if score == 1.0 else "similar")
+        entry["last_used"] = now
+        entry["hits"] = entry.get("hits", 0) + 1
+        return adapt_plan(entry)
+
+    with _lock:
+        shared = _shared_plans().get(shape_key(case_type, jurisdiction))
+        if shared is None or _expired(shared, now):
+            metrics.increment("plan_cache_total", result="miss")
+            return None
+        shared["last_used"] = now
+        shared["hits"] = shared.get("hits", 0) + 1
+    metrics.increment("plan_cache_total", result="shared")
+    return adapt_structure(shared)
+
+def remember_plan(prompt: str, case_type: str, jurisdiction: str, tasks: List[Dict[str, Any]],
+                  memory: Dict[str, Any]) -> None:
+    """Store a plan whose tasks all completed: in full for the user, and its
+    structure in the shared cache"""
+    now = time.time()
+    signature = prompt_signature(prompt)
+    key = cache_key(case_type, jurisdiction, signature)
+    entry = {
+        "key": key,
+        "case_type": case_type,
+        "jurisdiction": jurisdiction,
+        "signature": signature,
+        "tasks": sanitize_plan(tasks),
+        "created_at": now,
+        "last_used": now,
+        "hits": 0
+    }
+
+    best_plans = [p for p in memory.get("best_plans", []) if p.get("key") != key and not _expired(p, now)]
+    best_plans.append(entry)
+    memory["best_plans"] = best_plans[-MAX_USER_PLANS:]
+
+    with _lock:
+        shared = _shared_plans()
+        structure_key = shape_key(case_type, jurisdiction)
+        shared[structure_key] = {
+            "key": structure_key,
+            "case_type": case_type,
+            "jurisdiction": jurisdiction,
+            "tasks": plan_structure(tasks),
+            "created_at": now,
+            "last_used": now,
+            "hits": 0
+        }
+        for stale in [k for k, e in shared.items() if _expired(e, now)]:
+            del shared[stale]
+        if len(shared) > MAX_SHARED_PLANS:
+            # Evict least recently used
+            for old in sorted(shared, key=lambda k: shared[k].get("last_used", 0))[:len(shared) - MAX_SHARED_PLANS]:
+                del shared[old]
+        try:
+            write_record(SHARED_CACHE_FILE, shared, "plan_structures")
+        except Exception as e:
+            print(f"Error saving plan cache: {e}")
@@ -1,11 +1,38 @@
-from typing import Dict, Any, List
+import hashlib
+import os
+from typing import Dict, Any, List, Optional
 from llm_client import LLMClient
+from memory import count_cases
+from case_classifier import CASE_TYPES, fast_classify, log_label
+from plan_cache import lookup_plan
+from tracing import traced
 
+# Task types that always wait for the user's go-ahead, e.g. "draft_documents"
+APPROVAL_GATED_TYPES = {t.strip() for t in os.getenv("APPROVAL_GATED_TYPES", "").split(",") if t.strip()}
+
+@traced("plan_tasks")
 def plan_tasks(prompt: str, memory: Dict[str, Any], llm_client: LLMClient) -> List[Dict[str, Any]]:
     """Plan tasks based on user prompt and memory"""
+    return plan_case(prompt, memory, llm_client)["tasks"]
+
+@traced("plan_case")
+def plan_case(prompt: str, memory: Dict[str, Any], llm_client: LLMClient,
+              case_id: Optional[str] = None) -> Dict[str, Any]:
+    """Plan tasks, reusing a cached plan for the same case shape when possible
+    
+    With a case_id, simulation tasks get a seed derived from it so a case's
+    outcome estimate is reproducible. Returns {"case_type", "jurisdiction",
+    "tasks", "cached"}.
+    """
     
     # Determine case type and create appropriate plan
     case_type = determine_case_type(prompt, llm_client)
+    jurisdiction = memory.get('preferences', {}).get('jurisdiction', 'CA')
+    
+    cached_tasks = lookup_plan(prompt, case_type, jurisdiction, memory)
+    if cached_tasks:
+        tasks = seed_simulations(mark_approval_gates(cached_tasks), case_id)
+        return {"case_type": case_type, "jurisdiction": jurisdiction, "tasks": tasks, "cached": True}
     
     # Get case-specific planning
     planning_prompt = f"""
@@ -13,8 +40,8 @@ def plan_tasks(prompt: str, memory: Dict[str, Any], llm_client: LLMClient) -> Li
     
     User Request: {prompt}
     Case Type: {case_type}
-    Past Cases: {len(memory.get('past_cases', []))}
-    User Jurisdiction: {memory.get('preferences', {}).get('jurisdiction', 'CA')}
+    Past Cases: {count_cases(memory)} ({count_cases(memory, case_type=case_type)} of this type)
+    User Jurisdiction: {jurisdiction}
     
     Create a plan with these task types:
     1. analyze_case - Initial case analysis
@@ -32,6 +59,9 @@ def plan_tasks(prompt: str, memory: Dict[str, Any], llm_client: LLMClient) -> Li
     - win_percentage: Estimated success rate
     - forms_needed: List of forms to complete
     - contacts_needed: People/entities to contact
+    
+    Set requires_approval to true on any task that files, submits or sends
+    something on the user's behalf, so it waits for the user's approval.
     """
     
     schema = {
@@ -49,7 +79,8 @@ def plan_tasks(prompt: str, memory: Dict[str, Any], llm_client: LLMClient) -> Li
                 "win_percentage": "integer",
                 "forms_completed": "integer",
                 "contacts_needed": "integer",
-                "steps_remaining": "integer"
+                "steps_remaining": "integer",
+                "requires_approval": "boolean"
             }
         ]
     }
@@ -61,10 +92,40 @@ def plan_tasks(prompt: str, memory: Dict[str, Any], llm_client: LLMClient) -> Li
     if not tasks:
         tasks = create_default_plan(case_type, prompt)
     
+    tasks = seed_simulations(mark_approval_gates(tasks), case_id)
+    return {"case_type": case_type, "jurisdiction": jurisdiction, "tasks": tasks, "cached": False}
+
+def mark_approval_gates(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flag tasks of the configured gated types as requiring approval"""
+    for task in tasks:
+        if task.get("type") in APPROVAL_GATED_TYPES:
+            task["requires_approval"] = True
     return tasks
 
+def simulation_seed(case_id: str, task_id: str) -> int:
+    """Stable 32-bit seed for one simulation task of a case"""
+    digest = hashlib.blake2b(f"{case_id}\0{task_id}".encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big")
+
+def seed_simulations(tasks: List[Dict[str, Any]], case_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Give each simulate_outcome task a seed derived from the case"""
+    if case_id:
+        for task in tasks:
+            if task.get("type") == "simulate_outcome":
+                task["seed"] = simulation_seed(case_id, task.get("id", "simulate_outcome"))
+    return tasks
+
+@traced("determine_case_type")
 def determine_case_type(prompt: str, llm_client: LLMClient) -> str:
-    """Determine the type of legal case from the prompt"""
+    """Determine the type of legal case from the prompt
+    
+    Confident local classifications skip the LLM round trip entirely; the
+    LLM's answers for the rest are logged to train the local model.
+    """
+    
+    case_type = fast_classify(prompt)
+    if case_type:
+        return case_type
     
     analysis_prompt = f"""
     Analyze this legal request and determine the case type:
@@ -89,14 +150,10 @@ def determine_case_type(prompt: str, llm_client: LLMClient) -> str:
     case_type = llm_client.chat(analysis_prompt).strip().lower()
     
     # Validate case type
-    valid_types = [
-        "traffic_ticket", "small_claims", "landlord_tenant", 
-        "contract_dispute", "employment", "personal_injury",
-        "family_law", "immigration", "criminal_defense", "general_legal"
-    ]
-    
-    if case_type not in valid_types:
+    if case_type not in CASE_TYPES:
         case_type = "general_legal"
+    else:
+        log_label(prompt, case_type)
     
     return case_type
 
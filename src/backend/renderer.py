@@ -0,0 +1,202 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+
+# Rendered PDFs by content hash of their source; bump RENDER_VERSION when
+# the layout changes so old renders are not served
+RENDER_CACHE_DIR = "storage/render_cache"
+RENDER_VERSION = "2"
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+
+# Letter paper in points with one-inch margins, 12pt Helvetica, 1.5 line spacing
+PAGE_SIZE = (612, 792)
+MARGIN = 72
+FONT_SIZE = 12
+LINE_HEIGHT = 18
+
+# Helvetica advance widths (per 1000 em) for WinAnsi codes 32-126, from the
+# standard font metrics; the font is built into every PDF reader
+HELVETICA_WIDTHS = dict(zip(map(chr, range(32, 127)), (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+)))
+
+RENDERABLE_SUFFIXES = (".txt", ".ics")
+
+metrics.describe("pdf_render_total", "PDF requests served from the render cache (hit) or rendered (miss)")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_lock = threading.RLock()
+
+def content_hash(source: Path) -> str:
+    digest = hashlib.blake2b(RENDER_VERSION.encode("utf-8"), digest_size=16)
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cached_pdf_path(digest: str) -> Path:
+    return Path(RENDER_CACHE_DIR) / f"{digest}.pdf"
+
+def source_lines(source: Path) -> List[str]:
+    """Text to typeset: the document itself, or a deadline list for calendars"""
+    if source.suffix == ".ics":
+        from icalendar import Calendar
+
+        with open(source, "rb") as f:
+            calendar = Calendar.from_ical(f.read())
+        lines = ["Case Deadlines", ""]
+        for event in calendar.walk("VEVENT"):
+            try:
+                when = event.decoded("DTSTART").strftime("%B %d, %Y")
+            except Exception:
+                # Missing or malformed date: show whatever the calendar says
+                when = str(event.get("DTSTART", "Date to be set"))
+            lines.append(f"{when}: {event.get('SUMMARY', 'Deadline')}")
+        return lines
+
+    with open(source, "r", errors="replace") as f:
+        return f.read().splitlines()
+
+def text_width(text: str) -> float:
+    """Width of a line in points when set in Helvetica at FONT_SIZE"""
+    return sum(HELVETICA_WIDTHS.get(ch, 556) for ch in text) * FONT_SIZE / 1000
+
+def wrap_lines(lines: List[str], width: float) -> List[str]:
+    """Greedy word wrap to a width in points"""
+    wrapped = []
+    for line in lines:
+        current = ""
+        for word in line.expandtabs(4).split(" "):
+            candidate = f"{current} {word}" if current else word
+            if current and text_width(candidate) > width:
+                wrapped.append(current)
+                current = word
+            else:
+                current = candidate
+        wrapped.append(current)
+    return wrapped
+
+def pdf_string(text: str) -> bytes:
+    """A PDF literal string in WinAnsi encoding"""
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def page_content(lines: List[str]) -> bytes:
+    """Content stream drawing lines top-down from the top margin"""
+    top = PAGE_SIZE[1] - MARGIN - FONT_SIZE
+    ops = [b"BT", b"/F1 %d Tf" % FONT_SIZE, b"%d TL" % LINE_HEIGHT, b"%d %d Td" % (MARGIN, top)]
+    ops.extend(pdf_string(line) + b" Tj T*" for line in lines)
+    ops.append(b"ET")
+    return b"\n".join(ops)
+
+def build_pdf(pages: List[bytes]) -> bytes:
+    """A PDF document from per-page content streams, all set in Helvetica"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the pages are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+    kids = []
+    for content in pages:
+        stream = zlib.compress(content)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+                       b"/Contents %d 0 R >>" % (PAGE_SIZE[0], PAGE_SIZE[1], len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def render_pdf(source: str, target: str) -> str:
+    """Typeset a text or ICS file as a paginated, text-searchable PDF (runs in a worker process)"""
+    lines = wrap_lines(source_lines(Path(source)), PAGE_SIZE[0] - 2 * MARGIN)
+    per_page = (PAGE_SIZE[1] - 2 * MARGIN) // LINE_HEIGHT
+    pages = [page_content(lines[start:start + per_page]) for start in range(0, max(len(lines), 1), per_page)]
+
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_path = target + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(build_pdf(pages))
+    os.replace(tmp_path, target)
+    return target
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned workers do not inherit the server's threads or sockets
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def submit_render(source: Path) -> Future:
+    """Queue a source file for rendering; resolves to the cached PDF path.
+
+    Already-rendered content resolves immediately and identical content
+    being rendered shares one job.
+    """
+    digest = content_hash(source)
+    target = cached_pdf_path(digest)
+
+    with _lock:
+        if target.exists():
+            metrics.increment("pdf_render_total", result="hit")
+            future: Future = Future()
+            future.set_result(str(target))
+            return future
+
+        future = _pending.get(digest)
+        if future is None:
+            metrics.increment("pdf_render_total", result="miss")
+            future = _get_pool().submit(render_pdf, str(source), str(target))
+            _pending[digest] = future
+            future.add_done_callback(lambda done: _forget(digest, done))
+        return future
+
+def shutdown_renderer() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    # Waited on outside the lock: finishing jobs run _forget, which takes it
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def _forget(digest: str, future: Future) -> None:
+    global _pool
+    with _lock:
+        _pending.pop(digest, None)
+        # A crashed worker breaks the whole pool; start a fresh one next time
+        if isinstance(future.exception(), BrokenProcessPool) and _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+def prerender(source: Path) -> None:
+    """Start rendering a freshly written artifact in the background"""
+    if source.suffix not in RENDERABLE_SUFFIXES:
+        return
+    try:
+        submit_render(source)
+    except Exception as e:
+        print(f"Error queueing PDF render: {e}")
@@ -0,0 +1,85 @@
+import hashlib
+import json
+from typing import Dict, Any, List, Tuple
+
+import metrics
+
+# Case inputs each task type reads at run time (see checkpoint.case_inputs);
+# a task reruns only when one of these or its execution fields change. Only
+# analyze_case reads the whole conversation, so it is the one task that
+# answers a follow-up question; the rest work from the case facts.
+TASK_INPUTS = {
+    "analyze_case": ("case_prompt", "jurisdiction"),
+    "deploy_agent": ("case_facts", "jurisdiction"),
+    "extract_documents": ("files",),
+    "research_precedent": ("case_facts",),
+    "draft_documents": ("case_facts", "jurisdiction"),
+    "simulate_outcome": ("case_facts", "jurisdiction"),
+    "schedule_deadlines": ()
+}
+
+# Task fields that change what a task does; titles and estimates are cosmetic
+EXECUTION_FIELDS = ("type", "agent_type", "agent_name", "document_type", "seed")
+
+# Per-run state carried over when a task is reused
+RUN_FIELDS = ("status", "output", "progress", "logs", "approval")
+
+metrics.describe("replan_tasks_total", "Tasks of a follow-up plan reused from the previous run or invalidated")
+
+def _shape(task: Dict[str, Any]) -> Tuple:
+    return (task.get("type"), task.get("agent_type"), task.get("document_type"))
+
+def input_hashes(tasks: List[Dict[str, Any]], inputs: Dict[str, Any]) -> List[str]:
+    """Content hash of each task's execution fields and the case inputs it reads
+
+    Handlers read case inputs, never another task's output, so dependencies
+    only order execution and do not feed the hash: re-analyzing the case for
+    a follow-up question does not invalidate the tasks that follow it.
+    """
+    hashes = []
+    for task in tasks:
+        material = {
+            "fields": {field: task.get(field) for field in EXECUTION_FIELDS},
+            "inputs": {name: inputs.get(name) for name in TASK_INPUTS.get(task.get("type"), ())}
+        }
+        digest = hashlib.blake2b(json.dumps(material, sort_keys=True, default=str).encode("utf-8"), digest_size=16)
+        hashes.append(digest.hexdigest())
+    return hashes
+
+def annotate_input_hashes(tasks: List[Dict[str, Any]], inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Record each task's input hash on the task itself"""
+    for task, digest in zip(tasks, input_hashes(tasks, inputs)):
+        task["input_hash"] = digest
+    return tasks
+
+def merge_plan(old_tasks: List[Dict[str, Any]], new_tasks: List[Dict[str, Any]],
+               inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """New plan with results of unchanged tasks carried over from the old one.
+
+    A new task is matched to an old one by id, falling back to its shape
+    (type, agent type, document type). It keeps the old result only if the
+    old task completed with the same input hash; everything else runs.
+    """
+    by_id = {task["id"]: task for task in old_tasks if task.get("id")}
+    by_shape: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for task in old_tasks:
+        by_shape.setdefault(_shape(task), []).append(task)
+
+    claimed = set()
+    for task, digest in zip(new_tasks, input_hashes(new_tasks, inputs)):
+        task["input_hash"] = digest
+        old = by_id.get(task.get("id"))
+        if old is None or id(old) in claimed:
+            old = next((t for t in by_shape.get(_shape(task), []) if id(t) not in claimed), None)
+        if old is not None:
+            claimed.add(id(old))
+
+        if old is not None and old.get("status") == "completed" and old.get("input_hash") == digest:
+            for field in RUN_FIELDS:
+                if field in old:
+                    task[field] = old[field]
+            metrics.increment("replan_tasks_total", result="reused")
+        else:
+            metrics.increment("replan_tasks_total", result="invalidated")
+
+    return new_tasks
@@ -0,0 +1,365 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Callable
+
+import numpy as np
+from scipy import sparse
+
+from artifact_manifest import list_artifacts, uploads_manifest_id
+
+# Tokens shorter than this carry almost no signal for case matching
+MIN_TOKEN_LENGTH = 2
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from",
+    "had", "has", "have", "he", "her", "his", "i", "if", "in", "into", "is",
+    "it", "its", "me", "my", "of", "on", "or", "our", "she", "so", "that",
+    "the", "their", "them", "they", "this", "to", "was", "we", "were", "what",
+    "when", "which", "who", "will", "with", "you", "your"
+}
+
+# Ordered longest first so "ies" wins over "s"
+SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ed", "es", "ly", "s")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def stem(token: str) -> str:
+    """Strip common English suffixes so inflected forms share a term"""
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix in ("ies", "ied"):
+                return token[:-len(suffix)] + "y"
+            # "speed", "need", "degrees": the "e" belongs to the word, not the suffix
+            if suffix == "ed" and token[-3] == "e":
+                return token
+            if suffix == "es" and token[-3] == "e":
+                return token[:-1]
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip punctuation, drop stopwords and stem"""
+    return [
+        stem(token)
+        for token in _TOKEN_RE.findall((text or "").lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+class TfidfIndex:
+    """Incremental TF-IDF index over case descriptions and documents.
+
+    Raw term counts are kept as a sparse CSR matrix that grows one row per
+    added document. IDF weights and the L2-normalised document matrix are
+    recomputed lazily on the first query after an update.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._pending: List[Dict[int, int]] = []
+        self._weighted: Optional[sparse.csr_matrix] = None
+        self._idf: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        # Held by callers that compare the index with their source and then
+        # update it, so concurrent syncs do not both append the same rows
+        self.update_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def clear(self) -> None:
+        """Drop every document"""
+        with self._lock:
+            self.vocabulary = {}
+            self.doc_ids = []
+            self.metadata = []
+            self._positions = {}
+            self._counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+            self._pending = []
+            self._weighted = None
+            self._idf = None
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Add or replace a single document"""
+        self.add_many([(doc_id, text, metadata)])
+
+    def add_many(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> None:
+        """Add a batch of (doc_id, text, metadata) documents"""
+        with self._lock:
+            for doc_id, text, metadata in documents:
+                counts: Dict[int, int] = {}
+                for token in tokenize(text):
+                    column = self.vocabulary.setdefault(token, len(self.vocabulary))
+                    counts[column] = counts.get(column, 0) + 1
+
+                if doc_id in self._positions:
+                    # Replacing a document: fold pending rows in, then swap the row
+                    self._flush()
+                    row = self._positions[doc_id]
+                    self._counts = self._replace_row(row, counts)
+                    self.metadata[row] = metadata or {}
+                else:
+                    self._positions[doc_id] = len(self.doc_ids)
+                    self.doc_ids.append(doc_id)
+                    self.metadata.append(metadata or {})
+                    self._pending.append(counts)
+
+            self._weighted = None
+
+    def query(self, texts: List[str], k: int = 5, min_score: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """Rank indexed documents against each query text.
+
+        All queries are scored in a single sparse matrix product; returns one
+        list of {"id", "score", "metadata"} hits per query, best first.
+        """
+        if not texts:
+            return []
+
+        with self._lock:
+            weighted = self._weighted_matrix()
+            vocabulary = self.vocabulary
+            idf = self._idf
+            doc_ids = list(self.doc_ids)
+            metadata = list(self.metadata)
+
+        if weighted.shape[0] == 0 or k <= 0:
+            return [[] for _ in texts]
+
+        queries = _vectorize(texts, vocabulary, idf)
+        scores = (queries @ weighted.T).toarray()
+
+        top = min(k, scores.shape[1])
+        # argpartition gives the top-k per row without sorting every score
+        candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        ranked = np.take_along_axis(candidates, order, axis=1)
+        ranked_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        results = []
+        for row_ids, row_scores in zip(ranked, ranked_scores):
+            results.append([
+                {"id": doc_ids[i], "score": round(float(s), 4), "metadata": metadata[i]}
+                for i, s in zip(row_ids, row_scores)
+                if s > min_score
+            ])
+        return results
+
+    def similarity(self, text: str, doc_id: str) -> float:
+        """Cosine similarity between a text and one indexed document"""
+        if doc_id not in self._positions:
+            return 0.0
+        hits = self.query([text], k=len(self.doc_ids))
+        for hit in hits[0]:
+            if hit["id"] == doc_id:
+                return hit["score"]
+        return 0.0
+
+    def _flush(self) -> None:
+        """Append pending rows to the count matrix"""
+        if not self._pending:
+            return
+
+        n_cols = len(self.vocabulary)
+        rows, cols, values = [], [], []
+        for row, counts in enumerate(self._pending):
+            rows.extend([row] * len(counts))
+            cols.extend(counts.keys())
+            values.extend(counts.values())
+        new_rows = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (rows, cols)),
+            shape=(len(self._pending), n_cols)
+        )
+
+        existing = self._counts
+        if existing.shape[1] < n_cols:
+            existing = sparse.csr_matrix(
+                (existing.data, existing.indices, existing.indptr),
+                shape=(existing.shape[0], n_cols)
+            )
+        self._counts = sparse.vstack([existing, new_rows], format="csr")
+        self._pending = []
+
+    def _replace_row(self, row: int, counts: Dict[int, int]) -> sparse.csr_matrix:
+        """Return the count matrix with one row swapped for new counts"""
+        n_cols = len(self.vocabulary)
+        matrix = self._counts.tolil()
+        if matrix.shape[1] < n_cols:
+            matrix.resize((matrix.shape[0], n_cols))
+        matrix.rows[row] = sorted(counts.keys())
+        matrix.data[row] = [float(counts[c]) for c in matrix.rows[row]]
+        return matrix.tocsr()
+
+    def _weighted_matrix(self) -> sparse.csr_matrix:
+        """L2-normalised TF-IDF document matrix, rebuilt only after updates"""
+        if self._weighted is not None:
+            return self._weighted
+
+        self._flush()
+        counts = self._counts
+        n_docs = counts.shape[0]
+        if n_docs == 0:
+            self._idf = np.zeros(counts.shape[1], dtype=np.float32)
+            self._weighted = counts
+            return counts
+
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        # Smoothed IDF, same form as scikit-learn's default
+        self._idf = (np.log((1 + n_docs) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        weighted = counts.copy()
+        weighted.data = np.log1p(weighted.data) * self._idf[weighted.indices]
+        self._weighted = _normalize_rows(weighted)
+        return self._weighted
+
+def _vectorize(texts: List[str], vocabulary: Dict[str, int], idf: np.ndarray) -> sparse.csr_matrix:
+    """Turn query texts into normalised TF-IDF rows in the index space"""
+    n_cols = len(idf)
+    rows, cols, values = [], [], []
+    for row, text in enumerate(texts):
+        counts: Dict[int, int] = {}
+        for token in tokenize(text):
+            column = vocabulary.get(token)
+            if column is not None and column < n_cols:
+                counts[column] = counts.get(column, 0) + 1
+        rows.extend([row] * len(counts))
+        cols.extend(counts.keys())
+        values.extend(counts.values())
+
+    queries = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float32), (rows, cols)),
+        shape=(len(texts), n_cols)
+    )
+    queries.data = np.log1p(queries.data) * idf[queries.indices]
+    return _normalize_rows(queries)
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Scale each sparse row to unit L2 norm (empty rows stay empty)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+# Shared indexes, e.g. "cases:<user_id>" or "documents:<user_id>", least recently used first; per-user
+# indexes are rebuilt from their source when evicted and needed again
+MAX_INDEXES = int(os.getenv("RETRIEVAL_MAX_INDEXES", "1000"))
+_indexes: "OrderedDict[str, TfidfIndex]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+def get_index(name: str, load: Optional[Callable[[TfidfIndex], None]] = None) -> TfidfIndex:
+    """Get (or create) a named shared index, evicting the least recently used
+
+    `load` fills a newly created index from its source; callers taking the
+    index's update_lock wait until it has run.
+    """
+    with _registry_lock:
+        index = _indexes.get(name)
+        if index is not None:
+            _indexes.move_to_end(name)
+            return index
+        index = _indexes[name] = TfidfIndex()
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+        if load is not None:
+            index.update_lock.acquire()
+
+    if load is not None:
+        try:
+            load(index)
+        finally:
+            index.update_lock.release()
+    return index
+
+def case_text(case: Dict[str, Any]) -> str:
+    """Text used to index a past case"""
+    parts = [case.get("description", ""), case.get("type", ""), case.get("summary", "")]
+    return " ".join(str(part) for part in parts if part)
+
+def case_index_name(user_id: str) -> str:
+    return f"cases:{user_id}"
+
+def user_case_index(user_id: Optional[str]) -> Optional[TfidfIndex]:
+    """The user's shared past-case index, kept across requests (None without a user)"""
+    return get_index(case_index_name(user_id)) if user_id else None
+
+def _case_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+def sync_case_index(index: TfidfIndex, past_cases: List[Dict[str, Any]]) -> TfidfIndex:
+    """Bring the index in line with the past cases, tokenizing only what changed.
+
+    The list position is the doc id. Cases are appended, so usually only the
+    tail is new; a case edited in place is re-indexed by comparing content
+    digests, and an index longer than the list (cases removed or replaced by
+    an import) is rebuilt. Callers sharing the index hold its update_lock.
+    """
+    texts = [case_text(case) for case in past_cases]
+    digests = [_case_digest(text) for text in texts]
+    if len(index) > len(past_cases):
+        index.clear()
+    indexed = [metadata.get("digest") for metadata in list(index.metadata)]
+    changed = [i for i, digest in enumerate(indexed) if digest != digests[i]]
+    changed.extend(range(len(indexed), len(past_cases)))
+    if changed:
+        index.add_many((f"case_{i}", texts[i], {"position": i, "digest": digests[i]}) for i in changed)
+    return index
+
+def rank_similar_cases(queries: List[str], past_cases: List[Dict[str, Any]], k: int = 5,
+                       min_score: float = 0.0, index: Optional[TfidfIndex] = None) -> List[List[Dict[str, Any]]]:
+    """Rank past cases for a batch of query descriptions in one call.
+
+    Pass the user's index (user_case_index) so their cases are tokenized
+    once rather than on every call. Each hit carries the original case under
+    "case" alongside its cosine score.
+    """
+    index = index if index is not None else TfidfIndex()
+    # Positions must still match past_cases when the hits are mapped back
+    with index.update_lock:
+        ranked = sync_case_index(index, past_cases).query(queries, k=k, min_score=min_score)
+    return [
+        [
+            {"case": past_cases[hit["metadata"]["position"]], "score": hit["score"]}
+            for hit in hits
+        ]
+        for hits in ranked
+    ]
+
+def documents_index_name(user_id: str) -> str:
+    return f"documents:{user_id}"
+
+def _load_uploads(user_id: str) -> Callable[[TfidfIndex], None]:
+    """Loader indexing the extracted text stored with the user's uploads"""
+    def load(index: TfidfIndex) -> None:
+        index.add_many(
+            (entry["file_id"], entry["text"], {"filename": entry.get("filename"), "path": f"storage/{entry['path']}"})
+            for entry in list_artifacts(uploads_manifest_id(user_id))
+            if entry.get("file_id") and entry.get("text")
+        )
+    return load
+
+def user_documents_index(user_id: str) -> TfidfIndex:
+    """The user's uploaded-document index, rebuilt from their uploads when not cached"""
+    return get_index(documents_index_name(user_id), load=_load_uploads(user_id))
+
+def add_document(user_id: str, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+    """Make one of the user's uploads searchable (its text must already be stored)"""
+    index = user_documents_index(user_id)
+    with index.update_lock:
+        index.add(doc_id, text, metadata)
+
+def search_documents(queries: List[str], user_id: Optional[str], k: int = 5,
+                     min_score: float = 0.0) -> List[List[Dict[str, Any]]]:
+    """Rank the user's uploaded documents for a batch of queries (none without a user)"""
+    if not user_id:
+        return [[] for _ in queries]
+    index = user_documents_index(user_id)
+    with index.update_lock:
+        return index.query(queries, k=k, min_score=min_score)
@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Extension for stored records; files may hold msgpack or JSON, see `unpack`
+RECORD_EXTENSION = ".msgpack"
+
+# Bump when the shape of a stored record changes, and register an upgrade below
+SCHEMA_VERSION = 1
+
+# (kind, from_version) -> function returning the record at from_version + 1
+MIGRATIONS: Dict[Tuple[str, int], Callable[[Any], Any]] = {}
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+def loads_json(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def pack(obj: Any, kind: str) -> bytes:
+    """Serialize a record in the versioned storage envelope.
+
+    msgpack is used when installed; otherwise the same envelope is written
+    as JSON so the file is still readable by `unpack`.
+    """
+    envelope = {"kind": kind, "v": SCHEMA_VERSION, "data": obj}
+    if msgpack is not None:
+        return msgpack.packb(envelope, use_bin_type=True, default=str)
+    return dumps_json(envelope)
+
+def unpack(data: bytes, kind: str) -> Any:
+    """Deserialize a stored record, accepting legacy plain JSON.
+
+    Old files are bare JSON documents without an envelope; they are treated
+    as version 0 and run through any registered migrations.
+    """
+    stripped = data.lstrip()
+    if not stripped:
+        return None
+
+    if stripped[:1] in (b"{", b"["):
+        record = loads_json(stripped)
+    elif msgpack is not None:
+        record = msgpack.unpackb(data, raw=False, strict_map_key=False)
+    else:
+        raise ValueError(f"Cannot read binary {kind} record: msgpack is not installed")
+
+    if isinstance(record, dict) and record.get("kind") == kind and "v" in record:
+        version, obj = record["v"], record.get("data")
+    else:
+        version, obj = 0, record
+
+    return _upgrade(kind, version, obj)
+
+def upgrade(kind: str, version: Any, obj: Any) -> Any:
+    """Bring a record written at `version` up to SCHEMA_VERSION.
+
+    Raises ValueError for versions this release does not know (newer ones
+    included), so such records are never stored half-understood.
+    """
+    if not isinstance(version, int) or isinstance(version, bool) or not 0 <= version <= SCHEMA_VERSION:
+        raise ValueError(f"Unsupported {kind} record version: {version!r}")
+    return _upgrade(kind, version, obj)
+
+def _upgrade(kind: str, version: int, obj: Any) -> Any:
+    """Apply registered migrations until the record reaches SCHEMA_VERSION"""
+    while version < SCHEMA_VERSION:
+        migrate = MIGRATIONS.get((kind, version))
+        if migrate is not None:
+            obj = migrate(obj)
+        version += 1
+    return obj
+
+def read_record(path: str, kind: str, default: Any = None) -> Any:
+    """Read a stored record from disk, returning `default` if it does not exist"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return default
+
+    record = unpack(data, kind)
+    return default if record is None else record
+
+def write_record(path: str, obj: Any, kind: str) -> None:
+    """Atomically write a record so readers never see a partial file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pack(obj, kind))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,62 +1,205 @@
-from typing import Dict, Any
-import random
+from typing import Dict, Any, List, Optional
 import json
+import numpy as np
+from retrieval import rank_similar_cases, TfidfIndex
+from outcome_stats import get_outcome_statistics_bulk
 
-def simulate_case_outcome(case_description: str, memory: Dict[str, Any]) -> Dict[str, Any]:
-    """Simulate case outcome using heuristics and past case data"""
-    
-    # Get past cases for comparison
-    past_cases = memory.get("past_cases", [])
-    jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
-    
-    # Basic heuristic scoring
-    base_win_rate = 50
-    
-    # Adjust based on jurisdiction (mock data)
-    jurisdiction_modifiers = {
-        "CA": 10,   # More favorable
-        "NY": 5,
-        "TX": -5,
-        "FL": 0
-    }
-    
-    win_probability = base_win_rate + jurisdiction_modifiers.get(jurisdiction, 0)
+# Cosine score above which a past case counts as "similar"
+SIMILAR_CASE_THRESHOLD = 0.5
+
+BASE_WIN_RATE = 50
+
+# Jurisdiction adjustments to the base win rate (mock data)
+JURISDICTION_MODIFIERS = {
+    "CA": 10,   # More favorable
+    "NY": 5,
+    "TX": -5,
+    "FL": 0
+}
+
+# Monte Carlo settings: outcomes spread +/- OUTCOME_SPREAD points around the
+# heuristic estimate and are clamped to a realistic 20-90% range
+DEFAULT_SAMPLES = 5000
+OUTCOME_SPREAD = 15
+MIN_WIN_PROBABILITY = 20
+MAX_WIN_PROBABILITY = 90
+PERCENTILES = (5, 25, 50, 75, 95)
+CONFIDENCE_Z = 1.96  # 95% interval for the mean
+
+STRATEGIES = {
+    "high": ["Aggressive litigation", "Demand full compensation", "Take to trial"],
+    "medium": ["Negotiate settlement", "Mediation", "Limited litigation"], 
+    "low": ["Settlement focus", "Damage control", "Alternative resolution"]
+}
+
+# What-if scenario levers: (win rate adjustment, outcome spread multiplier).
+# Settling trades upside for certainty, so its outcomes vary less than a trial.
+STRATEGY_MODIFIERS = {
+    "trial": (0, 1.0),
+    "mediate": (5, 0.7),
+    "settle": (8, 0.5)
+}
+
+EVIDENCE_MODIFIERS = {
+    "weak": (-15, 1.2),
+    "moderate": (0, 1.0),
+    "strong": (12, 0.8)
+}
+
+# Upper bound on grid cells x samples evaluated in one batch call
+MAX_SCENARIO_DRAWS = 5_000_000
+
+def case_type_modifier(case_description: str) -> int:
+    """Win rate adjustment from case keywords"""
     
-    # Analyze case type for additional modifiers
     case_lower = case_description.lower()
     
     if "traffic" in case_lower or "ticket" in case_lower:
-        win_probability += 15  # Traffic tickets often winnable
+        return 15  # Traffic tickets often winnable
     elif "small claims" in case_lower:
-        win_probability += 5   # Moderate win rate
+        return 5   # Moderate win rate
     elif "landlord" in case_lower or "tenant" in case_lower:
-        win_probability -= 10  # More complex, harder to win
+        return -10  # More complex, harder to win
+    return 0
+
+def heuristic_win_rate(case_description: str, jurisdiction: str) -> float:
+    """Point estimate of the win rate from jurisdiction and case keywords"""
+    return float(BASE_WIN_RATE + JURISDICTION_MODIFIERS.get(jurisdiction, 0) + case_type_modifier(case_description))
+
+def sample_outcomes(base_rates: np.ndarray, n_samples: int = DEFAULT_SAMPLES,
+                    rng: Optional[np.random.Generator] = None, spread: Any = OUTCOME_SPREAD) -> np.ndarray:
+    """Draw Monte Carlo win probabilities for every base rate in one array operation.
+    
+    `spread` may be a scalar or an array broadcastable to base_rates.
+    Returns an array of shape base_rates.shape + (n_samples,).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    base_rates = np.asarray(base_rates, dtype=np.float64)
+    spread = np.broadcast_to(np.asarray(spread, dtype=np.float64), base_rates.shape)
+    noise = rng.uniform(-1.0, 1.0, size=base_rates.shape + (n_samples,)) * spread[..., np.newaxis]
+    return np.clip(base_rates[..., np.newaxis] + noise, MIN_WIN_PROBABILITY, MAX_WIN_PROBABILITY)
+
+def summarize_samples(samples: np.ndarray) -> Dict[str, np.ndarray]:
+    """Mean, spread, percentiles and 95% confidence interval along the last axis"""
     
-    # Add some randomness but keep it realistic
-    win_probability += random.randint(-15, 15)
-    win_probability = max(20, min(90, win_probability))  # Clamp between 20-90%
+    n_samples = samples.shape[-1]
+    mean = samples.mean(axis=-1)
+    std = samples.std(axis=-1)
+    margin = CONFIDENCE_Z * std / np.sqrt(n_samples)
+    percentiles = np.percentile(samples, PERCENTILES, axis=-1)
     
-    # Determine best strategy based on case type and win probability
-    strategies = {
-        "high": ["Aggressive litigation", "Demand full compensation", "Take to trial"],
-        "medium": ["Negotiate settlement", "Mediation", "Limited litigation"], 
-        "low": ["Settlement focus", "Damage control", "Alternative resolution"]
+    return {
+        "mean": mean,
+        "std": std,
+        "ci_low": mean - margin,
+        "ci_high": mean + margin,
+        "percentiles": {f"p{p}": percentiles[i] for i, p in enumerate(PERCENTILES)}
+    }
+
+def distribution_at(summary: Dict[str, np.ndarray], index: tuple = (), n_samples: int = DEFAULT_SAMPLES) -> Dict[str, Any]:
+    """Plain-Python distribution for one cell of a summarize_samples result"""
+    return {
+        "mean": round(float(summary["mean"][index]), 2),
+        "std": round(float(summary["std"][index]), 2),
+        "confidence_interval": [round(float(summary["ci_low"][index]), 2), round(float(summary["ci_high"][index]), 2)],
+        "percentiles": {name: round(float(values[index]), 2) for name, values in summary["percentiles"].items()},
+        "samples": n_samples
     }
+
+def simulate_scenarios(case_description: str, jurisdictions: List[str], strategies: List[str],
+                       evidence_levels: List[str], n_samples: int = DEFAULT_SAMPLES,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+    """Evaluate a jurisdiction x strategy x evidence grid in one vectorized pass
+    
+    Modifiers are laid out on separate axes and broadcast into a single
+    (J, S, E) base-rate array, which is sampled and summarized at once.
+    No LLM calls are made.
+    """
+    
+    unknown = [s for s in strategies if s not in STRATEGY_MODIFIERS]
+    unknown += [e for e in evidence_levels if e not in EVIDENCE_MODIFIERS]
+    if unknown:
+        raise ValueError(f"Unknown scenario option(s): {', '.join(unknown)}")
+    
+    shape = (len(jurisdictions), len(strategies), len(evidence_levels))
+    if not all(shape):
+        raise ValueError("Each scenario axis needs at least one value")
+    if np.prod(shape) * n_samples > MAX_SCENARIO_DRAWS:
+        raise ValueError("Scenario grid too large; reduce the grid or the sample count")
+    
+    jurisdiction_shift = np.array([JURISDICTION_MODIFIERS.get(j, 0) for j in jurisdictions], dtype=np.float64)
+    strategy_shift, strategy_scale = np.array([STRATEGY_MODIFIERS[s] for s in strategies], dtype=np.float64).T
+    evidence_shift, evidence_scale = np.array([EVIDENCE_MODIFIERS[e] for e in evidence_levels], dtype=np.float64).T
+    
+    base_rates = (
+        BASE_WIN_RATE + case_type_modifier(case_description)
+        + jurisdiction_shift[:, None, None]
+        + strategy_shift[None, :, None]
+        + evidence_shift[None, None, :]
+    )
+    spread = OUTCOME_SPREAD * strategy_scale[None, :, None] * evidence_scale[None, None, :]
+    
+    samples = sample_outcomes(base_rates, n_samples, np.random.default_rng(seed), spread)
+    summary = summarize_samples(samples)
+    
+    matrix = [
+        [
+            [distribution_at(summary, (j, s, e), n_samples) for e in range(shape[2])]
+            for s in range(shape[1])
+        ]
+        for j in range(shape[0])
+    ]
+    
+    best = np.unravel_index(int(np.argmax(summary["mean"])), shape)
     
+    return {
+        "jurisdictions": jurisdictions,
+        "strategies": strategies,
+        "evidence_levels": evidence_levels,
+        "matrix": matrix,
+        "best_scenario": {
+            "jurisdiction": jurisdictions[best[0]],
+            "strategy": strategies[best[1]],
+            "evidence_level": evidence_levels[best[2]],
+            "mean": round(float(summary["mean"][best]), 2)
+        }
+    }
+
+def strategy_category(win_probability: float) -> str:
+    """Bucket a win probability into a strategy category"""
     if win_probability >= 70:
-        strategy_category = "high"
+        return "high"
     elif win_probability >= 50:
-        strategy_category = "medium"
-    else:
-        strategy_category = "low"
+        return "medium"
+    return "low"
+
+def simulate_case_outcome(case_description: str, memory: Dict[str, Any], seed: Optional[int] = None,
+                          n_samples: int = DEFAULT_SAMPLES, index: Optional[TfidfIndex] = None) -> Dict[str, Any]:
+    """Simulate case outcome using heuristics, Monte Carlo sampling and past case data
+    
+    Pass a seed to make the distribution and chosen strategy reproducible,
+    and the user's past-case index to avoid re-tokenizing their cases.
+    """
+    
+    # Get past cases for comparison
+    past_cases = memory.get("past_cases", [])
+    jurisdiction = memory.get("preferences", {}).get("jurisdiction", "CA")
+    case_lower = case_description.lower()
+    
+    rng = np.random.default_rng(seed)
+    samples = sample_outcomes(np.array(heuristic_win_rate(case_description, jurisdiction)), n_samples, rng)
+    distribution = distribution_at(summarize_samples(samples), n_samples=n_samples)
+    win_probability = int(round(distribution["mean"]))
     
-    best_strategy = random.choice(strategies[strategy_category])
+    # Determine best strategy based on case type and win probability
+    options = STRATEGIES[strategy_category(win_probability)]
+    best_strategy = options[int(rng.integers(len(options)))]
     
     # Identify risk factors
     risk_factors = []
     if win_probability < 60:
         risk_factors.append("Weak evidence")
-    if "complex" in case_description.lower():
+    if "complex" in case_lower:
         risk_factors.append("Legal complexity")
     if len(past_cases) == 0:
         risk_factors.append("No case history")
@@ -76,54 +219,23 @@ def simulate_case_outcome(case_description: str, memory: Dict[str, Any]) -> Dict
             estimated_duration = duration
             break
     
+    # Rank every past case once: all hits above the threshold are counted, the top 5 are listed
+    ranked = rank_similar_cases([case_description], past_cases, k=len(past_cases), index=index)[0]
+    
     return {
         "win_probability": win_probability,
         "best_strategy": best_strategy,
         "risk_factors": risk_factors if risk_factors else ["Standard legal risks"],
         "estimated_duration": estimated_duration,
         "confidence_level": "medium" if 40 <= win_probability <= 70 else "high" if win_probability > 70 else "low",
-        "similar_cases": len([c for c in past_cases if calculate_case_similarity(case_description, c.get("description", "")) > 0.5])
+        "distribution": distribution,
+        "similar_cases": len([hit for hit in ranked if hit["score"] > SIMILAR_CASE_THRESHOLD]),
+        "ranked_similar_cases": [
+            {"description": hit["case"].get("description", ""), "type": hit["case"].get("type"), "score": hit["score"]}
+            for hit in ranked[:5]
+        ]
     }
 
-def calculate_case_similarity(case1: str, case2: str) -> float:
-    """Calculate similarity between two case descriptions"""
-    
-    # Simple keyword-based similarity
-    words1 = set(case1.lower().split())
-    words2 = set(case2.lower().split())
-    
-    if not words1 or not words2:
-        return 0.0
-    
-    intersection = words1.intersection(words2)
-    union = words1.union(words2)
-    
-    return len(intersection) / len(union) if union else 0.0
-
 def get_outcome_statistics(case_type: str, jurisdiction: str = "CA") -> Dict[str, Any]:
-    """Get mock outcome statistics for case type and jurisdiction"""
-    
-    # Mock statistical data - in reality this would come from legal databases
-    base_stats = {
-        "traffic_ticket": {"win_rate": 0.65, "avg_fine_reduction": 0.40},
-        "small_claims": {"win_rate": 0.55, "avg_recovery": 0.70},
-        "landlord_tenant": {"win_rate": 0.45, "avg_damages": 0.60},
-        "contract": {"win_rate": 0.50, "avg_settlement": 0.65}
-    }
-    
-    jurisdiction_multipliers = {
-        "CA": 1.1,
-        "NY": 1.05,
-        "TX": 0.95,
-        "FL": 1.0
-    }
-    
-    stats = base_stats.get(case_type, base_stats["small_claims"])
-    multiplier = jurisdiction_multipliers.get(jurisdiction, 1.0)
-    
-    return {
-        "win_rate": min(0.9, stats["win_rate"] * multiplier),
-        "average_outcome": stats.get("avg_fine_reduction", stats.get("avg_recovery", 0.6)),
-        "sample_size": random.randint(50, 500),  # Mock sample size
-        "data_currency": "Last 12 months"
-    }
\ No newline at end of file
+    """Get outcome statistics for case type and jurisdiction from the stats table"""
+    return get_outcome_statistics_bulk([(case_type, jurisdiction)])[0]
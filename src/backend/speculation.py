@@ -0,0 +1,69 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import metrics
+from case_classifier import classify
+from executor import create_agent
+from agents.base_agent import BaseAgent
+from llm_client import LLMClient
+
+# Lower than the planner's fast-path threshold: a wrong guess only wastes
+# one fact-extraction call, while a right one hides it behind planning
+SPECULATION_THRESHOLD = float(os.getenv("SPECULATION_THRESHOLD", "0.5"))
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculate")
+
+metrics.describe("speculation_total", "Speculative agent warm-ups by result (hit, wasted)")
+
+class Speculation:
+    """An agent built, with key facts being extracted, ahead of the plan"""
+
+    def __init__(self, agent_type: str, agent: BaseAgent, future: Future):
+        self.agent_type = agent_type
+        self.agent = agent
+        self.future = future
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def claim(self, agent_type: str) -> Optional[BaseAgent]:
+        """Hand over the warmed-up agent if the plan deployed the guessed type"""
+        with self._lock:
+            if self._settled or agent_type != self.agent_type:
+                return None
+            self._settled = True
+
+        # Usually finished already; waiting here still beats a second LLM call
+        try:
+            self.future.result()
+        except Exception as e:
+            print(f"Speculative fact extraction failed: {e}")
+        metrics.increment("speculation_total", result="hit")
+        return self.agent
+
+    def cancel(self) -> None:
+        """Discard the speculation if the plan never claimed it"""
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+
+        # A call already in flight cannot be interrupted; its result is dropped
+        self.future.cancel()
+        metrics.increment("speculation_total", result="wasted")
+
+def start_speculation(prompt: str, llm_client: LLMClient) -> Optional[Speculation]:
+    """Start warming up the agent the prompt most likely needs, if any"""
+    agent_type, confidence = classify(prompt)
+    if confidence < SPECULATION_THRESHOLD:
+        return None
+
+    agent = create_agent(agent_type, llm_client)
+    if agent is None:
+        return None
+
+    # The warm-up's LLM call is traced as part of the request that started it
+    future = _pool.submit(contextvars.copy_context().run, agent.extract_key_facts, prompt)
+    return Speculation(agent_type, agent, future)
@@ -0,0 +1,199 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from urllib.parse import unquote
+
+import metrics
+from artifact_manifest import MANIFEST_DIR, list_artifacts, record_artifact, archive_path, artifact_case_id
+from checkpoint import load_checkpoint
+from renderer import RENDER_CACHE_DIR
+from serialization import RECORD_EXTENSION
+
+# Soft per-user quota on case artifacts and uploads; only generated documents
+# are evicted, into a compressed archive they are restored from unchanged
+USER_QUOTA_BYTES = int(float(os.getenv("STORAGE_QUOTA_MB", "100")) * 1024 * 1024)
+RENDER_CACHE_MAX_BYTES = int(float(os.getenv("RENDER_CACHE_MAX_MB", "500")) * 1024 * 1024)
+
+# Generated documents unused for this long are evicted regardless of quota
+MAX_IDLE_SECONDS = int(os.getenv("ARTIFACT_MAX_IDLE_DAYS", "30")) * 24 * 3600
+
+SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL", "3600"))
+
+metrics.describe("storage_bytes_reclaimed_total", "Bytes freed by the storage sweeper, by kind (artifact, render)")
+metrics.describe("storage_files_evicted_total", "Files deleted by the storage sweeper, by reason (idle, quota)")
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_sweep_lock = threading.Lock()
+_archive_lock = threading.Lock()
+
+def _last_used(stat: os.stat_result) -> float:
+    # atime is only as fresh as the mount allows (relatime: about daily),
+    # which is enough to order files for eviction
+    return max(stat.st_atime, stat.st_mtime)
+
+def case_files() -> Dict[str, List[Dict[str, Any]]]:
+    """Files listed in case and upload manifests, grouped by owning user.
+
+    Evicted documents are counted at their archived size.
+    """
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    manifest_dir = Path(MANIFEST_DIR)
+    if not manifest_dir.exists():
+        return by_user
+
+    for manifest in manifest_dir.glob("*" + RECORD_EXTENSION):
+        case_id = unquote(manifest.name[:-len(RECORD_EXTENSION)])
+        state = load_checkpoint(case_id)
+        case_user = state.get("user_id", "") if state else ""
+        for entry in list_artifacts(case_id):
+            file_path = Path("storage") / entry["path"]
+            archived = False
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                try:
+                    stat = archive_path(entry["path"]).stat()
+                except FileNotFoundError:
+                    continue
+                archived = True
+            by_user.setdefault(entry.get("user_id", case_user), []).append({
+                "case_id": case_id,
+                "path": file_path,
+                "size": stat.st_size,
+                "last_used": _last_used(stat),
+                "evictable": not archived and bool(entry.get("generated")) and not entry.get("pinned")
+            })
+    return by_user
+
+def _archive(file_path: Path) -> Path:
+    """Gzip storage/<path> into the archive (atomically) and return the copy"""
+    target = archive_path(str(file_path.relative_to("storage")))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with open(file_path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, target)
+    return target
+
+def _evict_artifact(item: Dict[str, Any], reason: str) -> int:
+    with _archive_lock:
+        try:
+            archived = _archive(item["path"])
+            item["path"].unlink()
+        except FileNotFoundError:
+            return 0
+    # Still listed; the next download restores it byte for byte
+    record_artifact(item["case_id"], item["path"], evicted=True)
+    freed = max(item["size"] - archived.stat().st_size, 0)
+    metrics.increment("storage_files_evicted_total", reason=reason)
+    metrics.increment("storage_bytes_reclaimed_total", freed, kind="artifact")
+    return freed
+
+def restore_artifact(path: str) -> bool:
+    """Bring back an evicted artifact (path under storage/) exactly as it was.
+
+    False if it has no archived copy.
+    """
+    source = archive_path(path)
+    file_path = Path("storage") / path
+    with _archive_lock:
+        if file_path.exists():
+            return True
+        if not source.exists():
+            return False
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = file_path.with_name(file_path.name + ".part")
+        with gzip.open(source, "rb") as src, open(part_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(part_path, file_path)
+        source.unlink()
+    record_artifact(artifact_case_id(path), file_path, evicted=False)
+    return True
+
+def _sweep_user(files: List[Dict[str, Any]], now: float, stats: Dict[str, Any]) -> None:
+    usage = sum(item["size"] for item in files)
+    candidates = sorted((item for item in files if item["evictable"]), key=lambda item: item["last_used"])
+
+    for item in candidates:
+        if now - item["last_used"] > MAX_IDLE_SECONDS:
+            reason = "idle"
+        elif usage > USER_QUOTA_BYTES:
+            reason = "quota"
+        else:
+            continue
+        freed = _evict_artifact(item, reason)
+        usage -= freed
+        stats["files_evicted"] += 1
+        stats["bytes_reclaimed"] += freed
+
+    if usage > USER_QUOTA_BYTES:
+        stats["users_over_quota"] += 1
+
+def _sweep_render_cache(now: float, stats: Dict[str, Any]) -> None:
+    cache_dir = Path(RENDER_CACHE_DIR)
+    if not cache_dir.exists():
+        return
+
+    renders = []
+    for file_path in cache_dir.glob("*.pdf"):
+        stat = file_path.stat()
+        renders.append((_last_used(stat), stat.st_size, file_path))
+    renders.sort()
+
+    total = sum(size for _, size, _ in renders)
+    for last_used, size, file_path in renders:
+        if now - last_used > MAX_IDLE_SECONDS:
+            reason = "idle"
+        elif total > RENDER_CACHE_MAX_BYTES:
+            reason = "quota"
+        else:
+            continue
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        metrics.increment("storage_files_evicted_total", reason=reason)
+        metrics.increment("storage_bytes_reclaimed_total", size, kind="render")
+        stats["files_evicted"] += 1
+        stats["bytes_reclaimed"] += size
+
+def sweep(now: Optional[float] = None) -> Dict[str, Any]:
+    """One retention pass over case artifacts and the PDF render cache.
+
+    Generated documents are compressed into the archive (and restored by
+    restore_artifact on download) and cached PDF renders are deleted.
+    Uploads and pinned documents count toward quotas but are never touched.
+    """
+    now = now or time.time()
+    stats = {"files_evicted": 0, "bytes_reclaimed": 0, "users_over_quota": 0}
+    with _sweep_lock:
+        for files in case_files().values():
+            _sweep_user(files, now, stats)
+        _sweep_render_cache(now, stats)
+    return stats
+
+def _run() -> None:
+    while not _stop.wait(SWEEP_INTERVAL_SECONDS):
+        try:
+            stats = sweep()
+            if stats["files_evicted"]:
+                print(f"Storage sweep reclaimed {stats['bytes_reclaimed']} bytes from {stats['files_evicted']} files")
+        except Exception as e:
+            print(f"Error sweeping storage: {e}")
+
+def start_sweeper() -> None:
+    """Run sweep() every SWEEP_INTERVAL_SECONDS in a daemon thread"""
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="storage-sweeper", daemon=True)
+        _thread.start()
+
+def stop_sweeper() -> None:
+    _stop.set()
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import lazy_outputs
+from llm_client import LLMClient, LLMError
+
+class FlakyModel:
+    """Fails the first `failures` calls, then answers"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def generate_content(self, prompt, stream=False):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("503 overloaded")
+
+        class Chunk:
+            text = "Dear landlord, please return my deposit."
+        return [Chunk()] if stream else Chunk()
+
+def client(failures: int) -> LLMClient:
+    llm_client = LLMClient.__new__(LLMClient)
+    llm_client.model = FlakyModel(failures)
+    return llm_client
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(lazy_outputs, "prerender", lambda path: None)
+
+def test_failed_resolve_is_not_cached():
+    ref = lazy_outputs.register("strategy", "Outline a strategy")
+    llm_client = client(failures=1)
+
+    with pytest.raises(LLMError):
+        lazy_outputs.resolve(ref, llm_client)
+    assert lazy_outputs.resolve(ref, llm_client) == ("Dear landlord, please return my deposit.", False)
+    assert lazy_outputs.resolve(ref, llm_client)[1] is True
+
+def test_failed_materialize_leaves_no_file():
+    path = "artifacts/case1/draft.txt"
+    lazy_outputs.register_artifact(path, "Draft a demand letter", "case1")
+    llm_client = client(failures=1)
+
+    with pytest.raises(LLMError):
+        lazy_outputs.materialize_artifact(path, llm_client)
+    assert not os.listdir("storage/artifacts/case1")
+
+    assert lazy_outputs.materialize_artifact(path, llm_client)
+    with open(os.path.join("storage", path)) as f:
+        assert f.read() == "Dear landlord, please return my deposit."
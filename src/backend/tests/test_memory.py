@@ -0,0 +1,42 @@
+from memory import count_cases, invalidate_case_index, load_memory, project_memory, query_cases, save_memory
+
+def test_case_index_follows_edits_and_keeps_recorded_jurisdiction():
+    memory = {
+        "preferences": {"jurisdiction": "CA"},
+        "past_cases": [
+            {"description": "deposit", "type": "landlord_tenant", "jurisdiction": "NY", "outcome": "won"},
+            {"description": "ticket", "type": "traffic_ticket"}
+        ]
+    }
+    assert count_cases(memory, jurisdiction="NY") == 1
+    # A case without a jurisdiction is not filed under the user's preference
+    assert count_cases(memory, jurisdiction="CA") == 0
+
+    # Same length, different content: the edit invalidates the index
+    memory["past_cases"][0]["outcome"] = "lost"
+    invalidate_case_index(memory)
+    assert count_cases(memory, outcome="won") == 0
+    assert query_cases(memory, outcome="lost")[0]["description"] == "deposit"
+
+    memory["past_cases"] = [{"description": "invoice", "type": "small_claims", "jurisdiction": "TX"}]
+    assert count_cases(memory, case_type="landlord_tenant") == 0 and count_cases(memory) == 1
+
+def test_saved_memory_carries_a_current_case_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    memory = load_memory("u1")
+    memory["past_cases"] = [{"description": "deposit", "type": "landlord_tenant", "outcome": "won"}]
+    count_cases(memory)
+    memory["past_cases"][0]["outcome"] = "lost"
+    save_memory("u1", memory)
+
+    assert count_cases(load_memory("u1"), outcome="lost") == 1
+
+def test_history_is_whole_and_chronological_unless_paged():
+    memory = {"preferences": {}, "conversations": [{"n": n} for n in range(30)], "past_cases": []}
+    whole = project_memory(memory)
+    assert whole["memory"]["conversations"] == memory["conversations"] and whole["next_cursors"] == {}
+
+    page = project_memory(memory, fields=["conversations"], limit=20)
+    assert [item["n"] for item in page["memory"]["conversations"]] == list(range(29, 9, -1))
+    rest = project_memory(memory, cursors={"conversations": page["next_cursors"]["conversations"]})
+    assert [item["n"] for item in rest["memory"]["conversations"]] == list(range(9, -1, -1))
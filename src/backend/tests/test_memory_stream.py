@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import memory
+import memory_stream
+from serialization import SCHEMA_VERSION, dumps_json, loads_json
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "storage").mkdir()
+    monkeypatch.setitem(memory._legacy_migrated, "mtime", None)
+
+def write_legacy(users):
+    with open(memory.MEMORY_FILE, "w") as f:
+        json.dump(users, f, indent=2)
+
+def test_legacy_file_is_streamed_in_chunks(monkeypatch):
+    users = {f"user_{n}": {"past_cases": [{"description": "deposit {} \" , }" * n}], "preferences": {}} for n in range(20)}
+    write_legacy(users)
+    monkeypatch.setattr(memory, "LEGACY_READ_SIZE", 7)
+
+    assert dict(memory.iter_legacy_memory()) == users
+
+    write_legacy({})
+    assert list(memory.iter_legacy_memory()) == []
+
+def test_export_migrates_legacy_users_without_overwriting_records():
+    write_legacy({"old": {"past_cases": [], "preferences": {"jurisdiction": "NY"}}, "both": {"past_cases": []}})
+    memory.save_memory("both", {"past_cases": [{"description": "newer"}]})
+
+    exported = [loads_json(line) for line in memory_stream.export_ndjson()]
+    assert [record["user_id"] for record in exported] == ["both", "old"]
+    assert exported[0]["memory"]["past_cases"] == [{"description": "newer"}]
+    assert exported[1]["memory"]["preferences"] == {"jurisdiction": "NY"}
+
+def test_import_rejects_unknown_versions():
+    lines = [
+        dumps_json({"user_id": "ok", "v": SCHEMA_VERSION, "memory": {"past_cases": []}}),
+        dumps_json({"user_id": "newer", "v": SCHEMA_VERSION + 1, "memory": {"past_cases": []}}),
+        dumps_json({"user_id": "unversioned", "memory": {"past_cases": []}})
+    ]
+    stats = memory_stream.import_ndjson(lines)
+    assert stats == {"imported": 1, "skipped": 0, "errors": 2, "cursor": "ok"}
+    assert list(memory_stream.iter_user_ids()) == ["ok"]
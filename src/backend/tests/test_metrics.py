@@ -0,0 +1,19 @@
+import metrics
+
+def test_counters_and_histograms_render_in_prometheus_format():
+    metrics.describe("test_requests_total", "Requests seen")
+    metrics.increment("test_requests_total", route="/api/case")
+    metrics.increment("test_requests_total", 2, route="/api/case")
+    assert metrics.get_counter("test_requests_total", route="/api/case") == 3
+
+    for seconds in (0.02, 0.2, 90):
+        metrics.observe("test_latency_seconds", seconds, buckets=(0.1, 1), span="plan")
+
+    text = metrics.render_prometheus()
+    assert "# HELP test_requests_total Requests seen\n# TYPE test_requests_total counter\n" in text
+    assert 'test_requests_total{route="/api/case"} 3\n' in text
+    # Buckets are cumulative and the +Inf bucket equals the count
+    assert 'test_latency_seconds_bucket{span="plan",le="0.1"} 1\n' in text
+    assert 'test_latency_seconds_bucket{span="plan",le="1"} 2\n' in text
+    assert 'test_latency_seconds_bucket{span="plan",le="+Inf"} 3\n' in text
+    assert 'test_latency_seconds_count{span="plan"} 3\n' in text
@@ -0,0 +1,34 @@
+import pytest
+
+import plan_cache
+from serialization import read_record
+
+PLAN = [
+    {"id": "analyze", "type": "analyze_case", "title": "Review Jane Doe's eviction at 12 Elm St",
+     "description": "Landlord Bob Smith served notice on March 3", "priority": 1, "dependencies": []},
+    {"id": "agent", "type": "deploy_agent", "title": "Fight Smith's eviction", "agent_type": "landlord_tenant",
+     "agent_name": "Doe Defense Agent", "description": "Answer the unlawful detainer", "dependencies": ["analyze"]}
+]
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "storage").mkdir()
+    monkeypatch.setattr(plan_cache, "_shared", None)
+
+def test_shared_cache_holds_only_plan_structure():
+    prompt = "Jane Doe is being evicted from 12 Elm St by Bob Smith"
+    owner = {}
+    plan_cache.remember_plan(prompt, "landlord_tenant", "CA", PLAN, owner)
+
+    shared = read_record(plan_cache.SHARED_CACHE_FILE, "plan_structures")
+    text = repr(shared).lower()
+    assert not any(word in text for word in ("doe", "smith", "elm", "march", "evict"))
+
+    # The owner gets their own plan back; another user only the structure
+    assert plan_cache.lookup_plan(prompt, "landlord_tenant", "CA", owner)[0]["title"] == PLAN[0]["title"]
+    tasks = plan_cache.lookup_plan("My landlord won't fix the heat", "landlord_tenant", "CA", {})
+    assert [(t["id"], t["type"], t["dependencies"]) for t in tasks] == [(t["id"], t["type"], t["dependencies"]) for t in PLAN]
+    assert tasks[0]["title"] == "Analyze Case"
+    assert tasks[1]["agent_type"] == "landlord_tenant" and tasks[1]["agent_name"] == "Landlord Tenant Agent"
+    assert plan_cache.lookup_plan("My landlord won't fix the heat", "landlord_tenant", "NY", {}) is None
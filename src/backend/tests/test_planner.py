@@ -0,0 +1,10 @@
+from planner import seed_simulations
+
+def plan():
+    return [{"id": "analyze", "type": "analyze_case"}, {"id": "simulate", "type": "simulate_outcome"}]
+
+def test_simulation_seed_is_derived_from_the_case():
+    first, again, other = seed_simulations(plan(), "case-1"), seed_simulations(plan(), "case-1"), seed_simulations(plan(), "case-2")
+    assert "seed" not in first[0]
+    assert first[1]["seed"] == again[1]["seed"] != other[1]["seed"]
+    assert "seed" not in seed_simulations(plan(), None)[1]
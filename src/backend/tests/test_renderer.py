@@ -0,0 +1,19 @@
+import pdfplumber
+
+import renderer
+
+def test_pdf_is_text_that_extracts_back(tmp_path):
+    paragraph = ("The tenant paid a security deposit of $1,200 (one month's rent) and moved out "
+                 "on March 3rd; the landlord has not returned it or itemised any deductions.")
+    source = tmp_path / "draft.txt"
+    source.write_text("Demand Letter\n\n" + "\n\n".join([paragraph] * 30))
+    target = tmp_path / "draft.pdf"
+
+    renderer.render_pdf(str(source), str(target))
+
+    assert target.stat().st_size < 20 * 1024
+    with pdfplumber.open(target) as pdf:
+        assert len(pdf.pages) > 1
+        text = "\n".join(page.extract_text() for page in pdf.pages)
+    assert text.startswith("Demand Letter")
+    assert " ".join(text.split()) == " ".join(source.read_text().split())
@@ -0,0 +1,47 @@
+import copy
+
+from checkpoint import case_facts, case_inputs
+from replan import annotate_input_hashes, merge_plan
+
+PLAN = [
+    {"id": "analyze", "type": "analyze_case", "dependencies": []},
+    {"id": "docs", "type": "extract_documents", "dependencies": []},
+    {"id": "agent", "type": "deploy_agent", "agent_type": "small_claims", "dependencies": ["analyze"]},
+    {"id": "draft", "type": "draft_documents", "document_type": "Demand Letter", "dependencies": ["analyze"]},
+    {"id": "simulate", "type": "simulate_outcome", "dependencies": ["analyze"]},
+    {"id": "deadlines", "type": "schedule_deadlines", "dependencies": []}
+]
+
+def completed_case():
+    state = {"prompt": "My landlord kept my $1200 deposit.", "follow_ups": [], "files": [], "jurisdiction": "CA"}
+    tasks = annotate_input_hashes(copy.deepcopy(PLAN), case_inputs(state))
+    for task in tasks:
+        task["status"] = "completed"
+        task["output"] = {"from": "first run"}
+    return state, tasks
+
+def follow_up(state, tasks, message):
+    state = {**state, "follow_ups": state["follow_ups"] + [message]}
+    merged = merge_plan(tasks, copy.deepcopy(PLAN), case_inputs(state))
+    return {task["id"] for task in merged if task.get("status") != "completed"}
+
+def test_case_facts_drop_questions():
+    state = {"prompt": "My landlord kept my deposit.", "follow_ups": ["I have photos of the unit. Can I sue for double?"]}
+    assert case_facts(state) == "My landlord kept my deposit.\nI have photos of the unit."
+
+def test_follow_up_question_reuses_llm_tasks():
+    state, tasks = completed_case()
+    rerun = follow_up(state, tasks, "How long does small claims court take?")
+    assert rerun == {"analyze"}
+
+def test_follow_up_facts_rerun_only_fact_tasks():
+    state, tasks = completed_case()
+    rerun = follow_up(state, tasks, "The lease says the deposit is refundable within 21 days.")
+    assert rerun == {"analyze", "agent", "draft", "simulate"}
+
+def test_reused_task_keeps_its_output():
+    state, tasks = completed_case()
+    state = {**state, "follow_ups": ["Should I send a letter first?"]}
+    merged = merge_plan(tasks, copy.deepcopy(PLAN), case_inputs(state))
+    draft = next(task for task in merged if task["id"] == "draft")
+    assert draft["output"] == {"from": "first run"}
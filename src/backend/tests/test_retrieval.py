@@ -0,0 +1,87 @@
+import threading
+from pathlib import Path
+
+import retrieval
+from artifact_manifest import record_artifact, uploads_manifest_id
+from retrieval import TfidfIndex, rank_similar_cases, stem, tokenize
+from simulator import simulate_case_outcome
+
+def test_stem_keeps_the_e_of_the_word():
+    assert stem("speed") == "speed" and stem("fees") == "fee" and stem("need") == "need"
+    assert stem("degrees") == stem("degree") and stem("employees") == stem("employee")
+    assert stem("speeding") == "speed" and stem("tickets") == "ticket" and stem("parties") == "party"
+    assert tokenize("Speeding tickets for the parties") == ["speed", "ticket", "party"]
+
+def test_user_index_only_tokenizes_changed_cases(monkeypatch):
+    calls = []
+    real_tokenize = retrieval.tokenize
+    monkeypatch.setattr(retrieval, "tokenize", lambda text: calls.append(text) or real_tokenize(text))
+    past_cases = [{"description": "speeding ticket on the highway"}, {"description": "landlord kept my deposit"}]
+    index = TfidfIndex()
+
+    assert rank_similar_cases(["radar speeding"], past_cases, index=index)[0][0]["case"] is past_cases[0]
+    calls.clear()
+    rank_similar_cases(["radar speeding"], past_cases, index=index)
+    assert calls == ["radar speeding"]
+
+    # Appended and edited cases are indexed; nothing else is re-tokenized
+    past_cases[1] = {"description": "unpaid invoice from a contractor"}
+    past_cases.append({"description": "landlord kept my security deposit"})
+    calls.clear()
+    hit = rank_similar_cases(["deposit"], past_cases, index=index)[0][0]
+    assert hit["case"] is past_cases[2]
+    assert len(calls) == 3 and len(index) == 3
+
+    # A shorter list (e.g. replaced by an import) rebuilds the index
+    assert rank_similar_cases(["deposit"], past_cases[:1], index=index) == [[]]
+    assert len(index) == 1
+
+def test_concurrent_syncs_index_each_case_once(monkeypatch):
+    calls = []
+    real_tokenize = retrieval.tokenize
+    monkeypatch.setattr(retrieval, "tokenize", lambda text: calls.append(text) or real_tokenize(text))
+    past_cases = [{"description": f"case number {n} about a deposit"} for n in range(200)]
+    index = TfidfIndex()
+    threads = [threading.Thread(target=rank_similar_cases, args=(["deposit"], past_cases), kwargs={"index": index})
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert index.doc_ids == [f"case_{n}" for n in range(200)]
+    # Each case tokenized once, plus one query per request
+    assert len(calls) == 200 + 8
+
+def test_index_registry_is_bounded(monkeypatch):
+    monkeypatch.setattr(retrieval, "MAX_INDEXES", 2)
+    monkeypatch.setattr(retrieval, "_indexes", retrieval.OrderedDict())
+    first = retrieval.get_index("cases:a")
+    retrieval.get_index("cases:b")
+    assert retrieval.get_index("cases:a") is first
+    retrieval.get_index("cases:c")
+    assert list(retrieval._indexes) == ["cases:a", "cases:c"]
+
+def test_documents_are_searched_per_user_and_rebuilt_from_uploads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(retrieval, "_indexes", retrieval.OrderedDict())
+    for user_id, file_id, text in (("alice", "file_1", "lease says the deposit is refundable"),
+                                   ("bob", "file_2", "bob's deposit receipt from his landlord")):
+        upload = tmp_path / "storage" / "artifacts" / f"{file_id}_doc.txt"
+        upload.parent.mkdir(parents=True, exist_ok=True)
+        upload.write_text(text)
+        record_artifact(uploads_manifest_id(user_id), Path("storage/artifacts") / upload.name,
+                        user_id=user_id, file_id=file_id, filename="doc.txt", text=text)
+        retrieval.add_document(user_id, file_id, text, {"filename": "doc.txt"})
+
+    assert [hit["id"] for hit in retrieval.search_documents(["deposit"], "alice")[0]] == ["file_1"]
+    assert retrieval.search_documents(["deposit"], None) == [[]]
+
+    # As after a restart: the index is rebuilt from the stored upload text
+    retrieval._indexes.clear()
+    assert [hit["id"] for hit in retrieval.search_documents(["deposit"], "bob")[0]] == ["file_2"]
+
+def test_simulator_counts_every_similar_case():
+    past_cases = [{"description": "security deposit not returned by landlord", "type": "landlord_tenant"}] * 8
+    result = simulate_case_outcome("landlord kept my security deposit", {"past_cases": past_cases}, seed=1, n_samples=10)
+    assert result["similar_cases"] == 8
+    assert len(result["ranked_similar_cases"]) == 5
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+
+import storage_manager
+from artifact_manifest import artifact_case_id, record_artifact, list_artifacts, pin_artifact, uploads_manifest_id
+
+DRAFT = "Dear landlord,\n\nPlease return my deposit of $1,200 within 14 days.\n" * 40
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage_manager, "USER_QUOTA_BYTES", 1024)
+
+def write(path: str, text: str) -> Path:
+    file_path = Path("storage") / path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text(text)
+    return file_path
+
+def test_evicted_draft_is_restored_unchanged():
+    draft = write("artifacts/case1/draft.txt", DRAFT)
+    record_artifact("case1", draft, generated=True, user_id="u1")
+
+    stats = storage_manager.sweep()
+    assert stats["files_evicted"] == 1 and stats["bytes_reclaimed"] > 0
+    assert not draft.exists()
+    assert list_artifacts("case1")[0]["evicted"] is True
+
+    assert storage_manager.restore_artifact("artifacts/case1/draft.txt")
+    assert draft.read_text() == DRAFT
+    assert list_artifacts("case1")[0]["evicted"] is False
+
+def test_pinned_drafts_and_uploads_are_kept_but_counted():
+    draft = write("artifacts/case1/draft.txt", DRAFT)
+    record_artifact("case1", draft, generated=True, user_id="u1")
+    assert pin_artifact("case1", "artifacts/case1/draft.txt")["pinned"] is True
+    upload = write("artifacts/file_1_lease.txt", "lease " * 500)
+    record_artifact(uploads_manifest_id("u1"), upload, user_id="u1")
+
+    assert sum(item["size"] for item in storage_manager.case_files()["u1"]) > 1024
+    stats = storage_manager.sweep()
+    assert stats == {"files_evicted": 0, "bytes_reclaimed": 0, "users_over_quota": 1}
+    assert draft.exists() and upload.exists()
+
+def test_agent_document_can_be_pinned_and_restored():
+    doc = write("artifacts/case1/agent_1/motion.txt", DRAFT)
+    record_artifact("case1", doc, generated=True, user_id="u1")
+    assert artifact_case_id("artifacts/case1/agent_1/motion.txt") == "case1"
+
+    storage_manager.sweep()
+    assert storage_manager.restore_artifact("artifacts/case1/agent_1/motion.txt")
+    assert doc.read_text() == DRAFT
+    assert list_artifacts("case1")[0]["evicted"] is False
+
+    assert pin_artifact("case1", "artifacts/case1/agent_1/motion.txt")["pinned"] is True
+    assert storage_manager.sweep()["files_evicted"] == 0
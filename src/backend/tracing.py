@@ -0,0 +1,88 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+import metrics
+from serialization import dumps_json
+
+# Finished spans, one JSON object per line; set TRACE_FILE empty to keep
+# only the latency histograms
+TRACE_FILE = os.getenv("TRACE_FILE", "storage/logs/traces.jsonl")
+
+metrics.describe("span_duration_seconds", "Duration of traced operations, by span name")
+
+# (trace_id, span_id) of the innermost open span in this request
+_current: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("current_span", default=None)
+_sink_lock = threading.Lock()
+_sink = None
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def current_trace_id() -> Optional[str]:
+    parent = _current.get()
+    return parent[0] if parent else None
+
+def _export(record: Dict[str, Any]) -> None:
+    global _sink
+    if not TRACE_FILE:
+        return
+    line = dumps_json(record) + b"\n"
+    try:
+        with _sink_lock:
+            if _sink is None:
+                os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+                _sink = open(TRACE_FILE, "ab", buffering=0)
+            _sink.write(line)
+    except Exception as e:
+        print(f"Error writing trace span: {e}")
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block as a span of the current trace (a new trace at the top level).
+
+    Yields the span record so the block can add attributes or rename it;
+    on exit its duration is exported to TRACE_FILE and observed in the
+    span_duration_seconds histogram. Errors are recorded and re-raised.
+    """
+    parent = _current.get()
+    trace_id = parent[0] if parent else _new_id()
+    record = {
+        "trace_id": trace_id,
+        "span_id": _new_id(),
+        "parent_id": parent[1] if parent else None,
+        "name": name,
+        "start": time.time(),
+        "attributes": attributes
+    }
+    token = _current.set((trace_id, record["span_id"]))
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - started
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A generator resumed in another context (e.g. a threadpool hop)
+            _current.set(parent)
+        metrics.observe("span_duration_seconds", record["duration"], span=record["name"])
+        _export(record)
+
+def traced(name: str):
+    """Decorator running the function inside span(name)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate